@@ -0,0 +1,59 @@
+from collections import OrderedDict
+
+
+class StateCache:
+    """
+    Bounded LRU memo for per-state results (legal move lists, encodings, attack plans).
+    Keys start with the graph's state_version, so any mutation makes older entries unreachable;
+    sync() also drops them eagerly once the version moves on. Cached values are shared between
+    hits and must not be mutated by callers.
+    """
+
+    _MISSING = object()
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def sync(self, version):
+        if version != self.version:
+            if self.entries:
+                self.invalidations += 1
+                self.entries.clear()
+            self.version = version
+
+    def get_or_compute(self, key, compute):
+        value = self.entries.get(key, self._MISSING)
+        if value is not self._MISSING:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = compute()
+        if self.max_entries > 0:
+            self.entries[key] = value
+            if len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def clear(self):
+        self.entries.clear()
+        self.version = None
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
@@ -0,0 +1,139 @@
+import atexit
+import json
+import queue
+import sys
+import threading
+import time
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+LEVEL_NAMES = {DEBUG: "DEBUG", INFO: "INFO", WARNING: "WARNING", ERROR: "ERROR"}
+LEVELS = {name: level for level, name in LEVEL_NAMES.items()}
+
+_STOP = object()
+
+
+class AgentLogger:
+    """
+    Leveled logger with a background writer thread.
+
+    A call below the current level returns after one integer comparison. Records that pass are
+    queued as (timestamp, level, event, template, args) tuples; the template is only formatted,
+    and the line only written, on the writer thread. High-volume events can be sampled: with
+    sample_every={"unit_added": 100} only every 100th "unit_added" record is kept.
+    Output is "text" (time level event: message) or "json" (one object per line).
+    """
+
+    def __init__(self, level=INFO, fmt="text", path=None, sample_every=None):
+        self.level = level
+        self.fmt = fmt
+        self.path = path  # None = stdout at write time
+        self.sample_every = dict(sample_every or {})
+        self._sample_counts = {}
+        self.dropped = 0  # records skipped by sampling
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def configure(self, level=None, fmt=None, path=None, sample_every=None):
+        self.flush()
+        if level is not None:
+            self.level = LEVELS.get(str(level).upper(), INFO) if not isinstance(level, int) else level
+        if fmt is not None:
+            self.fmt = fmt
+        if path is not None and path != self.path:
+            self.close()  # the writer reopens its output on the next record
+            self.path = path
+        if sample_every is not None:
+            self.sample_every = dict(sample_every)
+            self._sample_counts = {}
+
+    def enabled_for(self, level):
+        return level >= self.level
+
+    def log(self, level, event, template, *args):
+        if level < self.level:
+            return
+        every = self.sample_every.get(event)
+        if every:
+            n = self._sample_counts.get(event, 0)
+            self._sample_counts[event] = n + 1
+            if n % every:
+                self.dropped += 1
+                return
+        if self._thread is None:
+            self._start()
+        self._queue.put((time.time(), level, event, template, args))
+
+    def debug(self, event, template, *args):
+        if DEBUG >= self.level:
+            self.log(DEBUG, event, template, *args)
+
+    def info(self, event, template, *args):
+        if INFO >= self.level:
+            self.log(INFO, event, template, *args)
+
+    def warning(self, event, template, *args):
+        self.log(WARNING, event, template, *args)
+
+    def error(self, event, template, *args):
+        self.log(ERROR, event, template, *args)
+
+    # --- writer thread ---
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="agent-log", daemon=True)
+                self._thread.start()
+
+    def _format(self, record):
+        ts, level, event, template, args = record
+        try:
+            msg = template.format(*args) if args else template
+        except (IndexError, KeyError, ValueError):
+            msg = f"{template} {args!r}"
+        if self.fmt == "json":
+            return json.dumps({"ts": ts, "level": LEVEL_NAMES.get(level, level), "event": event, "msg": msg})
+        stamp = time.strftime("%H:%M:%S", time.localtime(ts))
+        return f"{stamp} {LEVEL_NAMES.get(level, level)} {event}: {msg}"
+
+    def _run(self):
+        log_file = open(self.path, "a") if self.path else None
+        while True:
+            record = self._queue.get()
+            if record is _STOP:
+                break
+            # stdout is looked up per record so redirect_stdout (e.g. in benchmark.py) is honoured
+            out = log_file or sys.stdout
+            if isinstance(record, threading.Event):  # flush marker
+                out.flush()
+                record.set()
+                continue
+            out.write(self._format(record) + "\n")
+            # write out whatever else is queued before flushing once
+            if self._queue.empty():
+                out.flush()
+        if log_file is not None:
+            log_file.close()
+
+    def flush(self, timeout=5.0):
+        """Block until everything queued so far has been written."""
+        if self._thread is None:
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def close(self):
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout=5.0)
+        self._thread = None
+
+
+# shared by greedy_model and the helper modules; configured from config.json in greedy_model's main
+log = AgentLogger()
+atexit.register(log.flush)
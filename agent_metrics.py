@@ -0,0 +1,142 @@
+import json
+import os
+import signal
+import time
+
+
+class LatencyHistogram:
+    """
+    HDR-style log-linear histogram of nanosecond latencies.
+    Values below 2**sub_bucket_bits are recorded exactly; above that every power of two
+    is split into 2**(sub_bucket_bits - 1) linear buckets, so the relative error stays
+    bounded (~3% with the default 5 bits) while memory is a small fixed-size list.
+    """
+
+    def __init__(self, sub_bucket_bits=5):
+        self.sub_bucket_bits = sub_bucket_bits
+        self.half = 1 << (sub_bucket_bits - 1)
+        self.counts = [0] * ((64 - sub_bucket_bits + 2) * self.half)
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    def record(self, value):
+        if value < 0:
+            value = 0
+        shift = value.bit_length() - self.sub_bucket_bits
+        if shift <= 0:
+            idx = value
+        else:
+            idx = shift * self.half + (value >> shift)
+        self.counts[idx] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def _bucket_bounds(self, idx):
+        if idx < 2 * self.half:
+            return idx, idx
+        shift = idx // self.half - 1
+        mantissa = idx - shift * self.half
+        return mantissa << shift, ((mantissa + 1) << shift) - 1
+
+    def percentile(self, p):
+        if self.count == 0:
+            return 0
+        target = max(1, int(round(self.count * p / 100.0)))
+        seen = 0
+        for idx, c in enumerate(self.counts):
+            if not c:
+                continue
+            seen += c
+            if seen >= target:
+                low, high = self._bucket_bounds(idx)
+                return min((low + high) // 2, self.max)
+        return self.max
+
+    def summary(self):
+        """Summary in microseconds, ready for json.dump."""
+        us = 1e-3
+        return {
+            "count": self.count,
+            "mean_us": (self.total / self.count) * us if self.count else 0.0,
+            "min_us": (self.min or 0) * us,
+            "p50_us": self.percentile(50) * us,
+            "p90_us": self.percentile(90) * us,
+            "p99_us": self.percentile(99) * us,
+            "max_us": self.max * us,
+        }
+
+
+class AgentMetrics:
+    """
+    Per-stage latency histograms for the agent pipeline, keyed by (stage, key) where key is
+    the message type or delegate. When disabled, start() returns 0 and record() returns
+    immediately, so instrumented code pays one attribute check per stage.
+    """
+
+    def __init__(self, enabled=False, dump_path="agent_metrics.json", dump_interval=None):
+        self.enabled = enabled
+        self.dump_path = dump_path
+        self.dump_interval = dump_interval  # seconds between periodic dumps, None = only on demand
+        self.histograms = {}
+        self.sources = {}  # name -> callable returning a JSON-serialisable dict, added to every snapshot
+        self._last_dump = time.monotonic()
+        self._dump_requested = False
+
+    def start(self):
+        return time.perf_counter_ns() if self.enabled else 0
+
+    def record(self, stage, key, t0):
+        if not self.enabled:
+            return
+        elapsed = time.perf_counter_ns() - t0
+        hist = self.histograms.get((stage, key))
+        if hist is None:
+            hist = self.histograms[(stage, key)] = LatencyHistogram()
+        hist.record(elapsed)
+
+    def register_source(self, name, fn):
+        """Include fn() (e.g. cache hit/miss counters) under `name` in snapshots."""
+        self.sources[name] = fn
+
+    def snapshot(self):
+        stages = {}
+        for (stage, key), hist in self.histograms.items():
+            stages.setdefault(stage, {})[str(key)] = hist.summary()
+        snapshot = {"timestamp": time.time(), "stages": stages}
+        for name, fn in self.sources.items():
+            snapshot[name] = fn()
+        return snapshot
+
+    def dump(self, path=None):
+        """Write the current snapshot as JSON (atomically, so readers never see a partial file)."""
+        path = path or self.dump_path
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.snapshot(), f, indent=2)
+        os.replace(tmp_path, path)
+        self._last_dump = time.monotonic()
+        self._dump_requested = False
+
+    def request_dump(self, *_):
+        # safe to use as a signal handler: the actual write happens in maybe_dump()
+        self._dump_requested = True
+
+    def install_dump_signal(self, sig=getattr(signal, "SIGUSR1", None)):
+        """Dump on demand with e.g. `kill -USR1 <pid>`."""
+        if sig is not None:
+            signal.signal(sig, self.request_dump)
+
+    def maybe_dump(self):
+        if not self.enabled:
+            return
+        if self._dump_requested or (
+            self.dump_interval is not None
+            and time.monotonic() - self._last_dump >= self.dump_interval
+        ):
+            self.dump()
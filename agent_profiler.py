@@ -0,0 +1,164 @@
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+
+from agent_log import log
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler for agent_loop, aggregated per region label (the delegate of a [MY_MOVE],
+    or "change" for CHANGE ingestion).
+
+    While code runs inside region(label), a daemon thread snapshots the main thread's Python stack
+    every `interval` seconds and counts it under that label; outside regions it only wakes and goes
+    back to sleep. The profiled thread pays two attribute writes per region. The sampler times its
+    own work and doubles its interval (up to max_interval) whenever a sample costs more than
+    max_overhead of the interval, so the overhead stays bounded on deep stacks.
+    Regions shorter than the interval are only caught proportionally often, which is fine in
+    aggregate over a game.
+
+    write() produces one collapsed-stack file per label (`frame;frame;frame count` lines, the
+    input of flamegraph.pl / speedscope) and summary.json with the top-N functions by self and
+    inclusive samples.
+    """
+
+    def __init__(self, enabled=False, out_dir="profiles", interval=0.005, max_interval=0.1,
+                 max_overhead=0.01, top_n=20, max_depth=128):
+        self.enabled = enabled
+        self.out_dir = out_dir
+        self.interval = interval
+        self.max_interval = max_interval
+        self.max_overhead = max_overhead
+        self.top_n = top_n
+        self.max_depth = max_depth
+        self.stacks = {}  # label -> {collapsed stack: samples}
+        self.regions = {}  # label -> [regions entered, wall seconds inside them]
+        self.samples = 0
+        self.sample_seconds = 0.0
+        self._frame_names = {}  # code object -> "function (file:line)"
+        self._active = None  # (thread id, label) while a region runs
+        self._stop = threading.Event()
+        self._thread = None
+
+    @contextlib.contextmanager
+    def _region(self, label):
+        if self._thread is None:
+            self._start()
+        active = (threading.get_ident(), label)
+        self._active = active
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._active = None
+            stats = self.regions.get(label)
+            if stats is None:
+                stats = self.regions[label] = [0, 0.0]
+            stats[0] += 1
+            stats[1] += time.perf_counter() - t0
+
+    def region(self, label):
+        if not self.enabled:
+            return contextlib.nullcontext()
+        return self._region(label)
+
+    # --- sampler thread ---
+    def _start(self):
+        self._thread = threading.Thread(target=self._run, name="agent-profiler", daemon=True)
+        self._thread.start()
+
+    def _frame_name(self, code):
+        name = self._frame_names.get(code)
+        if name is None:
+            name = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+            name = self._frame_names[code] = name.replace(";", ",")  # ";" separates frames in the folded format
+        return name
+
+    def _collapse(self, frame):
+        names = []
+        while frame is not None and len(names) < self.max_depth:
+            names.append(self._frame_name(frame.f_code))
+            frame = frame.f_back
+        names.reverse()
+        return ";".join(names)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            active = self._active
+            if active is None:
+                continue
+            t0 = time.perf_counter()
+            frame = sys._current_frames().get(active[0])
+            if frame is None:
+                continue
+            stack = self._collapse(frame)
+            del frame
+            counts = self.stacks.get(active[1])
+            if counts is None:
+                counts = self.stacks[active[1]] = {}
+            counts[stack] = counts.get(stack, 0) + 1
+            self.samples += 1
+            cost = time.perf_counter() - t0
+            self.sample_seconds += cost
+            if cost > self.max_overhead * self.interval and self.interval < self.max_interval:
+                self.interval = min(self.interval * 2, self.max_interval)
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    # --- output ---
+    def top_functions(self, label):
+        """[(function, self samples, inclusive samples)] for one label, by self samples."""
+        self_counts, total_counts = {}, {}
+        for stack, n in self.stacks.get(label, {}).items():
+            frames = stack.split(";")
+            self_counts[frames[-1]] = self_counts.get(frames[-1], 0) + n
+            for name in set(frames):  # recursion counts once per sample
+                total_counts[name] = total_counts.get(name, 0) + n
+        ranked = sorted(total_counts, key=lambda f: (self_counts.get(f, 0), total_counts[f]), reverse=True)
+        return [(f, self_counts.get(f, 0), total_counts[f]) for f in ranked[:self.top_n]]
+
+    def summary(self):
+        labels = {}
+        for label, (count, seconds) in self.regions.items():
+            samples = sum(self.stacks.get(label, {}).values())
+            labels[label] = {
+                "regions": count,
+                "wall_s": seconds,
+                "samples": samples,
+                "top": [{"function": f, "self": s, "inclusive": t} for f, s, t in self.top_functions(label)],
+            }
+        return {
+            "interval_s": self.interval,
+            "samples": self.samples,
+            "sampler_s": self.sample_seconds,
+            "labels": labels,
+        }
+
+    def write(self, out_dir=None):
+        """Write <label>.folded per label and summary.json; log the top functions per label."""
+        if not self.enabled:
+            return
+        out_dir = out_dir or self.out_dir
+        os.makedirs(out_dir, exist_ok=True)
+        for label, counts in self.stacks.items():
+            with open(os.path.join(out_dir, f"{label}.folded"), "w") as f:
+                for stack, n in sorted(counts.items()):
+                    f.write(f"{stack} {n}\n")
+        summary = self.summary()
+        tmp_path = os.path.join(out_dir, "summary.json.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(summary, f, indent=2)
+        os.replace(tmp_path, os.path.join(out_dir, "summary.json"))
+
+        for label, stats in summary["labels"].items():
+            log.info("profile", "{}: {} regions, {:.3f}s, {} samples", label, stats["regions"], stats["wall_s"], stats["samples"])
+            for entry in stats["top"]:
+                log.info("profile", "  {:6d} self {:6d} incl  {}", entry["self"], entry["inclusive"], entry["function"])
@@ -0,0 +1,121 @@
+import numpy as np
+
+
+def hop_distances(num_nodes, edges):
+    """
+    All-pairs hop counts. Returns (dist, parent): dist[s, v] is the hop count (num_nodes + 1 if
+    unreachable) and parent[s, v] the node before v on a shortest s -> v path (-1 for none).
+
+    The BFS runs from every source at once, one level per iteration: the frontier is a list of
+    (source, node) pairs, expanded through the CSR neighbour lists with array operations.
+    """
+    n = num_nodes
+    edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+    heads = np.concatenate([edges[:, 0], edges[:, 1]])
+    tails = np.concatenate([edges[:, 1], edges[:, 0]])
+    order = np.argsort(heads, kind="stable")
+    indices = tails[order]
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(heads, minlength=n), out=indptr[1:])
+
+    dist = np.full((n, n), n + 1, dtype=np.int32)
+    parent = np.full((n, n), -1, dtype=np.int32)
+    sources = nodes = np.arange(n)
+    dist[sources, nodes] = 0
+    level = 0
+    while len(sources):
+        level += 1
+        degree = indptr[nodes + 1] - indptr[nodes]
+        starts = np.repeat(indptr[nodes] - (np.cumsum(degree) - degree), degree)
+        nbrs = indices[starts + np.arange(degree.sum())]
+        src, prev = np.repeat(sources, degree), np.repeat(nodes, degree)
+        new = dist[src, nbrs] > level
+        src, nbrs, prev = src[new], nbrs[new], prev[new]
+        # a node reached from several frontier nodes at once keeps the first as its parent
+        _, first = np.unique(src * n + nbrs, return_index=True)
+        sources, nodes = src[first], nbrs[first]
+        dist[sources, nodes] = level
+        parent[sources, nodes] = prev[first]
+    return dist, parent
+
+
+class AirMovementIndex:
+    """
+    Move generation for air units from precomputed tables instead of a graph search per stack.
+
+    Planes fly over any territory, so a destination is reachable iff its hop distance is within
+    the unit's movement, and the move is only offered if the plane can still land afterwards:
+    dist[src, dst] + landing[dst] <= movement, where landing[t] is the hop distance from t to the
+    nearest territory the player owns. The all-pairs table is rebuilt when ctf.topology_version
+    changes, the per-player landing arrays when ctf.ownership_version changes.
+    """
+
+    def __init__(self):
+        self._topology_version = None
+        self.dist = None
+        self.parent = None
+        self.territories = []
+        self._landing = {}  # player -> (topology_version, ownership_version, owned mask, landing distances)
+
+    def distances(self, ctf):
+        if self._topology_version != ctf.topology_version:
+            self.territories = list(ctf.G.nodes)
+            idx = {t: i for i, t in enumerate(self.territories)}
+            self.dist, self.parent = hop_distances(len(idx), [(idx[a], idx[b]) for a, b in ctf.G.edges])
+            self._topology_version = ctf.topology_version
+            self._landing.clear()
+        return self.dist
+
+    def landing_distances(self, ctf, player):
+        """(owned mask [N], hop distance to the nearest owned territory [N]) for player."""
+        dist = self.distances(ctf)
+        cached = self._landing.get(player)
+        if cached is not None and cached[:2] == (ctf.topology_version, ctf.ownership_version):
+            return cached[2], cached[3]
+        owned = np.zeros(len(self.territories), dtype=bool)
+        for terr in ctf.territories_by_owner.get(player, ()):
+            owned[ctf.node_index[terr]] = True
+        landing = dist[:, owned].min(axis=1) if owned.any() else np.full(len(owned), len(owned) + 1, dtype=np.int32)
+        self._landing[player] = (ctf.topology_version, ctf.ownership_version, owned, landing)
+        return owned, landing
+
+    def path(self, src, dst):
+        """Territory names along the stored shortest path, src first."""
+        nodes = [dst]
+        par = self.parent[src]
+        while nodes[-1] != src:
+            nodes.append(par[nodes[-1]])
+        return [self.territories[i] for i in reversed(nodes)]
+
+    def moves(self, ctf, player, delegate):
+        """
+        Air moves in the generate_legal_combat_moves / generate_legal_noncombat_moves format.
+        combat: any non-owned territory in range with a landing spot left over;
+        noncombat: any owned territory in range.
+        """
+        dist = self.distances(ctf)
+        owned, landing = self.landing_distances(ctf, player)
+        targets = ~owned if delegate == "combat" else owned
+        label = "combat" if delegate == "combat" else "nonCombat"
+        legal_moves = []
+        for terr in ctf.get_owned_territories(player):
+            src = ctf.node_index[terr]
+            row = dist[src]
+            for u in ctf.G.nodes[terr].get("units", []):
+                if u["owner"] != player or u["quantity"] <= 0 or u["unit"] not in ctf.air_units:
+                    continue
+                move_range = ctf.production_rules.get(u["unit"], {}).get("move", 1)
+                ok = targets & (row >= 1) & (row + landing <= move_range)
+                for dst in np.flatnonzero(ok):
+                    neighbor = self.territories[dst]
+                    legal_moves.append({
+                        "delegate": label,
+                        "from": terr,
+                        "to": neighbor,
+                        "steps": int(row[dst]),
+                        "units": u["unit"],
+                        "max_quantity": u["quantity"],
+                        "target_owner": ctf.G.nodes[neighbor].get("owner", None),
+                        "path": self.path(src, dst),
+                    })
+        return legal_moves
@@ -0,0 +1,223 @@
+import heapq
+import math
+import itertools
+from collections import deque
+
+import numpy as np
+
+
+def reachable_targets(ctf, source, move_range, player):
+    """
+    Territories a unit in `source` can attack within move_range, with the path to each.
+    Same rule as generate_legal_combat_moves: the path may not pass through own territories.
+    """
+    targets = {}
+    queue = deque([(source, 0, [source])])
+    visited = {source}
+    while queue:
+        current, steps, path = queue.popleft()
+        if steps >= move_range:
+            continue
+        for neighbor in ctf.G.neighbors(current):
+            if neighbor in visited:
+                continue
+            visited.add(neighbor)
+            if ctf.G.nodes[neighbor].get("owner") == player:
+                continue
+            targets[neighbor] = path + [neighbor]
+            if steps + 1 < move_range:
+                queue.append((neighbor, steps + 1, path + [neighbor]))
+    return targets
+
+
+def air_reachable_targets(ctf, source, move_range, player):
+    """
+    Targets for an air unit in `source`, with the path to each: planes fly over anything, but
+    only territories from which an owned territory is still within the remaining movement
+    qualify (the AirMovementIndex rule used for combat moves).
+    """
+    dist = ctf.air_index.distances(ctf)
+    owned, landing = ctf.air_index.landing_distances(ctf, player)
+    src = ctf.node_index[source]
+    row = dist[src]
+    ok = ~owned & (row >= 1) & (row + landing <= move_range)
+    return {ctf.air_index.territories[dst]: ctf.air_index.path(src, dst) for dst in np.flatnonzero(ok)}
+
+
+def defending_strength(ctf, territory, player):
+    return float(sum(
+        ctf.production_rules.get(u["unit"], {}).get("defense", 0) * u["quantity"]
+        for u in ctf.G.nodes[territory]["units"]
+        if u["owner"] != player and u["quantity"] > 0
+    ))
+
+
+def target_value(ctf, territory, victory_bonus=20.0, factory_bonus=15.0, base_value=5.0):
+    """Worth of capturing a territory, in PUs so it is comparable with the cost of units lost."""
+    value = base_value
+    if territory in ctf.victory_cities:
+        value += victory_bonus
+    if any(u["unit"] == "factory" for u in ctf.G.nodes[territory]["units"]):
+        value += factory_bonus
+    return value
+
+
+def _win_estimate(attack, defense):
+    if defense <= 0:
+        return 1.0 if attack > 0 else 0.0
+    return attack / (attack + defense)
+
+
+def _plan_score(value, attack, cost, defense):
+    """Expected gain: target value times win estimate, minus the expected share of committed units lost."""
+    win = _win_estimate(attack, defense)
+    return value * win - cost * (1.0 - win)
+
+
+def collect_attack_options(ctf, player):
+    """
+    For every enemy or neutral territory in reach, the forces that can join an attack on it,
+    grouped by unit type since units of one type are interchangeable in a battle:
+    {target: {unit: {"attack", "cost", "sources": [(from, quantity, path), ...] shortest path first}}}
+    """
+    options = {}
+    reach_cache = {}
+    for terr in ctf.get_owned_territories(player):
+        for u in ctf.G.nodes[terr]["units"]:
+            if u["owner"] != player or u["quantity"] <= 0 or u["unit"] in ("factory", "aaGun"):
+                continue
+            rule = ctf.production_rules.get(u["unit"], {})
+            move_range = rule.get("move", 1)
+            attack = float(rule.get("attack", 0))
+            if move_range <= 0 or attack <= 0:
+                continue
+            air = u["unit"] in ctf.air_units
+            key = (terr, move_range, air)
+            if key not in reach_cache:
+                reach = air_reachable_targets if air else reachable_targets
+                reach_cache[key] = reach(ctf, terr, move_range, player)
+            for target, path in reach_cache[key].items():
+                group = options.setdefault(target, {}).setdefault(
+                    u["unit"], {"attack": attack, "cost": float(rule.get("cost", 0)), "sources": []}
+                )
+                group["sources"].append((terr, u["quantity"], path))
+    for groups in options.values():
+        for group in groups.values():
+            group["sources"].sort(key=lambda src: len(src[2]))
+            group["quantity"] = sum(src[1] for src in group["sources"])
+    return options
+
+
+def _upper_bound(value, attack, cost, defense, suffix):
+    """
+    Upper bound on the score of any completion of a partial plan. Adding attack costs at least
+    the fractional-knapsack price of the remaining groups (best attack per PU first), and on each
+    piece [a0, a1] the score is at most value * win(a1) - (cost + cost at a0) * loss(a1).
+    """
+    best = _plan_score(value, attack, cost, defense)
+    added_attack, added_cost = 0.0, 0.0
+    for group_attack, group_cost in suffix:
+        top = attack + added_attack + group_attack
+        win = _win_estimate(top, defense)
+        best = max(best, value * win - (cost + added_cost) * (1.0 - win))
+        added_attack += group_attack
+        added_cost += group_cost
+    return best
+
+
+def generate_attack_plans(ctf, player, k=None, min_odds=1.0, overkill=2.5, victory_bonus=20.0, factory_bonus=15.0):
+    """
+    Stream combined-arms attack plans in descending estimated value.
+
+    A plan assembles units from every stack that can reach one target. Plans are found by
+    best-first branch and bound over "how many units of type i": each open node is keyed by an
+    upper bound on the value of any completion (_upper_bound), so a complete plan popped from
+    the heap is better than anything still unexplored and can be yielded immediately.
+    Equal bounds are broken by lower committed cost, then by depth, so ties resolve towards the
+    cheapest complete plan instead of widening the search.
+    Branches are pruned when
+      - even committing every remaining unit cannot reach min_odds * defense (attack lower bound), or
+      - the attack would pass overkill * defense, in which case no more units are added; an
+        undefended territory gets a single unit, since any attack takes it.
+    Only the best plan per target is yielded; the rest would differ in quantities alone.
+    Stop after k plans, or iterate lazily and break early.
+    """
+    counter = itertools.count()
+    heap = []
+    targets = []
+
+    for target, groups in collect_attack_options(ctf, player).items():
+        # strongest attack per PU first, which is also the order the bound's knapsack fills in
+        groups = sorted(groups.items(), key=lambda g: g[1]["attack"] / (g[1]["cost"] or 1.0), reverse=True)
+        totals = [(g["quantity"] * g["attack"], g["quantity"] * g["cost"]) for _, g in groups]
+        remaining = [0.0] * (len(groups) + 1)
+        for i in range(len(groups) - 1, -1, -1):
+            remaining[i] = remaining[i + 1] + totals[i][0]
+        defense = defending_strength(ctf, target, player)
+        value = target_value(ctf, target, victory_bonus, factory_bonus)
+        targets.append((target, groups, totals, remaining, defense, value))
+        if remaining[0] <= 0 or remaining[0] < min_odds * defense:
+            continue
+        bound = _upper_bound(value, 0.0, 0.0, defense, totals)
+        heapq.heappush(heap, (-bound, 0.0, 0, next(counter), len(targets) - 1, 0.0, ()))
+
+    emitted = 0
+    planned = set()  # target indices that already produced their best plan
+    while heap:
+        neg_score, cost, neg_depth, _, t_idx, attack, choices = heapq.heappop(heap)
+        if t_idx in planned:
+            continue
+        depth = -neg_depth
+        target, groups, totals, remaining, defense, value = targets[t_idx]
+
+        if depth == len(groups):
+            if attack <= 0 or attack < min_odds * defense:
+                continue
+            yield {
+                "delegate": "combat",
+                "to": target,
+                "target_owner": ctf.G.nodes[target].get("owner"),
+                "units": _assign_sources(groups, choices),
+                "attack": attack,
+                "defense": defense,
+                "win_estimate": _win_estimate(attack, defense),
+                "value": -neg_score,
+            }
+            planned.add(t_idx)
+            emitted += 1
+            if k is not None and emitted >= k:
+                return
+            continue
+
+        group = groups[depth][1]
+        max_qty = group["quantity"]
+        if defense > 0:
+            # never add more of a type than it takes to pass overkill * defense
+            max_qty = min(max_qty, max(0, math.ceil((overkill * defense - attack) / group["attack"])))
+        else:
+            # any attack takes an undefended territory: one unit, the cheapest thanks to the tie-break
+            max_qty = 0 if attack > 0 else min(max_qty, 1)
+        quantities = range(max_qty, -1, -1)
+        for qty in quantities:
+            new_attack = attack + qty * group["attack"]
+            new_cost = cost + qty * group["cost"]
+            if new_attack + remaining[depth + 1] <= 0 or new_attack + remaining[depth + 1] < min_odds * defense:
+                break  # fewer units from here on only lowers the reachable attack
+            if depth + 1 == len(groups):
+                score = _plan_score(value, new_attack, new_cost, defense)
+            else:
+                score = _upper_bound(value, new_attack, new_cost, defense, totals[depth + 1:])
+            heapq.heappush(heap, (-score, new_cost, -(depth + 1), next(counter), t_idx, new_attack, choices + (qty,)))
+
+
+def _assign_sources(groups, choices):
+    """Turn per-type quantities into per-stack moves, drawing from the closest stacks first."""
+    units = []
+    for (unit, group), qty in zip(groups, choices):
+        for frm, available, path in group["sources"]:
+            if qty <= 0:
+                break
+            take = min(qty, available)
+            units.append({"from": frm, "unit": unit, "quantity": take, "path": path})
+            qty -= take
+    return units
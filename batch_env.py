@@ -0,0 +1,301 @@
+"""
+Vectorised Capture-The-Flag environment for self-play: B independent games stepped in lockstep
+as numpy array operations, built straight from the parse_triplea_map JSON.
+
+A turn of the current player is
+    purchase(counts) -> move(...) during "combat" -> resolve_battles() -> move(...) during
+    "noncombat" -> place() -> end_turn()   (income, next player, victory / round limit)
+and observe() returns the get_state_encoding layout with a leading batch axis.
+
+Simplifications against the real engine: moves check the hop distance only (no blocking,
+no movement split across several moves), units of all defending owners in a territory fight
+together, and casualties are taken cheapest unit first.
+"""
+import json
+
+import numpy as np
+
+from air_moves import hop_distances
+
+DELEGATE_TYPES = ["purchase", "combat", "noncombat"]  # global_features one-hot, as in get_state_encoding
+
+
+class BatchCTFEnv:
+    def __init__(self, map_data, batch_size, seed=0, max_rounds=50, max_battle_rounds=20,
+                 victory_cities_needed=None, factory_unit="factory"):
+        self.batch_size = batch_size
+        self.max_rounds = max_rounds
+        self.max_battle_rounds = max_battle_rounds
+        self.rng = np.random.default_rng(seed)
+
+        # --- static map tables ---
+        self.territories = list(map_data["territories"])
+        self.node_index = {t: i for i, t in enumerate(self.territories)}
+        # owner one-hot order follows CaptureTheFlagGraph.G.owners; "Neutral" is the extra owner index P
+        self.players = list(map_data.get("initial_resources", {}).keys())
+        self.num_owners = len(self.players) + 1
+        self.neutral = len(self.players)
+        self.unit_types = list(map_data["units"])
+        unit_index = {u: i for i, u in enumerate(self.unit_types)}
+
+        stats = map_data.get("unit_stats", {})
+        self.attack = np.array([stats.get(u, {}).get("attack", 0) for u in self.unit_types], dtype=np.float64)
+        self.defense = np.array([stats.get(u, {}).get("defense", 0) for u in self.unit_types], dtype=np.float64)
+        self.movement = np.array([stats.get(u, {}).get("movement", 0) for u in self.unit_types], dtype=np.int32)
+        self.cost = np.zeros(len(self.unit_types), dtype=np.int64)
+        self.buyable = np.zeros(len(self.unit_types), dtype=bool)
+        for rule in map_data["production_rules"].values():
+            if rule["unit"] in unit_index:
+                self.cost[unit_index[rule["unit"]]] = rule["cost"]
+                self.buyable[unit_index[rule["unit"]]] = True
+        self.combat_unit = (self.attack > 0) | (self.defense > 0)
+        self.casualty_order = [u for u in np.lexsort((self.defense, self.cost)) if self.combat_unit[u]]
+        self.factory = unit_index.get(factory_unit)
+
+        edges = [(self.node_index[c["from"]], self.node_index[c["to"]]) for c in map_data["connections"]]
+        n = len(self.territories)
+        self.adjacency = np.zeros((n, n), dtype=np.float32)
+        for a, b in edges:
+            self.adjacency[a, b] = self.adjacency[b, a] = 1.0
+        self.distance = hop_distances(n, edges)[0]
+        production = map_data.get("territory_production", {})
+        self.production = np.array([production.get(t, 1) for t in self.territories], dtype=np.int64)
+        self.victory = np.array([t in set(map_data.get("victory_cities", [])) for t in self.territories])
+        self.victory_cities_needed = victory_cities_needed or int(self.victory.sum())
+
+        # --- initial state, broadcast over the batch on reset() ---
+        owner_idx = {p: i for i, p in enumerate(self.players)}
+        self._owner0 = np.full(n, self.neutral, dtype=np.int16)
+        for terr, owner in map_data["starting_ownership"].items():
+            self._owner0[self.node_index[terr]] = owner_idx.get(owner, self.neutral)
+        self._units0 = np.zeros((n, self.num_owners, len(self.unit_types)), dtype=np.int32)
+        for u in map_data["starting_units"]:
+            if u["territory"] in self.node_index and u["unit"] in unit_index:
+                self._units0[self.node_index[u["territory"]], owner_idx.get(u["owner"], self.neutral),
+                             unit_index[u["unit"]]] += u["quantity"]
+        self._pus0 = np.array([map_data["initial_resources"][p] for p in self.players], dtype=np.int64)
+
+        self.reset()
+
+    @classmethod
+    def from_json(cls, json_path, batch_size, **kwargs):
+        with open(json_path) as f:
+            return cls(json.load(f), batch_size, **kwargs)
+
+    def reset(self):
+        B = self.batch_size
+        self.owner = np.broadcast_to(self._owner0, (B,) + self._owner0.shape).copy()
+        self.units = np.broadcast_to(self._units0, (B,) + self._units0.shape).copy()  # [B, N, owner, unit]
+        self.moved = np.zeros_like(self.units)  # units that moved this turn, counted where they are now
+        self.in_combat = np.zeros(self.units.shape, dtype=bool)
+        self.battle = np.zeros(self.owner.shape, dtype=bool)
+        self.pus = np.broadcast_to(self._pus0, (B, len(self.players))).copy()
+        self.unplaced = np.zeros((B, len(self.players), len(self.unit_types)), dtype=np.int32)
+        self.done = np.zeros(B, dtype=bool)
+        self.winner = np.full(B, -1, dtype=np.int32)
+        self.player = 0
+        self.phase = "purchase"
+        self.round = 1
+        return self.observe()
+
+    # --- Purchase ---
+    def purchase(self, counts):
+        """Buy counts[b, unit] into the current player's unplaced pool. Games that cannot afford it buy nothing."""
+        p = self.player
+        counts = np.where(self.buyable, np.maximum(np.asarray(counts, dtype=np.int64), 0), 0)
+        total = counts @ self.cost
+        ok = (total <= self.pus[:, p]) & ~self.done
+        self.unplaced[ok, p] += counts[ok].astype(np.int32)
+        self.pus[ok, p] -= total[ok]
+        self.phase = "combat"
+        return ok
+
+    # --- Movement ---
+    def move(self, src, dst, unit, quantity):
+        """
+        One move per game: quantity[b] unmoved units of type unit[b] from src[b] to dst[b] (indices).
+        In the noncombat phase dst must be an own territory with no enemy units. Returns the
+        quantity actually moved (0 where the move is illegal).
+        """
+        b = np.arange(self.batch_size)
+        p = self.player
+        src, dst, unit = np.asarray(src), np.asarray(dst), np.asarray(unit)
+        available = self.units[b, src, p, unit] - self.moved[b, src, p, unit]
+        qty = np.clip(np.asarray(quantity), 0, available)
+        ok = (src != dst) & (self.distance[src, dst] <= self.movement[unit]) & ~self.done
+        if self.phase == "noncombat":
+            enemy = self.units[b, dst].sum(axis=-1).sum(axis=-1) - self.units[b, dst, p].sum(axis=-1)
+            ok &= (self.owner[b, dst] == p) & (enemy == 0)
+        qty = np.where(ok, qty, 0).astype(np.int32)
+        self.units[b, src, p, unit] -= qty
+        self.units[b, dst, p, unit] += qty
+        self.moved[b, dst, p, unit] += qty
+        return qty
+
+    # --- Combat ---
+    def _take_casualties(self, counts, hits):
+        for u in self.casualty_order:
+            take = np.minimum(counts[..., u], hits)
+            counts[..., u] -= take
+            hits = hits - take
+        return counts
+
+    def resolve_battles(self):
+        """
+        Fight every territory where the current player has combat units and either does not own it
+        or meets other owners' combat units: rounds of binomial dice (hit on attack/6, defense/6)
+        until one side is gone or max_battle_rounds. Attackers left alone take the territory and any
+        non-combat units (factories) in it.
+        """
+        p = self.player
+        combat = self.combat_unit
+        mine = self.units[:, :, p, :] * combat  # [B, N, U]
+        others = self.units * combat  # [B, N, owner, U]
+        others[:, :, p, :] = 0
+        sites = (mine.sum(-1) > 0) & ((self.owner != p) | (others.sum((-1, -2)) > 0)) & ~self.done[:, None]
+        bi, ni = np.nonzero(sites)
+        # dice are only rolled for the battle sites, gathered into [K, ...] arrays
+        attackers, defenders = mine[bi, ni], others[bi, ni]
+        self.battle[bi, ni] = True
+        self.in_combat[bi, ni, p, :] |= attackers > 0
+        self.in_combat[bi, ni] |= defenders > 0
+
+        attack_p, defense_p = self.attack / 6.0, self.defense / 6.0
+        for _ in range(self.max_battle_rounds):
+            active = (attackers.sum(-1) > 0) & (defenders.sum((-1, -2)) > 0)
+            if not active.any():
+                break
+            attack_hits = self.rng.binomial(attackers * active[:, None], attack_p).sum(-1)
+            defense_hits = self.rng.binomial(defenders.sum(axis=1) * active[:, None], defense_p).sum(-1)
+            attackers = self._take_casualties(attackers, defense_hits)
+            for u in self.casualty_order:
+                for o in range(self.num_owners):
+                    take = np.minimum(defenders[:, o, u], attack_hits)
+                    defenders[:, o, u] -= take
+                    attack_hits = attack_hits - take
+
+        noncombat = self.units[bi, ni] * ~combat
+        self.units[bi, ni] = defenders + noncombat
+        self.units[bi, ni, p, :] = attackers + noncombat[:, p, :]
+        self.moved[bi, ni] = np.minimum(self.moved[bi, ni], self.units[bi, ni])
+
+        won = (attackers.sum(-1) > 0) & (defenders.sum((-1, -2)) == 0) & (self.owner[bi, ni] != p)
+        cb, cn = bi[won], ni[won]
+        self.owner[cb, cn] = p
+        # factories and other non-combat units change hands with the territory
+        taken = noncombat[won]
+        self.units[cb, cn] -= taken
+        self.units[cb, cn, p, :] += taken.sum(axis=1)
+        captured = np.zeros_like(sites)
+        captured[cb, cn] = True
+
+        vcs = np.stack([(self.owner == i) & self.victory for i in range(len(self.players))], axis=1).sum(-1)
+        victors = ~self.done & (vcs.max(axis=1) >= self.victory_cities_needed)
+        self.winner[victors] = vcs[victors].argmax(axis=1)
+        self.done |= victors
+        self.phase = "noncombat"
+        return captured
+
+    # --- Placement, income, turn order ---
+    def place(self, territory=None):
+        """
+        Place the current player's whole unplaced pool in territory[b] if it is an own factory
+        territory, else in the first one; games without a factory keep the pool.
+        """
+        b = np.arange(self.batch_size)
+        p = self.player
+        if self.factory is None:
+            sites = self.owner == p
+        else:
+            sites = (self.owner == p) & (self.units[:, :, p, self.factory] > 0)
+        target = sites.argmax(axis=1)
+        if territory is not None:
+            territory = np.asarray(territory)
+            target = np.where(sites[b, territory], territory, target)
+        ok = sites[b, target] & ~self.done
+        self.units[b[ok], target[ok], p, :] += self.unplaced[ok, p]
+        self.unplaced[ok, p] = 0
+        self.phase = "place"
+        return ok
+
+    def end_turn(self):
+        p = self.player
+        income = ((self.owner == p) * self.production).sum(axis=1)
+        self.pus[:, p] += np.where(self.done, 0, income)
+        self.moved[:] = 0
+        self.in_combat[:] = False
+        self.battle[:] = False
+        self.player = (p + 1) % len(self.players)
+        if self.player == 0:
+            self.round += 1
+            if self.round > self.max_rounds:
+                self.done[:] = True
+        self.phase = "purchase"
+
+    # --- Observation ---
+    def observe(self):
+        """
+        get_state_encoding for every game: node_features [B, N, P + 7] (owner one-hot, total units,
+        avg attack, avg defense, frac in combat, avg moved, is victory city, in battle),
+        global_features [B, 3] (delegate one-hot, all zero while placing) and the shared adjacency [N, N].
+        """
+        B, n = self.owner.shape
+        owner_onehot = np.zeros((B, n, len(self.players)), dtype=np.float32)
+        owned = self.owner < self.neutral
+        bi, ni = np.nonzero(owned)
+        owner_onehot[bi, ni, self.owner[bi, ni]] = 1.0
+
+        stacks = self.units > 0  # one CaptureTheFlagGraph unit stack per (territory, owner, unit type)
+        n_stacks = np.maximum(stacks.sum((2, 3)), 1)
+        rule_stacks = stacks & self.buyable  # averages only cover units with a production rule
+        n_rule = np.maximum(rule_stacks.sum((2, 3)), 1)
+        numeric = np.stack([
+            self.units.sum((2, 3)),
+            (rule_stacks * self.attack).sum((2, 3)) / n_rule,
+            (rule_stacks * self.defense).sum((2, 3)) / n_rule,
+            (stacks & self.in_combat).sum((2, 3)) / n_stacks,
+            (stacks & (self.moved > 0)).sum((2, 3)) / n_stacks,
+            np.broadcast_to(self.victory, (B, n)),
+            self.battle,
+        ], axis=-1).astype(np.float32)
+
+        global_features = np.zeros((B, len(DELEGATE_TYPES)), dtype=np.float32)
+        if self.phase in DELEGATE_TYPES:
+            global_features[:, DELEGATE_TYPES.index(self.phase)] = 1.0
+        return {
+            "node_features": np.concatenate([owner_onehot, numeric], axis=-1),
+            "global_features": global_features,
+            "adjacency": self.adjacency,
+        }
+
+    # --- Random self-play ---
+    def _random_moves(self, moves):
+        p = self.player
+        B = self.batch_size
+        for _ in range(moves):
+            available = (self.units[:, :, p, :] - self.moved[:, :, p, :]) * (self.movement > 0)
+            flat = available.reshape(B, -1)
+            pick = (self.rng.random(flat.shape) * (flat > 0)).argmax(axis=1)
+            src, unit = np.divmod(pick, len(self.unit_types))
+            reach = (self.distance[src] <= self.movement[unit][:, None]) & (self.distance[src] > 0)
+            if self.phase == "noncombat":
+                reach &= self.owner == p
+            dst = (self.rng.random(reach.shape) * reach).argmax(axis=1)
+            qty = self.rng.integers(1, np.maximum(flat[np.arange(B), pick], 1) + 1)
+            self.move(src, dst, unit, np.where(flat[np.arange(B), pick] > 0, qty, 0))
+
+    def random_turn(self, moves_per_phase=4):
+        """Play one turn of the current player in every game with uniformly random legal choices."""
+        B = self.batch_size
+        p = self.player
+        buyable = np.flatnonzero(self.buyable)
+        unit = buyable[self.rng.integers(0, len(buyable), size=B)]
+        qty = self.rng.integers(0, self.pus[:, p] // np.maximum(self.cost[unit], 1) + 1)
+        counts = np.zeros((B, len(self.unit_types)), dtype=np.int64)
+        counts[np.arange(B), unit] = qty
+        self.purchase(counts)
+        self._random_moves(moves_per_phase)
+        self.resolve_battles()
+        self._random_moves(moves_per_phase)
+        self.place()
+        self.end_turn()
@@ -0,0 +1,367 @@
+"""
+Benchmark suite for the agent's hot paths on synthetic maps.
+
+Generates maps in the parse_triplea_map output schema (any number of territories, many unit
+stacks) plus matching CHANGE-line streams, then times apply_change_line, every
+generate_legal_* function, get_state_encoding and append_state_to_csv (dense and sparse),
+one random self-play turn of batch_env over 64 games and a GraphValueNet pass over 64
+candidate states.
+
+    python3 benchmark.py --sizes 29 200 1000
+    python3 benchmark.py --save-baseline benchmark_baseline.json
+    python3 benchmark.py --baseline benchmark_baseline.json   # exits 1 on regression
+"""
+import argparse
+import contextlib
+import json
+import math
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from collections import deque
+
+import numpy as np
+
+import checkpoint
+from attack_plans import collect_attack_options
+import greedy_model as gm
+from batch_env import BatchCTFEnv
+from gnn_inference import GraphValueNet
+from state_publisher import StatePublisher
+
+
+PLAYERS = ["Russians", "Italians", "Germans", "Chinese"]
+
+UNIT_STATS = {
+    "infantry": {"movement": 1, "attack": 1, "defense": 2},
+    "artillery": {"movement": 1, "attack": 2, "defense": 2},
+    "armour": {"movement": 2, "attack": 3, "defense": 2},
+    "fighter": {"movement": 4, "attack": 3, "defense": 4},
+    "bomber": {"movement": 6, "attack": 4, "defense": 1},
+    "aaGun": {"movement": 1, "attack": 0, "defense": 0},
+}
+
+PRODUCTION_RULES = {
+    "buyInfantry": {"unit": "infantry", "cost": 3},
+    "buyArtillery": {"unit": "artillery", "cost": 4},
+    "buyArmour": {"unit": "armour", "cost": 5},
+    "buyFighter": {"unit": "fighter", "cost": 12},
+    "buyBomber": {"unit": "bomber", "cost": 15},
+    "buyAAGun": {"unit": "aaGun", "cost": 5},
+}
+
+MOBILE_UNITS = ["infantry", "artillery", "armour", "fighter", "bomber"]
+
+BATCH_ENV_GAMES = 64
+
+
+def make_synthetic_map(num_territories, num_players=4, stacks_per_territory=3,
+                       neutral_fraction=0.1, extra_edge_fraction=0.15, seed=0):
+    """Build a map dict in the same schema parse_triplea_map writes to JSON."""
+    rng = random.Random(seed)
+    players = PLAYERS[:num_players] if num_players <= len(PLAYERS) else [f"Player{i}" for i in range(num_players)]
+    width = max(2, int(math.ceil(math.sqrt(num_territories))))
+    territories = [f"T{i}" for i in range(num_territories)]
+
+    # --- grid topology with some random diagonals ---
+    connections = []
+    neighbors = {t: [] for t in territories}
+    for i in range(num_territories):
+        row, col = divmod(i, width)
+        candidates = [(row, col + 1), (row + 1, col)]
+        if rng.random() < extra_edge_fraction:
+            candidates.append((row + 1, col + 1))
+        for r, c in candidates:
+            j = r * width + c
+            if c < width and j < num_territories:
+                connections.append({"from": territories[i], "to": territories[j]})
+                neighbors[territories[i]].append(territories[j])
+                neighbors[territories[j]].append(territories[i])
+
+    # --- ownership: bases spread over the grid, territories go to the nearest base ---
+    step = max(1, num_territories // num_players)
+    bases = [territories[min(num_territories - 1, k * step + step // 2)] for k in range(num_players)]
+    owner = {}
+    queue = deque()
+    for player, base in zip(players, bases):
+        owner[base] = player
+        queue.append(base)
+    while queue:
+        t = queue.popleft()
+        for n in neighbors[t]:
+            if n not in owner:
+                owner[n] = owner[t]
+                queue.append(n)
+    starting_ownership = {}
+    for t in territories:
+        if t in bases or rng.random() >= neutral_fraction:
+            starting_ownership[t] = owner.get(t, players[0])
+
+    # --- unit stacks ---
+    starting_units = []
+    for t in territories:
+        terr_owner = starting_ownership.get(t, "Neutral")
+        for unit in rng.sample(MOBILE_UNITS, min(stacks_per_territory, len(MOBILE_UNITS))):
+            starting_units.append({
+                "unit": unit, "territory": t, "quantity": rng.randint(1, 6), "owner": terr_owner
+            })
+    for player, base in zip(players, bases):
+        starting_units.append({"unit": "factory", "territory": base, "quantity": 1, "owner": player})
+
+    return {
+        "territories": territories,
+        "connections": connections,
+        "players": players,
+        "units": list(UNIT_STATS) + ["factory"],
+        "unit_stats": UNIT_STATS,
+        "production_rules": PRODUCTION_RULES,
+        "starting_ownership": starting_ownership,
+        "starting_units": starting_units,
+        "initial_resources": {p: 12 + 3 * i for i, p in enumerate(players)},
+        "victory_cities": bases,
+    }
+
+
+def make_change_stream(map_data, num_lines, seed=0):
+    """
+    Generate CHANGE lines in the format ServerGame forwards to the agent, applied against a
+    shadow copy of the map so every move, removal and capture refers to units that exist.
+    """
+    rng = random.Random(seed)
+    neighbors = {t: [] for t in map_data["territories"]}
+    for conn in map_data["connections"]:
+        neighbors[conn["from"]].append(conn["to"])
+        neighbors[conn["to"]].append(conn["from"])
+    owner = {t: map_data["starting_ownership"].get(t, "Neutral") for t in map_data["territories"]}
+    stacks = {}  # (territory, owner, unit) -> qty
+    for u in map_data["starting_units"]:
+        # neutral units never move, so only player-owned stacks take part in the stream
+        if u["unit"] in MOBILE_UNITS and u["owner"] in map_data["players"]:
+            key = (u["territory"], u["owner"], u["unit"])
+            stacks[key] = stacks.get(key, 0) + u["quantity"]
+    players = map_data["players"]
+
+    lines = []
+    while len(lines) < num_lines:
+        kind = rng.random()
+        if kind < 0.55 and stacks:
+            # move: remove from source, add to neighbor, flag as moved
+            (terr, unit_owner, unit) = rng.choice(list(stacks))
+            dest = rng.choice(neighbors[terr]) if neighbors[terr] else terr
+            qty = rng.randint(1, stacks[(terr, unit_owner, unit)])
+            units = ", ".join([f"{unit} owned by {unit_owner}"] * qty)
+            lines.append(
+                f"[CHANGE] CompositeChange <[Remove unit change. Remove from: {terr} units: [{units}], "
+                f"Add unit change. Add to: {dest} units: [{units}], "
+                f"Property change, unit:{unit} owned by {unit_owner} property:alreadyMoved newValue:1 oldValue:0]>"
+            )
+            stacks[(terr, unit_owner, unit)] -= qty
+            if stacks[(terr, unit_owner, unit)] <= 0:
+                del stacks[(terr, unit_owner, unit)]
+            stacks[(dest, unit_owner, unit)] = stacks.get((dest, unit_owner, unit), 0) + qty
+        elif kind < 0.7:
+            player = rng.choice(players)
+            terr = rng.choice(map_data["territories"])
+            lines.append(f"[CHANGE] {player} takes {terr} from {owner[terr]}")
+            owner[terr] = player
+        elif kind < 0.8:
+            player = rng.choice(players)
+            lines.append(f"[CHANGE] Change resource.  Resource:PUs quantity:{rng.randint(-6, 10)} Player:{player}")
+        elif kind < 0.9 and stacks:
+            (terr, unit_owner, unit) = rng.choice(list(stacks))
+            lines.append(
+                f"[CHANGE] Property change, unit:{unit} owned by {unit_owner} "
+                f"property:wasInCombat newValue:true oldValue:false"
+            )
+        else:
+            player = rng.choice(players)
+            unit = rng.choice(MOBILE_UNITS)
+            units = ", ".join([f"{unit} owned by {player}"] * rng.randint(1, 4))
+            lines.append(f"[CHANGE] Add unit change. Add to: {player} units: [{units}]")
+    return lines
+
+
+def _time(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return {"median_s": statistics.median(samples), "min_s": min(samples), "repeat": repeat}
+
+
+def run_case(name, map_path, change_lines, repeat=5):
+    """Time every stage on one map. Returns {benchmark: timing}."""
+    results = {}
+    tmp_dir = tempfile.mkdtemp(prefix="ctf_bench_")
+    csv_path = os.path.join(tmp_dir, "states.csv")
+
+    # per-mutation messages are DEBUG and skipped at the default level; keep the rest off the terminal
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        ctf = gm.CaptureTheFlagGraph(map_path, display=False)
+        player = ctf.data["players"][0]
+        ctf.update_my_role(player)
+        agent = gm.OnlineGreedyAgent(10)
+
+        def apply_stream():
+            for line in change_lines:
+                ctf.apply_change_line(line, 0)
+
+        start = time.perf_counter()
+        apply_stream()
+        elapsed = time.perf_counter() - start
+        results["apply_change_line"] = {
+            "median_s": elapsed, "min_s": elapsed, "repeat": 1,
+            "per_line_us": elapsed / max(1, len(change_lines)) * 1e6,
+        }
+        if not ctf.verify_state_hash():
+            raise AssertionError("incremental state hash diverged from full recomputation")
+        if not ctf.verify_aggregates():
+            raise AssertionError("incremental per-player aggregates diverged from full recomputation")
+        _, landing = ctf.air_index.landing_distances(ctf, player)
+        for target, groups in collect_attack_options(ctf, player).items():
+            for unit, group in groups.items():
+                move_range = ctf.production_rules.get(unit, {}).get("move", 1)
+                if unit in ctf.air_units and any(
+                        len(path) - 1 + landing[ctf.node_index[target]] > move_range for _, _, path in group["sources"]):
+                    raise AssertionError(f"attack option sends {unit} to {target} with no landing territory in range")
+        results["compute_state_hash"] = _time(ctf.compute_state_hash, repeat)
+        results["aggregate_vector"] = _time(ctf.aggregate_vector, repeat)
+
+        results["generate_legal_combat_moves"] = _time(lambda: gm.generate_legal_combat_moves(ctf, player), repeat)
+        results["generate_attack_plans_k10"] = _time(lambda: list(gm.generate_attack_plans(ctf, player, k=10)), repeat)
+        results["air_index_rebuild"] = _time(lambda: gm.AirMovementIndex().distances(ctf), repeat)
+        # a fresh map rebuilds the reach matrices too; within a phase the result is cached
+        results["influence_map"] = _time(lambda: gm.InfluenceMap().compute(ctf, "combat"), repeat)
+        results["generate_legal_noncombat_moves"] = _time(lambda: gm.generate_legal_noncombat_moves(ctf, player), repeat)
+
+        def place():
+            ctf.add_unit(player, "infantry", player, 2)
+            ctf.add_unit(player, "armour", player, 1)
+            gm.generate_legal_place_moves(ctf, player)
+        results["generate_legal_place_moves"] = _time(place, repeat)
+
+        ctf.update_pus(player, 18 - ctf.get_player_resources(player))
+        results["generate_legal_purchase_moves"] = _time(lambda: gm.generate_legal_purchase_moves(ctf, player), repeat)
+
+        # a fresh agent re-encodes every territory; the warm agent only re-encodes what changed
+        results["get_state_encoding_cold"] = _time(lambda: gm.OnlineGreedyAgent(10).get_state_encoding(ctf, "combat"), repeat)
+        results["get_state_encoding"] = _time(lambda: agent.get_state_encoding(ctf, "combat"), repeat)
+        results["get_state_encoding_cache_hit"] = _time(lambda: agent.cached_state_encoding(ctf, "combat"), repeat)
+        state = agent.get_state_encoding(ctf, "combat")
+        value_net = GraphValueNet.random(state["node_features"].shape[1], len(state["global_features"]))
+        candidates = np.repeat(state["node_features"][None].astype(np.float32), BATCH_ENV_GAMES, axis=0)
+        candidate_globals = np.repeat(state["global_features"][None], BATCH_ENV_GAMES, axis=0)
+        edge_index, _, indptr = ctf.get_edge_index()
+        results[f"gnn_value_b{BATCH_ENV_GAMES}"] = _time(
+            lambda: value_net.predict_shared(candidates, indptr, edge_index[1], candidate_globals), repeat)
+        results["append_state_to_csv"] = _time(lambda: gm.append_state_to_csv(state, base_filename=csv_path), repeat)
+        publisher = StatePublisher(f"ctf_bench_{os.getpid()}")
+        try:
+            results["state_shm_publish"] = _time(lambda: publisher.publish(state, ctf.topology_version), repeat)
+        finally:
+            publisher.close()
+
+        sparse_agent = gm.OnlineGreedyAgent(10, sparse_adjacency=True)
+        sparse_csv_path = os.path.join(tmp_dir, "sparse_states.csv")
+        results["get_state_encoding_sparse"] = _time(lambda: sparse_agent.get_state_encoding(ctf, "combat"), repeat)
+        sparse_state = sparse_agent.get_state_encoding(ctf, "combat")
+        results["append_state_to_csv_sparse"] = _time(
+            lambda: gm.append_state_to_csv(sparse_state, base_filename=sparse_csv_path), repeat)
+
+        checkpoint_path = os.path.join(tmp_dir, "state.ckpt")
+        results["save_checkpoint"] = _time(lambda: checkpoint.save_checkpoint(ctf, checkpoint_path), repeat)
+        results["restore_checkpoint"] = _time(lambda: checkpoint.restore_checkpoint(ctf, checkpoint_path), repeat)
+
+        env = BatchCTFEnv(ctf.data, BATCH_ENV_GAMES)
+        results[f"batch_env_random_turn_b{BATCH_ENV_GAMES}"] = _time(env.random_turn, repeat)
+
+    for path in (csv_path, sparse_csv_path, gm.sparse_edges_filename(sparse_csv_path), checkpoint_path):
+        with contextlib.suppress(OSError):
+            os.remove(path)
+    with contextlib.suppress(OSError):
+        os.rmdir(tmp_dir)
+    return results
+
+
+def run_suite(sizes, change_lines=2000, repeat=5, seed=0, real_map=None):
+    suite = {}
+    tmp_dir = tempfile.mkdtemp(prefix="ctf_maps_")
+    cases = []
+    if real_map:
+        with open(real_map) as f:
+            cases.append(("real_map", real_map, json.load(f)))
+    for n in sizes:
+        map_data = make_synthetic_map(n, seed=seed)
+        path = os.path.join(tmp_dir, f"synthetic_{n}.json")
+        with open(path, "w") as f:
+            json.dump(map_data, f)
+        cases.append((f"synthetic_{n}", path, map_data))
+
+    for name, path, map_data in cases:
+        lines = make_change_stream(map_data, change_lines, seed=seed)
+        print(f"--- {name}: {len(map_data['territories'])} territories, "
+              f"{len(map_data['starting_units'])} unit stacks, {len(lines)} change lines")
+        results = run_case(name, path, lines, repeat=repeat)
+        for bench, timing in results.items():
+            print(f"  {bench:32s} {timing['median_s'] * 1e3:10.3f} ms")
+        suite[name] = {"territories": len(map_data["territories"]), "results": results}
+    return suite
+
+
+def compare_to_baseline(suite, baseline, tolerance):
+    """Return a list of (case, benchmark, baseline_s, current_s) that got slower than tolerance allows."""
+    regressions = []
+    for case, data in suite.items():
+        base_case = baseline.get(case)
+        if not base_case:
+            continue
+        for bench, timing in data["results"].items():
+            base = base_case["results"].get(bench)
+            if not base:
+                continue
+            if timing["median_s"] > base["median_s"] * (1.0 + tolerance):
+                regressions.append((case, bench, base["median_s"], timing["median_s"]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the agent on synthetic TripleA maps")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[29, 200, 1000])
+    parser.add_argument("--change-lines", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--real-map", default="gameInfo/Capture The Flag.json")
+    parser.add_argument("--baseline", help="compare against this baseline file, exit 1 on regression")
+    parser.add_argument("--save-baseline", help="write the results to this baseline file")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown vs baseline (0.25 = 25%%)")
+    parser.add_argument("--output", help="write the full results as JSON")
+    args = parser.parse_args(argv)
+
+    real_map = args.real_map if args.real_map and os.path.exists(args.real_map) else None
+    suite = run_suite(args.sizes, args.change_lines, args.repeat, args.seed, real_map)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(suite, f, indent=2)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(suite, f, indent=2)
+        print(f"Baseline saved to {args.save_baseline}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(suite, baseline, args.tolerance)
+        for case, bench, base, current in regressions:
+            print(f"REGRESSION {case}/{bench}: {base * 1e3:.3f} ms -> {current * 1e3:.3f} ms")
+        if regressions:
+            return 1
+        print("No regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
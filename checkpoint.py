@@ -0,0 +1,93 @@
+import os
+import pickle
+import struct
+import time
+import zlib
+
+from agent_log import log
+
+# file layout: header (magic, format version, flags, crc32 of payload, payload length) + zlib(pickle(state))
+CHECKPOINT_MAGIC = b"CTFC"
+CHECKPOINT_VERSION = 1
+HEADER = struct.Struct("<4sHHIQ")
+
+
+def encode_checkpoint(state, level=1):
+    payload = zlib.compress(pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL), level)
+    return HEADER.pack(CHECKPOINT_MAGIC, CHECKPOINT_VERSION, 0, zlib.crc32(payload), len(payload)) + payload
+
+
+def decode_checkpoint(blob):
+    if len(blob) < HEADER.size:
+        raise ValueError("Checkpoint is truncated")
+    magic, version, _flags, crc, length = HEADER.unpack_from(blob)
+    if magic != CHECKPOINT_MAGIC:
+        raise ValueError("Not a checkpoint file")
+    if version != CHECKPOINT_VERSION:
+        raise ValueError(f"Unsupported checkpoint version {version}")
+    payload = blob[HEADER.size:HEADER.size + length]
+    if len(payload) != length or zlib.crc32(payload) != crc:
+        raise ValueError("Checkpoint is corrupt (length or CRC mismatch)")
+    return pickle.loads(zlib.decompress(payload))
+
+
+def save_checkpoint(ctf, path):
+    """Write ctf's state to path atomically (tmp file + rename). Returns the file size in bytes."""
+    blob = encode_checkpoint(ctf.to_checkpoint())
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(blob)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return len(blob)
+
+
+def load_checkpoint(path):
+    with open(path, "rb") as f:
+        return decode_checkpoint(f.read())
+
+
+def restore_checkpoint(ctf, path):
+    """Restore ctf from path. Returns False (leaving ctf untouched) if there is no usable checkpoint."""
+    if not os.path.exists(path):
+        return False
+    try:
+        ctf.restore(load_checkpoint(path))
+    except (OSError, ValueError, pickle.UnpicklingError, zlib.error) as e:
+        log.warning("checkpoint", "Ignoring checkpoint {}: {}", path, e)
+        return False
+    return True
+
+
+class Checkpointer:
+    """
+    Periodic checkpoints for agent_loop: maybe_save() writes when the state changed since the last
+    save and either `interval` seconds or `every_changes` state versions have passed.
+    """
+
+    def __init__(self, path, interval=5.0, every_changes=None):
+        self.path = path
+        self.interval = interval
+        self.every_changes = every_changes
+        self._saved_version = None
+        self._last_save = time.monotonic()
+        self.saves = 0
+        self.last_size = 0
+
+    def maybe_save(self, ctf):
+        if ctf.state_version == self._saved_version:
+            return False
+        due = self.interval is not None and time.monotonic() - self._last_save >= self.interval
+        if self.every_changes is not None and self._saved_version is not None:
+            due = due or ctf.state_version - self._saved_version >= self.every_changes
+        if not due and self._saved_version is not None:
+            return False
+        self.save(ctf)
+        return True
+
+    def save(self, ctf):
+        self.last_size = save_checkpoint(ctf, self.path)
+        self._saved_version = ctf.state_version
+        self._last_save = time.monotonic()
+        self.saves += 1
@@ -0,0 +1,240 @@
+"""
+Streaming statistics, deduplication and normalization of a state dataset written by
+append_state_to_csv (dense or sparse rows).
+
+One pass over the input drops exact-duplicate rows (repeated [MY_MOVE] requests within a phase
+encode the same position), parses the remaining rows on worker processes and merges their
+per-column Welford accumulators. The unique rows are then written z-score normalized with the
+statistics next to them, e.g. for state_dataset2.csv:
+
+    state_dataset2_norm.csv          normalized node_feat_* / global_* columns; round, adj_* and
+                                     topology columns copied unchanged
+    state_dataset2_norm_stats.json   count, mean, var, std, min, max per normalized column
+    state_dataset2_norm_edges.csv    copy of the sparse edges sidecar, if there is one
+
+    python3 dataset_stats.py state_dataset2.csv --workers 4
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+from multiprocessing import Pool
+
+import numpy as np
+
+from greedy_model import sparse_edges_filename
+
+NORMALIZED_PREFIXES = ("node_feat_", "global_")
+
+
+class RunningStats:
+    """
+    Per-column count, mean, sum of squared deviations (M2), min and max. update() folds in a
+    batch of rows; merge() combines accumulators built on disjoint rows (Chan et al.), so workers
+    can each summarise their chunk and the results are added up in any order.
+    """
+
+    def __init__(self, dim):
+        self.count = 0
+        self.mean = np.zeros(dim)
+        self.m2 = np.zeros(dim)
+        self.min = np.full(dim, np.inf)
+        self.max = np.full(dim, -np.inf)
+
+    @classmethod
+    def of(cls, x):
+        stats = cls(x.shape[1])
+        if len(x):
+            stats.count = len(x)
+            stats.mean = x.mean(axis=0)
+            stats.m2 = ((x - stats.mean) ** 2).sum(axis=0)
+            stats.min = x.min(axis=0)
+            stats.max = x.max(axis=0)
+        return stats
+
+    def update(self, x):
+        self.merge(RunningStats.of(np.asarray(x, dtype=np.float64)))
+
+    def merge(self, other):
+        if other.count == 0:
+            return self
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean = self.mean + delta * (other.count / total)
+        self.m2 = self.m2 + other.m2 + delta ** 2 * (self.count * other.count / total)
+        self.count = total
+        np.minimum(self.min, other.min, out=self.min)
+        np.maximum(self.max, other.max, out=self.max)
+        return self
+
+    @property
+    def var(self):
+        return self.m2 / self.count if self.count else np.zeros_like(self.m2)
+
+    @property
+    def std(self):
+        return np.sqrt(self.var)
+
+    def to_dict(self, columns):
+        return {
+            "count": self.count,
+            "columns": list(columns),
+            "mean": self.mean.tolist(),
+            "var": self.var.tolist(),
+            "std": self.std.tolist(),
+            "min": self.min.tolist(),
+            "max": self.max.tolist(),
+        }
+
+
+class DedupFilter:
+    """
+    Exact-duplicate filter over 64-bit content hashes with bounded memory: hashes go into the
+    current generation, which is retired once it holds capacity / 2 entries, and a row is a
+    duplicate if either the current or the previous generation has seen it. Duplicates further
+    apart than a generation can slip through; repeated states in the logs are close together.
+    """
+
+    def __init__(self, capacity=2_000_000):
+        self.generation_size = max(1, capacity // 2)
+        self.current = set()
+        self.previous = set()
+        self.seen = 0
+        self.duplicates = 0
+
+    def add(self, line):
+        """True if line is new, False if it is a duplicate of a remembered row."""
+        self.seen += 1
+        key = int.from_bytes(hashlib.blake2b(line, digest_size=8).digest(), "little")
+        if key in self.current or key in self.previous:
+            self.duplicates += 1
+            return False
+        if len(self.current) >= self.generation_size:
+            self.previous, self.current = self.current, set()
+        self.current.add(key)
+        return True
+
+
+def _parse_chunk(args):
+    """Worker: parse CSV lines into a float64 matrix and summarise the normalized columns."""
+    lines, normalized = args
+    x = np.loadtxt(io.BytesIO(b"\n".join(lines)), delimiter=",", dtype=np.float64, ndmin=2)
+    return x, RunningStats.of(x[:, normalized])
+
+
+def _format_chunk(args):
+    """Worker: normalize one chunk of parked rows and format it as CSV text."""
+    x, normalized, mean, std, fmt = args
+    x[:, normalized] = (x[:, normalized] - mean) / std
+    text = io.StringIO()
+    np.savetxt(text, x, fmt=fmt, delimiter=",")
+    return text.getvalue()
+
+
+def _parked_chunks(rows, width, chunk_rows, *args):
+    rows.seek(0)
+    while True:
+        x = np.fromfile(rows, dtype=np.float64, count=chunk_rows * width)
+        if not len(x):
+            return
+        yield (x.reshape(-1, width),) + args
+
+
+def _chunks(f, dedup, chunk_rows, normalized):
+    lines = []
+    for line in f:
+        line = line.rstrip(b"\r\n")
+        if line and dedup.add(line):
+            lines.append(line)
+            if len(lines) == chunk_rows:
+                yield lines, normalized
+                lines = []
+    if lines:
+        yield lines, normalized
+
+
+def default_output(path):
+    root, ext = os.path.splitext(path)
+    return f"{root}_norm{ext or '.csv'}"
+
+
+def stats_filename(output):
+    return os.path.splitext(output)[0] + "_stats.json"
+
+
+def load_stats(path):
+    """Columns, mean and std (0 replaced by 1) from a stats file, ready for (x - mean) / std."""
+    with open(path) as f:
+        stats = json.load(f)
+    std = np.asarray(stats["std"])
+    return stats["columns"], np.asarray(stats["mean"]), np.where(std > 0, std, 1.0)
+
+
+def process_dataset(path, output=None, workers=None, chunk_rows=4096, dedup_capacity=2_000_000):
+    """
+    Deduplicate, summarise and normalize the dataset at path. Returns the stats dict that is also
+    written to stats_filename(output).
+    """
+    output = output or default_output(path)
+    with open(path, "rb") as f:
+        header = f.readline().decode("utf-8").strip().split(",")
+        normalized = np.array([i for i, name in enumerate(header) if name.startswith(NORMALIZED_PREFIXES)], dtype=np.intp)
+        dedup = DedupFilter(dedup_capacity)
+        stats = RunningStats(len(normalized))
+
+        pool = Pool(workers) if workers != 0 else None
+        imap = pool.imap if pool else map
+        # unique rows are parked as raw float64 until the statistics are final
+        try:
+            with tempfile.TemporaryFile(dir=os.path.dirname(os.path.abspath(output))) as rows:
+                for x, chunk_stats in imap(_parse_chunk, _chunks(f, dedup, chunk_rows, normalized)):
+                    x.tofile(rows)
+                    stats.merge(chunk_stats)
+
+                std = np.where(stats.std > 0, stats.std, 1.0)
+                fmt = ["%.10g"] * len(header)
+                for i in normalized:
+                    fmt[i] = "%.7g"
+                with open(output, "w", newline="") as out:
+                    out.write(",".join(header) + "\n")
+                    chunks = _parked_chunks(rows, len(header), chunk_rows, normalized, stats.mean, std, fmt)
+                    for text in imap(_format_chunk, chunks):
+                        out.write(text)
+        finally:
+            if pool:
+                pool.close()
+                pool.join()
+
+    if os.path.exists(sparse_edges_filename(path)):
+        shutil.copyfile(sparse_edges_filename(path), sparse_edges_filename(output))
+
+    result = stats.to_dict(header[i] for i in normalized)
+    result.update(source=path, rows_in=dedup.seen, rows_out=stats.count, duplicates=dedup.duplicates)
+    with open(stats_filename(output), "w") as f:
+        json.dump(result, f)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Deduplicate and normalize a state dataset CSV")
+    parser.add_argument("dataset", nargs="?", default="state_dataset2.csv")
+    parser.add_argument("--output", help="normalized CSV (default '<dataset>_norm.csv')")
+    parser.add_argument("--workers", type=int, default=None, help="parser processes (default: CPU count, 0: none)")
+    parser.add_argument("--chunk-rows", type=int, default=4096)
+    parser.add_argument("--dedup-capacity", type=int, default=2_000_000,
+                        help="row hashes remembered for duplicate detection")
+    args = parser.parse_args(argv)
+
+    result = process_dataset(args.dataset, args.output, args.workers, args.chunk_rows, args.dedup_capacity)
+    output = args.output or default_output(args.dataset)
+    print(f"{result['rows_in']} rows, {result['duplicates']} duplicates dropped, "
+          f"{result['rows_out']} written to {output} (stats: {stats_filename(output)})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+import json
+import queue
+import socket
+import subprocess
+import time
+
+ENGINE_COMMAND = ("./gradlew", ":game-app:game-headed:run")
+BASE_CONTROL_PORT = 6000
+
+
+class EngineError(RuntimeError):
+    pass
+
+
+class Engine:
+    """
+    One warm TripleA engine: a game-headed JVM started with triplea.control.port, driven through
+    its control channel (EngineControlServer) with one command line per connection.
+    """
+
+    def __init__(self, control_port, command=ENGINE_COMMAND, host="127.0.0.1"):
+        self.control_port = control_port
+        self.command = list(command)
+        self.host = host
+        self.process = None
+        self.games = 0
+
+    def launch(self):
+        self.process = subprocess.Popen(self.command + [f"--args=triplea.control.port={self.control_port}"])
+
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def send(self, line, timeout=10.0):
+        """Send one control command and return its reply line; error replies raise EngineError."""
+        with socket.create_connection((self.host, self.control_port), timeout=timeout) as sock:
+            sock.sendall((line + "\n").encode("utf-8"))
+            reply = sock.makefile("r", encoding="utf-8").readline().strip()
+        if reply.startswith("{") and "error" in json.loads(reply):
+            raise EngineError(f"engine on port {self.control_port}: {json.loads(reply)['error']}")
+        return reply
+
+    def status(self):
+        return json.loads(self.send("STATUS"))
+
+    def wait_ready(self, timeout):
+        """Block until the control channel answers (Gradle, JVM and UI start-up), or raise EngineError."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if not self.alive():
+                raise EngineError(f"engine on port {self.control_port} exited during start-up")
+            try:
+                return self.status()
+            except OSError:
+                time.sleep(1.0)
+        raise EngineError(f"engine on port {self.control_port} not ready after {timeout:.0f}s")
+
+    def start_game(self, game, player_name=None, game_name=None, agent_port=None):
+        config = {"game": game}
+        for key, value in (("player_name", player_name), ("game_name", game_name), ("agent_port", agent_port)):
+            if value is not None:
+                config[key] = value
+        self.send("START " + json.dumps(config), timeout=120.0)
+        self.games += 1
+
+    def stop_game(self):
+        self.send("STOP", timeout=90.0)
+
+    def close(self, timeout=10.0):
+        if not self.alive():
+            return
+        try:
+            self.send("QUIT")
+            self.process.wait(timeout)
+        except (OSError, EngineError, subprocess.TimeoutExpired):
+            self.process.terminate()
+            self.process.wait()
+
+
+class EnginePool:
+    """
+    Keeps `size` engines started so games do not pay Gradle configuration, JVM start-up and map
+    loading each time. acquire() hands out an idle engine, release() stops its game and puts it
+    back; an engine whose process died, or that fails to stop its game, is replaced by a fresh one.
+    Control ports are base_port, base_port + 1, ...
+    """
+
+    def __init__(self, size=1, base_port=BASE_CONTROL_PORT, command=ENGINE_COMMAND, startup_timeout=600.0):
+        self.engines = [Engine(base_port + i, command) for i in range(size)]
+        self.startup_timeout = startup_timeout
+        self.idle = queue.Queue()
+        self.restarts = 0
+
+    def start(self):
+        for engine in self.engines:
+            engine.launch()
+        for engine in self.engines:
+            engine.wait_ready(self.startup_timeout)
+            self.idle.put(engine)
+        return self
+
+    def _restart(self, engine):
+        engine.close()
+        engine.launch()
+        engine.wait_ready(self.startup_timeout)
+        self.restarts += 1
+
+    def acquire(self, timeout=None):
+        engine = self.idle.get(timeout=timeout)
+        if not engine.alive():
+            self._restart(engine)
+        return engine
+
+    def release(self, engine):
+        try:
+            if engine.alive():
+                engine.stop_game()
+            else:
+                self._restart(engine)
+        except (OSError, EngineError):
+            self._restart(engine)
+        self.idle.put(engine)
+
+    def stats(self):
+        return {"engines": len(self.engines), "games": sum(e.games for e in self.engines), "restarts": self.restarts}
+
+    def close(self):
+        for engine in self.engines:
+            engine.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
@@ -16,6 +16,8 @@ public class CliProperties {
   @NonNls public static final String LOBBY_GAME_COMMENTS = "triplea.lobby.game.comments";
   @NonNls public static final String TRIPLEA_MAP_DOWNLOAD = "triplea.map.download";
   @NonNls public static final String TRIPLEA_MAP_DOWNLOAD_PREFIX = "triplea:";
+  // local port of the engine control channel (EngineControlServer), used by engine_pool.py
+  @NonNls public static final String TRIPLEA_CONTROL_PORT = "triplea.control.port";
 
   @NonNls public static final String TRIPLEA_START_LOCAL = "local";
   @NonNls public static final String TRIPLEA_START_PBF = "pbf";
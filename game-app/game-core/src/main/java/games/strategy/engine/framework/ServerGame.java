@@ -2,7 +2,8 @@ package games.strategy.engine.framework;
 
 import static com.google.common.base.Preconditions.checkNotNull;
 import static games.strategy.triplea.Constants.EDIT_MODE;
-import static games.strategy.triplea.ai.tripleMind.helper.logAI;
+import static games.strategy.triplea.ai.tripleMind.helper.logChange;
+import static games.strategy.triplea.ai.tripleMind.helper.logRoundStart;
 
 import games.strategy.engine.GameOverException;
 import games.strategy.engine.data.Change;
@@ -41,6 +42,7 @@ import games.strategy.engine.random.RandomStats;
 import games.strategy.net.INode;
 import games.strategy.net.Messengers;
 import games.strategy.net.websocket.ClientNetworkBridge;
+import games.strategy.triplea.ai.tripleMind.EngineSession;
 import games.strategy.triplea.delegate.DiceRoll;
 import games.strategy.triplea.delegate.EditDelegate;
 import games.strategy.triplea.settings.ClientSetting;
@@ -135,7 +137,7 @@ public class ServerGame extends AbstractGame {
             assertCorrectCaller();
             gameData.performChange(change);
             historyWriter.addChange(change);
-            logAI("CHANGE", change.toString());
+            logChange(change.toString(), gameData);
           }
 
           private void assertCorrectCaller() {
@@ -314,13 +316,15 @@ public class ServerGame extends AbstractGame {
   /** Starts the game in a new thread. */
   public void startGame() {
     int round = 0;
+    EngineSession.gameStarted(this);
     try {
       setUpGameForRunningSteps();
       while (!isGameOver) {
           if (round != gameData.getSequence().getRound())
           {
               round = gameData.getSequence().getRound();
-              logAI("INFO", "Starting Round " + round);
+              logRoundStart(round);
+              EngineSession.roundStarted(round);
           }
           runNextStep();
       }
@@ -1,7 +1,5 @@
 package games.strategy.triplea.ai.tripleMind;
 
-import com.google.gson.Gson;
-import com.google.gson.reflect.TypeToken;
 import games.strategy.engine.data.*;
 import games.strategy.engine.framework.GameDataManager;
 import games.strategy.engine.framework.GameDataUtils;
@@ -29,12 +27,12 @@ import lombok.Getter;
 import org.triplea.java.collections.IntegerMap;
 import org.triplea.util.Tuple;
 
-import java.lang.reflect.Type;
 import java.time.Duration;
 import java.time.Instant;
 import java.util.*;
 
 import static games.strategy.triplea.ai.tripleMind.ProPurchaseAi.doPlace;
+import static games.strategy.triplea.ai.tripleMind.helper.decodeActions;
 import static games.strategy.triplea.ai.tripleMind.helper.requestMove;
 import static games.strategy.triplea.ai.tripleMind.util.ProMoveUtils.doMove;
 import static games.strategy.triplea.ai.tripleMind.util.ProPurchaseUtils.getUnitProduction;
@@ -124,10 +122,7 @@ public abstract class AbstractTripleMindAi extends AbstractAi {
     boolean didCombatMove = false;
     boolean didNonCombatMove = false;
 
-    Gson gson = new Gson();
-    Type actionListType = new TypeToken<List<Action>>(){}.getType();
-    // skip if null
-    List<Action> actionsList = gson.fromJson(actions, actionListType);
+    List<Action> actionsList = decodeActions(actions);
 
 
 
@@ -154,13 +149,13 @@ public abstract class AbstractTripleMindAi extends AbstractAi {
                 return;
             }
 
-            Unit selectedUnit = availableUnits.get(0); // assuming 1 unit per action
+            List<Unit> selectedUnits = availableUnits.subList(0, Math.min(a.count(), availableUnits.size()));
 
             // Get or create ProTerritory for the target
             ProTerritory proTo = nonCombatMap.computeIfAbsent(to, t -> new ProTerritory(t, proData));
 
-            // Add attacking unit from source
-            proTo.addUnit(selectedUnit);
+            // Add moving units from source
+            proTo.addUnits(new ArrayList<>(selectedUnits));
 
             // Store it back
             nonCombatMap.put(to, proTo);
@@ -189,13 +184,13 @@ public abstract class AbstractTripleMindAi extends AbstractAi {
                 return;
             }
 
-            Unit selectedUnit = availableUnits.get(0); // assuming 1 unit per action
+            List<Unit> selectedUnits = availableUnits.subList(0, Math.min(a.count(), availableUnits.size()));
 
             // Get or create ProTerritory for the target
             ProTerritory proTo = attackMap.computeIfAbsent(to, t -> new ProTerritory(t, proData));
 
-            // Add attacking unit from source
-            proTo.addUnit(selectedUnit);
+            // Add attacking units from source
+            proTo.addUnits(new ArrayList<>(selectedUnits));
 
             // Store it back
             attackMap.put(to, proTo);
@@ -257,9 +252,7 @@ public abstract class AbstractTripleMindAi extends AbstractAi {
       purchaseAi.repair(pusToSpend, purchaseDelegate, data, player);
 
         final ProPurchaseOptionMap purchaseOptions = proData.getPurchaseOptions();
-        Gson gson = new Gson();
-        Type actionListType = new TypeToken<List<Action>>(){}.getType();
-        List<Action> actionsList = gson.fromJson(actions, actionListType);
+        List<Action> actionsList = decodeActions(actions);
         final Map<Territory, ProPurchaseTerritory> purchaseTerritories = new HashMap<>();
         for (Action a : actionsList) {
             Territory t = data.getMap().getTerritoryOrNull(a.to);
@@ -271,12 +264,11 @@ public abstract class AbstractTripleMindAi extends AbstractAi {
             }
             ProPurchaseTerritory ppt = purchaseTerritories.get(t);
             Optional<UnitType> unitType = data.getUnitTypeList().getUnitType(a.unit);
-            Unit unit = unitType.get().create(player);
             if (ppt.getCanPlaceTerritories().isEmpty()) {
 //                ppt.getCanPlaceTerritories().add(new ProPlaceTerritory(t, data, player));
                 ppt.getCanPlaceTerritories().add(new ProPlaceTerritory(t));
             }
-            ppt.getCanPlaceTerritories().get(0).getPlaceUnits().add(unit);
+            ppt.getCanPlaceTerritories().get(0).getPlaceUnits().addAll(unitType.get().create(a.count(), player));
         }
 
         final IntegerMap<ProductionRule> purchaseMap =
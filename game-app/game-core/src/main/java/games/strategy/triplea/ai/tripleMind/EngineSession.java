@@ -0,0 +1,111 @@
+package games.strategy.triplea.ai.tripleMind;
+
+import games.strategy.engine.framework.ServerGame;
+
+/**
+ * Lifecycle of the games a long-running engine plays one after another, for the engine control
+ * channel (EngineControlServer in game-headed, driven by engine_pool.py).
+ *
+ * <p>The control channel moves the engine from IDLE to STARTING, ServerGame.startGame reports
+ * RUNNING and round changes, and the launch action reports IDLE once the game has been torn down
+ * and the main screen is back, so the next game can be started in the same JVM.
+ */
+public class EngineSession {
+    public enum State { IDLE, STARTING, RUNNING }
+
+    private static final Object lock = new Object();
+    private static State state = State.IDLE;
+    private static ServerGame currentGame;
+    private static volatile int round;
+    private static int gamesStarted;
+
+    /** Claim the engine for a new game; false if one is already starting or running. */
+    public static boolean beginStart() {
+        synchronized (lock) {
+            if (state != State.IDLE) return false;
+            state = State.STARTING;
+            return true;
+        }
+    }
+
+    /** A start that did not get as far as launching the game. */
+    public static void startFailed() {
+        synchronized (lock) {
+            state = State.IDLE;
+            lock.notifyAll();
+        }
+    }
+
+    public static void gameStarted(ServerGame game) {
+        boolean reused;
+        synchronized (lock) {
+            currentGame = game;
+            state = State.RUNNING;
+            round = 0;
+            gamesStarted++;
+            reused = gamesStarted > 1;
+            lock.notifyAll();
+        }
+        // the agent still holds the previous game's state; protocol 3 agents take the new one as a snapshot
+        if (reused && helper.negotiateProtocol() >= 3) {
+            helper.sendSnapshot(game.getData());
+        }
+    }
+
+    public static void roundStarted(int r) {
+        round = r;
+    }
+
+    /** The game has ended (or its launch was aborted) and the engine is back at the main screen. */
+    public static void gameEnded() {
+        GameLogWriter.flushAll();
+        synchronized (lock) {
+            currentGame = null;
+            state = State.IDLE;
+            lock.notifyAll();
+        }
+    }
+
+    public static State getState() {
+        synchronized (lock) {
+            return state;
+        }
+    }
+
+    public static int getRound() {
+        return round;
+    }
+
+    public static int getGamesStarted() {
+        synchronized (lock) {
+            return gamesStarted;
+        }
+    }
+
+    /** Stop the running game, if any, and wait up to timeoutMs for the engine to become idle. */
+    public static boolean stopGame(long timeoutMs) throws InterruptedException {
+        long deadline = System.currentTimeMillis() + timeoutMs;
+        ServerGame game;
+        synchronized (lock) {
+            // a game that is still loading can only be stopped once it runs
+            while (state == State.STARTING && waitUntil(deadline)) {}
+            game = currentGame;
+        }
+        if (game != null) {
+            game.stopGame();
+        }
+        synchronized (lock) {
+            while (state != State.IDLE) {
+                if (!waitUntil(deadline)) return false;
+            }
+        }
+        return true;
+    }
+
+    private static boolean waitUntil(long deadline) throws InterruptedException {
+        long left = deadline - System.currentTimeMillis();
+        if (left <= 0) return false;
+        lock.wait(left);
+        return true;
+    }
+}
@@ -0,0 +1,158 @@
+package games.strategy.triplea.ai.tripleMind;
+
+import java.io.BufferedOutputStream;
+import java.io.File;
+import java.io.FileOutputStream;
+import java.io.IOException;
+import java.io.OutputStream;
+import java.nio.charset.StandardCharsets;
+import java.util.Map;
+import java.util.concurrent.ConcurrentHashMap;
+import java.util.concurrent.Executors;
+import java.util.concurrent.ScheduledExecutorService;
+import java.util.concurrent.TimeUnit;
+
+/**
+ * Game log that stays open between entries instead of reopening the file for every line.
+ *
+ * <p>Lines go through a 64 KiB buffer that is flushed at phase boundaries (move requests and round
+ * starts), every {@link #FLUSH_INTERVAL_MS} by a background timer, and at JVM shutdown. When the
+ * active file would grow past {@link #MAX_SEGMENT_BYTES} it is renamed to {@code <log>.<n>} with
+ * ascending n (1 is the oldest) and a fresh {@code <log>} is started.
+ *
+ * <p>Every round start is appended to {@code <log>.idx} as "round segment offset": the segment
+ * number the line is in (the active file until it is rotated to {@code <log>.<segment>}) and its
+ * byte offset there, so readers can count rounds or seek to one without scanning the log.
+ */
+public class GameLogWriter {
+    static final long MAX_SEGMENT_BYTES = 16L * 1024 * 1024;
+    static final long FLUSH_INTERVAL_MS = 1000;
+    static final int BUFFER_BYTES = 64 * 1024;
+
+    private static final Map<String, GameLogWriter> writers = new ConcurrentHashMap<>();
+    private static final ScheduledExecutorService flusher =
+            Executors.newSingleThreadScheduledExecutor(r -> {
+                Thread t = new Thread(r, "game-log-flusher");
+                t.setDaemon(true);
+                return t;
+            });
+
+    static {
+        flusher.scheduleWithFixedDelay(GameLogWriter::flushAll, FLUSH_INTERVAL_MS, FLUSH_INTERVAL_MS, TimeUnit.MILLISECONDS);
+        Runtime.getRuntime().addShutdownHook(new Thread(GameLogWriter::closeAll, "game-log-close"));
+    }
+
+    private final File logFile;
+    private final File indexFile;
+    private OutputStream out;
+    private long segmentBytes;
+    private int segment;
+    private boolean dirty;
+
+    private GameLogWriter(String filename) throws IOException {
+        logFile = new File(filename);
+        indexFile = new File(filename + ".idx");
+        File parentDir = logFile.getAbsoluteFile().getParentFile();
+        if (parentDir != null && !parentDir.exists()) {
+            parentDir.mkdirs();
+        }
+        // continue after the segments a previous run left behind
+        segment = 1;
+        while (new File(filename + "." + segment).exists()) {
+            segment++;
+        }
+        open();
+    }
+
+    public static GameLogWriter forFile(String filename) {
+        return writers.computeIfAbsent(filename, name -> {
+            try {
+                return new GameLogWriter(name);
+            } catch (IOException e) {
+                throw new IllegalStateException("Cannot open game log " + name, e);
+            }
+        });
+    }
+
+    private void open() throws IOException {
+        out = new BufferedOutputStream(new FileOutputStream(logFile, true), BUFFER_BYTES);
+        segmentBytes = logFile.length();
+    }
+
+    private static byte[] formatLine(String type, String msg) {
+        return ("[" + type + "] " + java.time.LocalDateTime.now() + " - " + msg + "\n").getBytes(StandardCharsets.UTF_8);
+    }
+
+    private void rotateIfFull(int length) throws IOException {
+        if (segmentBytes > 0 && segmentBytes + length > MAX_SEGMENT_BYTES) {
+            rotate();
+        }
+    }
+
+    private void append(byte[] line) throws IOException {
+        rotateIfFull(line.length);
+        out.write(line);
+        segmentBytes += line.length;
+        dirty = true;
+    }
+
+    public synchronized void write(String type, String msg) {
+        try {
+            append(formatLine(type, msg));
+        } catch (IOException e) {
+            System.err.println("Failed to write log: " + e.getMessage());
+        }
+    }
+
+    /** Write a round's first line, index where it starts, and flush: a round start is a phase boundary. */
+    public synchronized void writeRoundStart(int round, String type, String msg) {
+        byte[] line = formatLine(type, msg);
+        try {
+            rotateIfFull(line.length);     // so the indexed segment and offset are where the line lands
+            try (FileOutputStream index = new FileOutputStream(indexFile, true)) {
+                index.write((round + " " + segment + " " + segmentBytes + "\n").getBytes(StandardCharsets.UTF_8));
+            }
+            append(line);
+        } catch (IOException e) {
+            System.err.println("Failed to write log: " + e.getMessage());
+        }
+        flush();
+    }
+
+    private void rotate() throws IOException {
+        out.close();
+        File rotated = new File(logFile.getPath() + "." + segment);
+        if (!logFile.renameTo(rotated)) {
+            throw new IOException("Cannot rotate " + logFile + " to " + rotated);
+        }
+        segment++;
+        open();
+    }
+
+    public synchronized void flush() {
+        if (!dirty) return;
+        try {
+            out.flush();
+            dirty = false;
+        } catch (IOException e) {
+            System.err.println("Failed to flush log: " + e.getMessage());
+        }
+    }
+
+    public synchronized void close() {
+        try {
+            out.close();
+            dirty = false;
+        } catch (IOException e) {
+            System.err.println("Failed to close log: " + e.getMessage());
+        }
+    }
+
+    static void flushAll() {
+        writers.values().forEach(GameLogWriter::flush);
+    }
+
+    static void closeAll() {
+        writers.values().forEach(GameLogWriter::close);
+    }
+}
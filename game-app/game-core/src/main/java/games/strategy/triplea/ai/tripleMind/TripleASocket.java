@@ -6,12 +6,22 @@ import java.net.*;
 import static games.strategy.triplea.ai.tripleMind.helper.logAI;
 
 public class TripleASocket {
+    static final int DEFAULT_AGENT_PORT = 5000;
+    private static volatile int agentPort = DEFAULT_AGENT_PORT;
+
+    // pooled engines are paired with their agent per game (EngineControlServer START)
+    public static void setAgentPort(int port) {
+        if (port != agentPort) {
+            agentPort = port;
+            helper.negotiatedProtocol = 0;      // a different agent: handshake again
+        }
+    }
 
     // send game state (as JSON string) to the agent
     // in the main flow, call the helper function to create the json string, before calling this function
     public static void sendState(String stateJson) {
         String host = "127.0.0.1";
-        int port = 5000;
+        int port = agentPort;
 
         try (Socket socket = new Socket(host, port);
              PrintWriter out = new PrintWriter(socket.getOutputStream(), true)) {
@@ -29,7 +39,7 @@ public class TripleASocket {
 
     public static String sendAndRead(String stateJson) {
         String host = "127.0.0.1";
-        int port = 5000;
+        int port = agentPort;
         String response = "";
 
         try (Socket socket = new Socket(host, port);
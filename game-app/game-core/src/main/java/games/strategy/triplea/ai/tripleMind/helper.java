@@ -1,10 +1,26 @@
 package games.strategy.triplea.ai.tripleMind;
 
-import java.io.File;
-import java.io.FileWriter;
-import java.io.IOException;
-import java.io.PrintWriter;
+import java.lang.reflect.Type;
+import java.nio.charset.StandardCharsets;
+import java.util.ArrayList;
+import java.util.Comparator;
+import java.util.List;
 import java.util.Random;
+import java.util.StringJoiner;
+import java.util.TreeMap;
+import java.util.zip.CRC32;
+
+import com.google.gson.Gson;
+import com.google.gson.JsonArray;
+import com.google.gson.JsonElement;
+import com.google.gson.JsonObject;
+import com.google.gson.JsonParser;
+import com.google.gson.reflect.TypeToken;
+import games.strategy.engine.data.GameData;
+import games.strategy.engine.data.GamePlayer;
+import games.strategy.engine.data.Territory;
+import games.strategy.engine.data.Unit;
+import games.strategy.triplea.Constants;
 
 
 
@@ -15,11 +31,22 @@ class Action {
     String unit;
     String from;
     String to;
+    int quantity;       // protocol 1 sends one action per unit and leaves this unset
+
+    int count() {
+        return quantity > 0 ? quantity : 1;
+    }
 }
 
 public class helper {
     static String log_folder = "/home/sanjana/triplea/logs/";       // update with your log file name
 
+    // response protocol: 1 = JSON list with one action object per unit,
+    // 2 = {"v":2,"a":[[delegate, unit, from, to, quantity], ...]} with one row per unit stack,
+    // 3 = as 2, plus {"ack":"ACK","digest":crc32} on some CHANGE acks (see checkDigest)
+    static final int PROTOCOL_VERSION = 3;
+    static int negotiatedProtocol = 0;      // 0 = no handshake yet
+
     public static int getAIRoleId(int n) {
         Random rand = new Random();
         return rand.nextInt(n);
@@ -47,6 +74,49 @@ public class helper {
         return json.substring(startQuote + 1, endQuote);
     }
 
+    // ask the agent for the highest protocol both sides speak; agents without [HELLO] support stay on 1
+    public static int negotiateProtocol() {
+        if (negotiatedProtocol != 0) return negotiatedProtocol;
+        negotiatedProtocol = 1;
+        String response = TripleASocket.sendAndRead("[HELLO] protocol=" + PROTOCOL_VERSION);
+        try {
+            JsonElement root = JsonParser.parseString(response);
+            if (root.isJsonObject() && root.getAsJsonObject().has("protocol")) {
+                negotiatedProtocol = Math.min(PROTOCOL_VERSION, root.getAsJsonObject().get("protocol").getAsInt());
+            }
+        } catch (Exception e) {
+            System.err.println("Protocol handshake failed, using protocol 1: " + e.getMessage());
+        }
+        System.out.println("Agent protocol: " + negotiatedProtocol);
+        return negotiatedProtocol;
+    }
+
+    public static List<Action> decodeActions(String response) {
+        JsonElement root = JsonParser.parseString(response);
+        if (root.isJsonArray()) {
+            Type actionListType = new TypeToken<List<Action>>(){}.getType();
+            return new Gson().fromJson(root, actionListType);
+        }
+
+        JsonObject message = root.getAsJsonObject();
+        int version = message.get("v").getAsInt();
+        if (version != 2) {
+            throw new IllegalArgumentException("Unsupported action protocol version: " + version);
+        }
+        List<Action> actions = new ArrayList<>();
+        for (JsonElement element : message.getAsJsonArray("a")) {
+            JsonArray row = element.getAsJsonArray();
+            Action a = new Action();
+            a.delegate = row.get(0).getAsString();
+            a.unit = row.get(1).getAsString();
+            a.from = row.get(2).getAsString();
+            a.to = row.get(3).getAsString();
+            a.quantity = row.get(4).getAsInt();
+            actions.add(a);
+        }
+        return actions;
+    }
+
     public static String getLogFileName() {
         String log_file = log_folder;
         String player_name = getPreferences().get("PLAYER_NAME", null);
@@ -56,54 +126,122 @@ public class helper {
     }
 
     public static void logAI (String type, String msg) {
-        String filename = getLogFileName();
-        File logFile = new File(filename);
-        try {
-            File parentDir = logFile.getParentFile();
-            if (parentDir != null && !parentDir.exists()) {
-                parentDir.mkdirs();
-            }
-            if (!logFile.exists()) {
-                logFile.createNewFile();
-            }
-            try {
-                PrintWriter writer = new PrintWriter(new FileWriter(logFile, true));
-                writer.println("[" + type + "] " + java.time.LocalDateTime.now() + " - " + msg);
-                writer.close();
-            } catch (IOException e) {
-                System.err.println(("Failed to write log: " + e.getMessage()));
-            }
-        } catch (Exception e) {
-            System.err.println(("Failed to write log: " + e.getMessage()));
-        }
+        GameLogWriter.forFile(getLogFileName()).write(type, msg);
 
 //        TripleASocket.sendState("[" + type + "] " + msg);
         String response = TripleASocket.sendAndRead("[" + type + "] " + msg);
     }
 
-    public static String requestMove(String move) {
-        String filename = getLogFileName();
-        File logFile = new File(filename);
+    // logAI for CHANGE lines; with protocol 3 the agent's ack may carry a state digest to compare against
+    public static void logChange(String msg, GameData data) {
+        GameLogWriter.forFile(getLogFileName()).write("CHANGE", msg);
+        String response = TripleASocket.sendAndRead("[CHANGE] " + msg);
+        if (negotiatedProtocol >= 3) {
+            checkDigest(response, data);
+        }
+    }
+
+    // if the agent's digest differs from ours its state has drifted: send it the full state to swap in
+    static void checkDigest(String response, GameData data) {
         try {
-            File parentDir = logFile.getParentFile();
-            if (parentDir != null && !parentDir.exists()) {
-                parentDir.mkdirs();
-            }
-            if (!logFile.exists()) {
-                logFile.createNewFile();
-            }
-            try {
-                PrintWriter writer = new PrintWriter(new FileWriter(logFile, true));
-                writer.println("[MY_MOVE] " + java.time.LocalDateTime.now() + " - " + move);
-                writer.close();
-            } catch (IOException e) {
-                System.err.println(("Failed to write log: " + e.getMessage()));
+            JsonElement root = JsonParser.parseString(response);
+            if (!root.isJsonObject() || !root.getAsJsonObject().has("digest")) return;
+            long agentDigest = root.getAsJsonObject().get("digest").getAsLong();
+            try (GameData.Unlocker ignored = data.acquireReadLock()) {
+                if (agentDigest == stateDigest(data)) return;
+                System.out.println("Agent state drifted, sending snapshot");
+                TripleASocket.sendAndRead("[SNAPSHOT] " + snapshotJson(data));
             }
         } catch (Exception e) {
-            System.err.println(("Failed to write log: " + e.getMessage()));
+            System.err.println("State digest check failed: " + e.getMessage());
         }
+    }
+
+    // replace the agent's whole state with the engine's, e.g. when a reused engine starts another game
+    public static void sendSnapshot(GameData data) {
+        try (GameData.Unlocker ignored = data.acquireReadLock()) {
+            TripleASocket.sendAndRead("[SNAPSHOT] " + snapshotJson(data));
+        }
+    }
+
+    // same text as CaptureTheFlagGraph.state_digest: "territory=owner;unit/owner/qty,...\n" per territory
+    // and "player:PUs\n" per player with PUs, all sorted by name
+    static String canonicalState(GameData data) {
+        StringBuilder sb = new StringBuilder();
+        List<Territory> territories = new ArrayList<>(data.getMap().getTerritories());
+        territories.sort(Comparator.comparing(Territory::getName));
+        for (Territory t : territories) {
+            sb.append(t.getName()).append('=').append(t.getOwner().getName()).append(';');
+            StringJoiner units = new StringJoiner(",");
+            unitCounts(t).forEach((key, qty) -> units.add(key + "/" + qty));
+            sb.append(units).append('\n');
+        }
+        List<GamePlayer> players = new ArrayList<>(data.getPlayerList().getPlayers());
+        players.sort(Comparator.comparing(GamePlayer::getName));
+        for (GamePlayer p : players) {
+            int pus = p.getResources().getQuantity(Constants.PUS);
+            if (pus != 0) sb.append(p.getName()).append(':').append(pus).append('\n');
+        }
+        return sb.toString();
+    }
+
+    // "unit/owner" -> count, sorted by key
+    static TreeMap<String, Integer> unitCounts(Territory t) {
+        TreeMap<String, Integer> counts = new TreeMap<>();
+        for (Unit u : t.getUnitCollection().getUnits()) {
+            counts.merge(u.getType().getName() + "/" + u.getOwner().getName(), 1, Integer::sum);
+        }
+        return counts;
+    }
+
+    public static long stateDigest(GameData data) {
+        CRC32 crc = new CRC32();
+        crc.update(canonicalState(data).getBytes(StandardCharsets.UTF_8));
+        return crc.getValue();
+    }
+
+    // {"territories": {name: {"owner": o, "units": [[unit, owner, qty], ...]}}, "pus": {player: n}}
+    static String snapshotJson(GameData data) {
+        JsonObject territories = new JsonObject();
+        for (Territory t : data.getMap().getTerritories()) {
+            JsonArray units = new JsonArray();
+            unitCounts(t).forEach((key, qty) -> {
+                String[] parts = key.split("/", 2);
+                JsonArray row = new JsonArray();
+                row.add(parts[0]);
+                row.add(parts[1]);
+                row.add(qty);
+                units.add(row);
+            });
+            JsonObject territory = new JsonObject();
+            territory.addProperty("owner", t.getOwner().getName());
+            territory.add("units", units);
+            territories.add(t.getName(), territory);
+        }
+        JsonObject pus = new JsonObject();
+        for (GamePlayer p : data.getPlayerList().getPlayers()) {
+            pus.addProperty(p.getName(), p.getResources().getQuantity(Constants.PUS));
+        }
+        JsonObject snapshot = new JsonObject();
+        snapshot.add("territories", territories);
+        snapshot.add("pus", pus);
+        return snapshot.toString();
+    }
+
+    // like logAI("INFO", "Starting Round " + round), and records where the round starts in the log index
+    public static void logRoundStart(int round) {
+        String msg = "Starting Round " + round;
+        GameLogWriter.forFile(getLogFileName()).writeRoundStart(round, "INFO", msg);
+        String response = TripleASocket.sendAndRead("[INFO] " + msg);
+    }
+
+    public static String requestMove(String move) {
+        GameLogWriter log = GameLogWriter.forFile(getLogFileName());
+        log.write("MY_MOVE", move);
+        log.flush();        // phase boundary: everything up to the move request is on disk
 //        TripleASocket.sendState("[MY_MOVE] " + move);
 //        return "";
+        negotiateProtocol();
         System.out.println("Request sent: [MY_MOVE] " + move);
         String response = TripleASocket.sendAndRead("[MY_MOVE] " + move);
         System.out.println("Received move: " + response);
@@ -112,26 +250,7 @@ public class helper {
     }
 
     public static void logResponse(String response) {
-        String filename = getLogFileName();
-        File logFile = new File(filename);
-        try {
-            File parentDir = logFile.getParentFile();
-            if (parentDir != null && !parentDir.exists()) {
-                parentDir.mkdirs();
-            }
-            if (!logFile.exists()) {
-                logFile.createNewFile();
-            }
-            try {
-                PrintWriter writer = new PrintWriter(new FileWriter(logFile, true));
-                writer.println("[RESPONSE] " + java.time.LocalDateTime.now() + " - " + response);
-                writer.close();
-            } catch (IOException e) {
-                System.err.println(("Failed to write log: " + e.getMessage()));
-            }
-        } catch (Exception e) {
-            System.err.println(("Failed to write log: " + e.getMessage()));
-        }
+        GameLogWriter.forFile(getLogFileName()).write("RESPONSE", response);
     }
 
 }
@@ -18,6 +18,7 @@ import games.strategy.engine.player.Player;
 import games.strategy.net.Messengers;
 import games.strategy.net.websocket.ClientNetworkBridge;
 import games.strategy.triplea.TripleAPlayer;
+import games.strategy.triplea.ai.tripleMind.EngineSession;
 import games.strategy.triplea.settings.ClientSetting;
 import games.strategy.triplea.ui.TripleAFrame;
 import games.strategy.triplea.ui.display.TripleADisplay;
@@ -66,6 +67,8 @@ public class HeadedLaunchAction implements LaunchAction {
   @Override
   public void onGameInterrupt() {
     SwingUtilities.invokeLater(() -> JOptionPane.getFrameForComponent(ui).setVisible(true));
+    // torn down and back at the main screen: a controlled engine can take the next game
+    EngineSession.gameEnded();
   }
 
   @Override
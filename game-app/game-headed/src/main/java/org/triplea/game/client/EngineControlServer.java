@@ -0,0 +1,151 @@
+package org.triplea.game.client;
+
+import static games.strategy.triplea.settings.ClientSetting.getPreferences;
+
+import com.google.gson.JsonObject;
+import com.google.gson.JsonParser;
+import games.strategy.triplea.ai.tripleMind.EngineSession;
+import games.strategy.triplea.ai.tripleMind.TripleASocket;
+import java.io.BufferedReader;
+import java.io.IOException;
+import java.io.InputStreamReader;
+import java.io.PrintWriter;
+import java.net.InetAddress;
+import java.net.ServerSocket;
+import java.net.Socket;
+import java.nio.charset.StandardCharsets;
+import java.nio.file.Files;
+import java.nio.file.Path;
+import lombok.extern.slf4j.Slf4j;
+import org.triplea.util.ExitStatus;
+
+/**
+ * Local control channel that lets a supervisor (engine_pool.py) keep this engine running and play
+ * one game after another in it, instead of paying Gradle, JVM start-up and map loading per game.
+ *
+ * <p>Listens on 127.0.0.1 at the port given by {@code triplea.control.port}. Each connection
+ * carries one command line and gets one reply line:
+ *
+ * <ul>
+ *   <li>{@code STATUS} - {"state": "IDLE|STARTING|RUNNING", "round": n, "games": n}
+ *   <li>{@code START {"game": path, "player_name": ..., "game_name": ..., "agent_port": n}} -
+ *       {@code STARTED} once the map or save is loaded and the local game is launching
+ *   <li>{@code STOP} - {@code STOPPED} once the game is torn down and the engine is idle again
+ *   <li>{@code QUIT} - {@code BYE}, then the JVM exits
+ * </ul>
+ *
+ * Failures are answered with {"error": message}.
+ */
+@Slf4j
+final class EngineControlServer {
+  static final long STOP_TIMEOUT_MS = 60_000;
+
+  private EngineControlServer() {}
+
+  static void start(final int port) {
+    final ServerSocket server;
+    try {
+      server = new ServerSocket(port, 8, InetAddress.getLoopbackAddress());
+    } catch (final IOException e) {
+      log.error("Cannot open engine control port " + port, e);
+      return;
+    }
+    final Thread thread = new Thread(() -> serve(server), "engine-control");
+    thread.setDaemon(true);
+    thread.start();
+    log.info("Engine control channel listening on port {}", port);
+  }
+
+  private static void serve(final ServerSocket server) {
+    while (!server.isClosed()) {
+      try (Socket socket = server.accept();
+          BufferedReader in =
+              new BufferedReader(
+                  new InputStreamReader(socket.getInputStream(), StandardCharsets.UTF_8));
+          PrintWriter out =
+              new PrintWriter(socket.getOutputStream(), true, StandardCharsets.UTF_8)) {
+        final String line = in.readLine();
+        if (line == null) {
+          continue;
+        }
+        final boolean quit = line.trim().equals("QUIT");
+        out.println(handle(line.trim()));
+        if (quit) {
+          ExitStatus.SUCCESS.exit();
+        }
+      } catch (final IOException e) {
+        log.warn("Engine control connection failed: {}", e.getMessage());
+      }
+    }
+  }
+
+  private static String handle(final String line) {
+    final int space = line.indexOf(' ');
+    final String command = space < 0 ? line : line.substring(0, space);
+    try {
+      switch (command) {
+        case "STATUS":
+          return status();
+        case "START":
+          return startGame(space < 0 ? "{}" : line.substring(space + 1));
+        case "STOP":
+          return EngineSession.stopGame(STOP_TIMEOUT_MS)
+              ? "STOPPED"
+              : error("game did not stop within " + STOP_TIMEOUT_MS + " ms");
+        case "QUIT":
+          return "BYE";
+        default:
+          return error("unknown command: " + command);
+      }
+    } catch (final InterruptedException e) {
+      Thread.currentThread().interrupt();
+      return error("interrupted");
+    } catch (final RuntimeException e) {
+      log.warn("Engine control command failed: " + line, e);
+      return error(e.getClass().getSimpleName() + ": " + e.getMessage());
+    }
+  }
+
+  private static String status() {
+    final JsonObject status = new JsonObject();
+    status.addProperty("state", EngineSession.getState().name());
+    status.addProperty("round", EngineSession.getRound());
+    status.addProperty("games", EngineSession.getGamesStarted());
+    return status.toString();
+  }
+
+  private static String startGame(final String json) {
+    final JsonObject config = JsonParser.parseString(json).getAsJsonObject();
+    if (!config.has("game")) {
+      return error("START needs a \"game\" map or save path");
+    }
+    final Path gameFile = Path.of(config.get("game").getAsString());
+    if (!Files.exists(gameFile)) {
+      return error("no such game file: " + gameFile);
+    }
+    if (!EngineSession.beginStart()) {
+      return error("engine is busy: " + EngineSession.getState());
+    }
+    // helper.getLogFileName reads these, so the game log follows the new game
+    if (config.has("player_name")) {
+      getPreferences().put("PLAYER_NAME", config.get("player_name").getAsString());
+    }
+    if (config.has("game_name")) {
+      getPreferences().put("DEFAULT_GAME_NAME_PREF", config.get("game_name").getAsString());
+    }
+    if (config.has("agent_port")) {
+      TripleASocket.setAgentPort(config.get("agent_port").getAsInt());
+    }
+    if (!HeadedGameRunner.startLocalGame(gameFile)) {
+      EngineSession.startFailed();
+      return error("could not load " + gameFile);
+    }
+    return "STARTED";
+  }
+
+  private static String error(final String message) {
+    final JsonObject error = new JsonObject();
+    error.addProperty("error", message);
+    return error.toString();
+  }
+}
@@ -3,6 +3,7 @@ package org.triplea.game.client;
 import static com.google.common.base.Preconditions.checkNotNull;
 import static com.google.common.base.Preconditions.checkState;
 import static games.strategy.engine.framework.CliProperties.TRIPLEA_CLIENT;
+import static games.strategy.engine.framework.CliProperties.TRIPLEA_CONTROL_PORT;
 import static games.strategy.engine.framework.CliProperties.TRIPLEA_GAME;
 import static games.strategy.engine.framework.CliProperties.TRIPLEA_MAP_DOWNLOAD;
 import static games.strategy.engine.framework.CliProperties.TRIPLEA_MAP_DOWNLOAD_PREFIX;
@@ -43,6 +44,7 @@ import java.nio.file.Files;
 import java.nio.file.Path;
 import java.util.Arrays;
 import java.util.Locale;
+import java.util.concurrent.atomic.AtomicBoolean;
 import javax.swing.SwingUtilities;
 import lombok.extern.slf4j.Slf4j;
 import org.triplea.config.product.ProductVersionReader;
@@ -122,6 +124,7 @@ public final class HeadedGameRunner {
         case TRIPLEA_SERVER:
         case TRIPLEA_CLIENT:
         case TRIPLEA_START:
+        case TRIPLEA_CONTROL_PORT:
           System.setProperty(nameValuePair[0], nameValuePair[1]);
           break;
         default:
@@ -171,6 +174,11 @@ public final class HeadedGameRunner {
 //      TripleASocket.start(5000);
 
     start();
+
+    final String controlPort = System.getProperty(TRIPLEA_CONTROL_PORT, "");
+    if (!controlPort.isEmpty()) {
+      EngineControlServer.start(Integer.parseInt(controlPort));
+    }
   }
 
   /**
@@ -272,6 +280,30 @@ public final class HeadedGameRunner {
         });
   }
 
+  /**
+   * Loads a map (.xml) or save game and launches it as a local game, like a game file given on the
+   * command line. Returns false if the file could not be loaded. Used by {@link
+   * EngineControlServer} to start each game of a reused engine.
+   */
+  static boolean startLocalGame(final Path gameFile) {
+    final boolean isSaveFile = gameFile.toString().endsWith(GameDataFileUtils.getExtension());
+    final AtomicBoolean loaded = new AtomicBoolean();
+    Interruptibles.await(
+        () ->
+            SwingAction.invokeAndWait(
+                () -> {
+                  loaded.set(
+                      isSaveFile
+                          ? gameSelectorModel.loadSave(gameFile)
+                          : gameSelectorModel.loadMap(gameFile));
+                  if (loaded.get()) {
+                    headedServerSetupModel.showLocal();
+                    MainFrame.startGameDirectly(headedServerSetupModel);
+                  }
+                }));
+    return loaded.get();
+  }
+
   private static void openMapDownloadWindowIfDownloadScheduled() {
     final String downloadableMap = System.getProperty(TRIPLEA_MAP_DOWNLOAD, "");
     if (!downloadableMap.isEmpty()) {
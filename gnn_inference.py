@@ -0,0 +1,173 @@
+import os
+
+import numpy as np
+
+
+def dense_to_csr(adjacency):
+    """(indptr, indices) of a dense adjacency matrix; neighbour lists come out sorted."""
+    rows, cols = np.nonzero(np.asarray(adjacency))
+    indptr = np.zeros(len(adjacency) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=len(adjacency)), out=indptr[1:])
+    return indptr, cols.astype(np.int64)
+
+
+def state_csr(state):
+    """(indptr, indices) of a get_state_encoding() state, sparse or dense."""
+    if "indptr" in state:
+        return np.asarray(state["indptr"], dtype=np.int64), np.asarray(state["edge_index"][1], dtype=np.int64)
+    return dense_to_csr(state["adjacency"])
+
+
+def block_diagonal(graphs):
+    """
+    One CSR graph holding every (indptr, indices) in `graphs` as a disconnected block.
+    Returns (indptr, indices, graph_ptr) where graph_ptr[b]:graph_ptr[b + 1] are graph b's nodes.
+    """
+    sizes = np.array([len(indptr) - 1 for indptr, _ in graphs], dtype=np.int64)
+    graph_ptr = np.zeros(len(graphs) + 1, dtype=np.int64)
+    np.cumsum(sizes, out=graph_ptr[1:])
+    edge_offsets = np.cumsum([0] + [len(indices) for _, indices in graphs])
+    indptr = np.concatenate([indptr[:-1] + off for (indptr, _), off in zip(graphs, edge_offsets)] + [edge_offsets[-1:]])
+    indices = np.concatenate([indices + off for (_, indices), off in zip(graphs, graph_ptr)])
+    return indptr, indices, graph_ptr
+
+
+def tile_csr(indptr, indices, copies):
+    """block_diagonal() of `copies` copies of one graph, without the per-graph concatenation."""
+    n, e = len(indptr) - 1, len(indices)
+    indptr_b = (indptr[None, :-1] + e * np.arange(copies)[:, None]).ravel()
+    indptr_b = np.append(indptr_b, e * copies)
+    indices_b = (indices[None, :] + n * np.arange(copies)[:, None]).ravel()
+    return indptr_b, indices_b, np.arange(copies + 1, dtype=np.int64) * n
+
+
+def csr_sum(indptr, indices, x):
+    """Row i of the result is the sum of x over i's neighbours: one gather plus one segmented reduceat."""
+    out = np.zeros((len(indptr) - 1, x.shape[1]), dtype=x.dtype)
+    if len(indices) == 0:
+        return out
+    nonempty = indptr[1:] > indptr[:-1]
+    # empty rows start where the next row starts, so reduceat over the non-empty starts alone is exact
+    out[nonempty] = np.add.reduceat(x[indices], indptr[:-1][nonempty], axis=0)
+    return out
+
+
+class GraphValueNet:
+    """
+    Graph value function V(state) evaluated with NumPy only.
+
+    Each layer is h' = relu(h @ W_self + mean_{j in N(i)} h_j @ W_neigh + b) (GraphSAGE, mean
+    aggregation over the CSR neighbour lists). The neighbour transform is applied before
+    aggregating when it shrinks the features, since both orders give the same result.
+    The readout concatenates per-graph mean and max of the last node layer with the global
+    features and runs an MLP head (relu between layers) down to one value per graph.
+
+    predict() takes a list of states and evaluates them as one block-diagonal graph, so a whole
+    set of candidate successor states costs one forward pass.
+
+    Weights live in an .npz with arrays layer{i}_self, layer{i}_neigh, layer{i}_bias and
+    head{i}_w, head{i}_b (see save()).
+    """
+
+    def __init__(self, layers, head):
+        self.layers = [(np.asarray(ws, np.float32), np.asarray(wn, np.float32), np.asarray(b, np.float32))
+                       for ws, wn, b in layers]
+        self.head = [(np.asarray(w, np.float32), np.asarray(b, np.float32)) for w, b in head]
+        self.node_dim = self.layers[0][0].shape[0]
+        self.global_dim = self.head[0][0].shape[0] - 2 * self.layers[-1][0].shape[1]
+        self._tiled = None  # ((copies, topology bytes), tiled csr) of the last shared-topology batch
+
+    @classmethod
+    def random(cls, node_dim, global_dim, hidden=(64, 64), head=(64,), seed=0):
+        """Glorot-initialised network, e.g. as the starting point for offline training."""
+        rng = np.random.default_rng(seed)
+
+        def glorot(n_in, n_out):
+            return rng.uniform(-1, 1, (n_in, n_out)) * np.sqrt(6.0 / (n_in + n_out))
+
+        layers, dim = [], node_dim
+        for h in hidden:
+            layers.append((glorot(dim, h), glorot(dim, h), np.zeros(h)))
+            dim = h
+        heads, dim = [], 2 * dim + global_dim
+        for h in list(head) + [1]:
+            heads.append((glorot(dim, h), np.zeros(h)))
+            dim = h
+        return cls(layers, heads)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as f:
+            layers, head = [], []
+            while f"layer{len(layers)}_self" in f:
+                i = len(layers)
+                layers.append((f[f"layer{i}_self"], f[f"layer{i}_neigh"], f[f"layer{i}_bias"]))
+            while f"head{len(head)}_w" in f:
+                i = len(head)
+                head.append((f[f"head{i}_w"], f[f"head{i}_b"]))
+        if not layers or not head:
+            raise ValueError(f"{path} has no GraphValueNet weights")
+        return cls(layers, head)
+
+    def save(self, path):
+        arrays = {}
+        for i, (ws, wn, b) in enumerate(self.layers):
+            arrays.update({f"layer{i}_self": ws, f"layer{i}_neigh": wn, f"layer{i}_bias": b})
+        for i, (w, b) in enumerate(self.head):
+            arrays.update({f"head{i}_w": w, f"head{i}_b": b})
+        tmp_path = path + ".tmp.npz"
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+
+    def forward(self, x, indptr, indices, graph_ptr, global_features):
+        """
+        Values of a batch of graphs already merged into one block-diagonal CSR graph.
+        x [total nodes, node_dim], graph_ptr [B + 1], global_features [B, global_dim] -> [B].
+        """
+        h = np.asarray(x, dtype=np.float32)
+        inv_degree = (1.0 / np.maximum(np.diff(indptr), 1)).astype(np.float32)[:, None]
+        for w_self, w_neigh, bias in self.layers:
+            if w_neigh.shape[1] < w_neigh.shape[0]:
+                neigh = csr_sum(indptr, indices, h @ w_neigh)
+            else:
+                neigh = csr_sum(indptr, indices, h) @ w_neigh
+            h = np.maximum(h @ w_self + neigh * inv_degree + bias, 0.0)
+
+        starts = graph_ptr[:-1]
+        sizes = np.diff(graph_ptr).astype(np.float32)[:, None]
+        pooled = np.concatenate([
+            np.add.reduceat(h, starts, axis=0) / sizes,
+            np.maximum.reduceat(h, starts, axis=0),
+            np.asarray(global_features, dtype=np.float32).reshape(len(starts), -1),
+        ], axis=1)
+        out = pooled
+        for i, (w, b) in enumerate(self.head):
+            out = out @ w + b
+            if i < len(self.head) - 1:
+                out = np.maximum(out, 0.0)
+        return out[:, 0]
+
+    def predict(self, states):
+        """V of every state in one forward pass over their block-diagonal union."""
+        x = np.concatenate([np.asarray(s["node_features"], dtype=np.float32) for s in states])
+        if x.shape[1] != self.node_dim:
+            raise ValueError(f"node features have {x.shape[1]} columns, the network expects {self.node_dim}")
+        indptr, indices, graph_ptr = block_diagonal([state_csr(s) for s in states])
+        g = np.stack([np.asarray(s["global_features"], dtype=np.float32) for s in states])
+        return self.forward(x, indptr, indices, graph_ptr, g)
+
+    def predict_shared(self, node_features, indptr, indices, global_features):
+        """
+        V of B states on one topology: node_features [B, N, node_dim], global_features [B, G].
+        The tiled CSR is reused while the topology and batch size stay the same.
+        """
+        copies, n, dim = node_features.shape
+        if dim != self.node_dim:
+            raise ValueError(f"node features have {dim} columns, the network expects {self.node_dim}")
+        indptr, indices = np.asarray(indptr, np.int64), np.asarray(indices, np.int64)
+        key = (copies, indptr.tobytes(), indices.tobytes())
+        if self._tiled is None or self._tiled[0] != key:
+            self._tiled = (key, tile_csr(indptr, indices, copies))
+        tiled_indptr, tiled_indices, graph_ptr = self._tiled[1]
+        return self.forward(node_features.reshape(copies * n, dim), tiled_indptr, tiled_indices, graph_ptr,
+                            global_features)
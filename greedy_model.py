@@ -12,6 +12,21 @@ import time
 from collections import deque
 import csv
 import os
+import zlib
+import hashlib
+from agent_metrics import AgentMetrics
+from agent_profiler import SamplingProfiler
+from attack_plans import generate_attack_plans
+from gnn_inference import GraphValueNet
+from air_moves import AirMovementIndex
+from influence import InfluenceMap
+from agent_cache import StateCache
+from agent_log import log
+from checkpoint import Checkpointer, restore_checkpoint
+from td_learner import TDLearner, state_vector
+from replay import replay_filename
+from state_sync import SNAPSHOT_PREFIX, StateSync
+from state_publisher import StatePublisher
 
 def parse_change_line(line: str):
     parts = line.strip().split()
@@ -47,6 +62,10 @@ def parse_triplea_map(xml_path, output_path):
 
     # --- Extract Territories ---
     territories = [t.attrib["name"] for t in root.findall(".//map/territory")]
+    sea_territories = [
+        t.attrib["name"] for t in root.findall(".//map/territory")
+        if t.attrib.get("water", "false").lower() == "true"
+    ]
 
     # --- Extract Connections (graph edges between territories) ---
     connections = [
@@ -111,6 +130,29 @@ def parse_triplea_map(xml_path, output_path):
             if opt.attrib.get("name") == "victoryCity" and opt.attrib.get("value") == "1":
                 victory_cities.append(attach.attrib["attachTo"])
 
+    # --- Extract Air Units (fly over any territory, must end their move on a friendly one) ---
+    air_units = []
+    for attach in root.findall(".//attachmentList/attachment[@type='unitType']"):
+        for opt in attach.findall("option"):
+            if opt.attrib.get("name") == "isAir" and opt.attrib.get("value") == "true":
+                air_units.append(attach.attrib["attachTo"])
+
+    # --- Extract Territory Production (PU income of the owner) ---
+    territory_production = {}
+    for attach in root.findall(".//attachmentList/attachment[@type='territory']"):
+        for opt in attach.findall("option"):
+            if opt.attrib.get("name") == "production":
+                territory_production[attach.attrib["attachTo"]] = int(opt.attrib["value"])
+
+    # --- Extract Canals (sea zones sharing a canalName are joined by the canal) ---
+    canals = {}
+    for attach in root.findall(".//attachmentList/attachment[@type='territory']"):
+        if "CanalAttachment" not in attach.attrib.get("javaClass", ""):
+            continue
+        for opt in attach.findall("option"):
+            if opt.attrib.get("name") == "canalName":
+                canals.setdefault(opt.attrib["value"], []).append(attach.attrib["attachTo"])
+
     # --- Final structured data ---
     parsed_data = {
         "territories": territories,
@@ -118,11 +160,15 @@ def parse_triplea_map(xml_path, output_path):
         "players": players,
         "units": units,
         "unit_stats": unit_stats,
+        "air_units": air_units,
         "production_rules": production_rules,
         "starting_ownership": starting_ownership,
         "starting_units": starting_units,
         "initial_resources": initial_resources,
-        "victory_cities": victory_cities
+        "victory_cities": victory_cities,
+        "territory_production": territory_production,
+        "sea_territories": sea_territories,
+        "canals": [{"name": name, "territories": terrs} for name, terrs in canals.items()]
     }
 
     # Save to JSON file
@@ -132,10 +178,138 @@ def parse_triplea_map(xml_path, output_path):
     print(f"Data successfully extracted and saved to {output_path}")
 
 
+EDGE_TYPES = ["land", "sea", "canal"]
+DEFAULT_AIR_UNITS = ("fighter", "bomber")  # for maps parsed before "air_units" was extracted
+DELEGATES = ["purchase", "combat", "noncombat", "place"]
+
+# per-player aggregates kept current by CaptureTheFlagGraph (see _rebuild_indexes)
+AGGREGATE_FIELDS = ("territories", "victory_cities", "income", "units", "unit_value", "pus")
+AGG_TERRITORIES, AGG_VICTORY_CITIES, AGG_INCOME, AGG_UNITS, AGG_UNIT_VALUE, AGG_PUS = range(len(AGGREGATE_FIELDS))
+
+# unit properties from TripleA "Property change" lines that get a column up front; others get one on first sight
+KNOWN_UNIT_PROPERTIES = ("wasInCombat", "alreadyMoved", "hits", "wasScrambled", "submerged", "unloaded", "wasLoadedThisTurn")
+
+
+def parse_property_value(value):
+    """true/false -> 1.0/0.0, numbers -> float, anything else (null, unit ids) -> 0.0"""
+    if value == "true":
+        return 1.0
+    if value == "false":
+        return 0.0
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+ZOBRIST_SEED = 0x5EED
+ZOBRIST_EXACT_COUNTS = 32  # unit counts below this hash exactly, larger ones by power-of-two bucket
+
+
+def count_bucket(qty):
+    if qty < ZOBRIST_EXACT_COUNTS:
+        return qty
+    return ZOBRIST_EXACT_COUNTS + qty.bit_length()
+
+
+class ZobristTable:
+    """
+    64-bit random keys for the Zobrist state hash, one per (kind, *fields) tuple, e.g.
+        ("own", territory, owner)
+        ("units", territory, owner, unit, count_bucket)
+        ("pu", player, value)
+        ("pool", player, unit, count_bucket)
+    Keys are derived from the tuple and the seed rather than drawn in order, so they are generated
+    on first use (maps and PU values are open-ended) yet identical across runs and processes.
+    """
+
+    def __init__(self, seed=ZOBRIST_SEED):
+        self.salt = seed.to_bytes(16, "little")
+        self.keys = {}
+
+    def key(self, *fields):
+        k = self.keys.get(fields)
+        if k is None:
+            digest = hashlib.blake2b(repr(fields).encode(), digest_size=8, salt=self.salt).digest()
+            k = self.keys[fields] = int.from_bytes(digest, "little")
+        return k
+
+
+class UnitPropertyStore:
+    """
+    Columnar store of unit-stack properties: one float32 array per property, indexed by stack id.
+    Every unit stack in the graph holds a stack_id; ids of removed stacks are recycled.
+    """
+
+    def __init__(self, capacity=256):
+        self.capacity = capacity
+        self.columns = {prop: np.zeros(capacity, dtype=np.float32) for prop in KNOWN_UNIT_PROPERTIES}
+        self.next_id = 0
+        self.free_ids = []
+
+    def allocate(self, properties=None):
+        if self.free_ids:
+            stack_id = self.free_ids.pop()
+        else:
+            stack_id = self.next_id
+            self.next_id += 1
+            if stack_id >= self.capacity:
+                self._grow(self.capacity * 2)
+        for col in self.columns.values():
+            col[stack_id] = 0.0
+        for prop, value in (properties or {}).items():
+            self.set(stack_id, prop, value)
+        return stack_id
+
+    def release(self, stack_id):
+        self.free_ids.append(stack_id)
+
+    def _grow(self, capacity):
+        for prop, col in self.columns.items():
+            grown = np.zeros(capacity, dtype=np.float32)
+            grown[:self.capacity] = col
+            self.columns[prop] = grown
+        self.capacity = capacity
+
+    def set(self, stack_id, prop, value):
+        """Store a property; value may be the raw log string or a number. Returns the old value."""
+        col = self.column(prop)
+        old = float(col[stack_id])
+        col[stack_id] = parse_property_value(value) if isinstance(value, str) else float(value)
+        return old
+
+    def get(self, stack_id, prop):
+        col = self.columns.get(prop)
+        return 0.0 if col is None else float(col[stack_id])
+
+    def column(self, prop):
+        col = self.columns.get(prop)
+        if col is None:
+            col = self.columns[prop] = np.zeros(self.capacity, dtype=np.float32)
+        return col
+
+    def to_state(self):
+        return {
+            "next_id": self.next_id,
+            "free_ids": list(self.free_ids),
+            "columns": {prop: col[:self.next_id].copy() for prop, col in self.columns.items()},
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        store = cls(capacity=max(256, state["next_id"]))
+        store.next_id = state["next_id"]
+        store.free_ids = list(state["free_ids"])
+        for prop, values in state["columns"].items():
+            store.column(prop)[:len(values)] = values
+        return store
+
+
 class CaptureTheFlagGraph:
-    def __init__(self, json_path):
+    def __init__(self, json_path, display=True):
         with open(json_path, "r") as f:
             self.data = json.load(f)
+        self.display = display
 
         # Build initial graph
         self.G = nx.Graph()
@@ -143,11 +317,35 @@ class CaptureTheFlagGraph:
         self.victory_cities = set()
         self.unit_info = {}  # general unit metadata (range, move type, etc.)
         self.turn_number = 1
+        self.topology_version = 0  # bumped whenever a connection is added or removed
+        self.ownership_version = 0  # bumped whenever a territory changes hands
+        self._edge_cache = None
+        self.air_index = AirMovementIndex()
 
-        self.pending_props = {}
+        self.unit_props = UnitPropertyStore()
+        # (owner, unit type) -> (territory, stack_id) of the stack that most recently received units;
+        # "Property change" lines name only the unit type and owner, so they are attributed here
+        self.last_stack = {}
+
+        # 64-bit Zobrist hash of ownership, unit counts, PUs and unplaced pools, updated in O(1) per change
+        self.zobrist = ZobristTable()
+        self.state_hash = 0
 
         self._build_graph()
         self._load_metadata()
+        self._rebuild_indexes()
+
+        # --- Dirty tracking for incremental encoding ---
+        # every territory-level change bumps change_seq and stamps the territory with it, so any
+        # number of consumers can ask "what changed since seq X" without a shared dirty set
+        self.node_index = {terr: i for i, terr in enumerate(self.G.nodes)}
+        self.change_seq = 0
+        self.territory_versions = np.zeros(len(self.node_index), dtype=np.int64)
+        # bumped by every mutation (territories, PUs, unplaced pools, connections); keys the agent's StateCache
+        self.state_version = 0
+
+        if not self.display:
+            return
 
         #  only for display - can remove
         self.pos = nx.spring_layout(self.G, seed=42)
@@ -176,7 +374,7 @@ class CaptureTheFlagGraph:
                     "unit": unit_info["unit"],
                     "owner": unit_info["owner"],
                     "quantity": unit_info["quantity"],
-                    "properties": {}  # dynamic flags (e.g., has_moved, was_in_combat)
+                    "stack_id": self.unit_props.allocate()  # dynamic flags (e.g., alreadyMoved, wasInCombat) live in unit_props
                 }
                 self.G.nodes[terr]["units"].append(unit_entry)
 
@@ -189,10 +387,274 @@ class CaptureTheFlagGraph:
             self.G.owners[owner] = {
                 "name": owner,
                 "PU": int(pu),
-                "latest_loc": "", # to maintain the latest owner=territory that got updated, for logs that do not mention any territory that the unit belongs to 
                 "unplaced": {}  # dict of units -> qty
             }
 
+    def _rebuild_indexes(self):
+        """
+        Secondary indexes kept current by update_ownership, add_unit and remove_unit:
+            territories_by_owner - owner -> {territory: None} (insertion-ordered set)
+            unit_locations       - (owner, unit type) -> {territory: quantity}
+            unit_totals          - owner -> total units on the map
+            aggregates           - owner -> one value per AGGREGATE_FIELDS: territories, victory cities
+                                   and production owned, units and their purchase cost on the map, PUs
+        Also resets state_hash, whose unit component follows unit_locations.
+        """
+        self.territories_by_owner = {}
+        self.unit_locations = {}
+        self.unit_totals = {}
+        self.aggregates = {}
+        for player, pdata in self.G.owners.items():
+            self._aggregate(player)[AGG_PUS] = pdata["PU"]
+        self.state_hash = self._hash_players()
+        for terr, data in self.G.nodes(data=True):
+            self.territories_by_owner.setdefault(data["owner"], {})[terr] = None
+            self._aggregate_territory(terr, data["owner"], 1)
+            self.state_hash ^= self.zobrist.key("own", terr, data["owner"])
+            for u in data["units"]:
+                self._index_units(terr, u["unit"], u["owner"], u["quantity"])
+
+    def _index_units(self, territory, unit, owner, delta):
+        locations = self.unit_locations.setdefault((owner, unit), {})
+        old_qty = locations.get(territory, 0)
+        qty = old_qty + delta
+        if qty > 0:
+            locations[territory] = qty
+        else:
+            locations.pop(territory, None)
+            qty = 0
+        self._toggle_count("units", (territory, owner, unit), old_qty, qty)
+        self.unit_totals[owner] = self.unit_totals.get(owner, 0) + delta
+        row = self._aggregate(owner)
+        row[AGG_UNITS] += delta
+        row[AGG_UNIT_VALUE] += delta * self.unit_costs.get(unit, 0)
+
+    # --- Per-player aggregates ---
+    def _aggregate(self, owner):
+        row = self.aggregates.get(owner)
+        if row is None:
+            row = self.aggregates[owner] = [0] * len(AGGREGATE_FIELDS)
+        return row
+
+    def _aggregate_territory(self, territory, owner, sign):
+        row = self._aggregate(owner)
+        row[AGG_TERRITORIES] += sign
+        if territory in self.victory_cities:
+            row[AGG_VICTORY_CITIES] += sign
+        row[AGG_INCOME] += sign * self.territory_production.get(territory, 0)
+
+    def player_aggregate(self, player, field):
+        """One AGGREGATE_FIELDS value of a player, e.g. player_aggregate("Russians", "victory_cities")."""
+        row = self.aggregates.get(player)
+        return 0 if row is None else row[AGGREGATE_FIELDS.index(field)]
+
+    def aggregate_vector(self, player=None):
+        """
+        AGGREGATE_FIELDS of one player as a float32 vector, or of every player in G.owners order
+        (the order of the owner one-hot in the encoding) as a [P, len(AGGREGATE_FIELDS)] matrix.
+        """
+        if player is not None:
+            return np.array(self.aggregates.get(player, [0] * len(AGGREGATE_FIELDS)), dtype=np.float32)
+        zero = [0] * len(AGGREGATE_FIELDS)
+        return np.array([self.aggregates.get(p, zero) for p in self.G.owners], dtype=np.float32).reshape(
+            len(self.G.owners), len(AGGREGATE_FIELDS))
+
+    def winner(self, victory_cities_needed=None):
+        """The player holding at least victory_cities_needed (default: all) victory cities, else None."""
+        needed = victory_cities_needed or len(self.victory_cities)
+        if not needed:
+            return None
+        for player in self.G.owners:
+            if self.player_aggregate(player, "victory_cities") >= needed:
+                return player
+        return None
+
+    def compute_aggregates(self):
+        """The per-player aggregates recomputed from the graph itself, independent of the indexes."""
+        aggregates = {p: [0] * len(AGGREGATE_FIELDS) for p in self.G.owners}
+        for player, pdata in self.G.owners.items():
+            aggregates[player][AGG_PUS] = pdata["PU"]
+        for terr, data in self.G.nodes(data=True):
+            row = aggregates.setdefault(data["owner"], [0] * len(AGGREGATE_FIELDS))
+            row[AGG_TERRITORIES] += 1
+            row[AGG_VICTORY_CITIES] += terr in self.victory_cities
+            row[AGG_INCOME] += self.territory_production.get(terr, 0)
+            for u in data["units"]:
+                row = aggregates.setdefault(u["owner"], [0] * len(AGGREGATE_FIELDS))
+                row[AGG_UNITS] += u["quantity"]
+                row[AGG_UNIT_VALUE] += u["quantity"] * self.unit_costs.get(u["unit"], 0)
+        return aggregates
+
+    def verify_aggregates(self):
+        """Consistency check: True if the incrementally maintained aggregates match a full recomputation."""
+        expected = {p: row for p, row in self.compute_aggregates().items() if any(row)}
+        actual = {p: row for p, row in self.aggregates.items() if any(row)}
+        if expected != actual:
+            log.warning("aggregates_mismatch", "incremental {}, recomputed {}", actual, expected)
+            return False
+        return True
+
+    # --- Zobrist state hash ---
+    def _toggle_count(self, kind, fields, old_qty, new_qty):
+        if count_bucket(old_qty) == count_bucket(new_qty):
+            return
+        if old_qty:
+            self.state_hash ^= self.zobrist.key(kind, *fields, count_bucket(old_qty))
+        if new_qty:
+            self.state_hash ^= self.zobrist.key(kind, *fields, count_bucket(new_qty))
+
+    def _hash_players(self):
+        h = 0
+        for player, pdata in self.G.owners.items():
+            h ^= self.zobrist.key("pu", player, pdata["PU"])
+            for unit, qty in pdata["unplaced"].items():
+                if qty:
+                    h ^= self.zobrist.key("pool", player, unit, count_bucket(qty))
+        return h
+
+    def compute_state_hash(self):
+        """The state hash recomputed from the graph itself, independent of the indexes."""
+        h = self._hash_players()
+        for terr, data in self.G.nodes(data=True):
+            h ^= self.zobrist.key("own", terr, data["owner"])
+            counts = {}
+            for u in data["units"]:
+                if u["quantity"] > 0:
+                    counts[(u["owner"], u["unit"])] = counts.get((u["owner"], u["unit"]), 0) + u["quantity"]
+            for (owner, unit), qty in counts.items():
+                h ^= self.zobrist.key("units", terr, owner, unit, count_bucket(qty))
+        return h
+
+    def verify_state_hash(self):
+        """Consistency check: True if the incrementally maintained hash matches a full recomputation."""
+        expected = self.compute_state_hash()
+        if expected != self.state_hash:
+            log.warning("state_hash_mismatch", "incremental {:016x}, recomputed {:016x}", self.state_hash, expected)
+            return False
+        return True
+
+    def _mark_dirty(self, territory):
+        self.state_version += 1
+        self.change_seq += 1
+        self.territory_versions[self.node_index[territory]] = self.change_seq
+
+    def changed_since(self, seq):
+        """Node indices of territories whose ownership, units, properties or battle flag changed after seq."""
+        return np.nonzero(self.territory_versions > seq)[0]
+
+    # --- Checkpoint / restore (see checkpoint.py) ---
+    def to_checkpoint(self):
+        """Plain-data snapshot of everything apply_change_line can change."""
+        return {
+            "territories": list(self.G.nodes),
+            "nodes": {
+                terr: {
+                    "owner": data["owner"],
+                    "units": [(u["unit"], u["owner"], u["quantity"], u["stack_id"]) for u in data["units"]],
+                    "battle": data["properties"].get("battle", False),
+                    "unit_counts": dict(data.get("unit_counts", {})),
+                }
+                for terr, data in self.G.nodes(data=True)
+            },
+            "edges": list(self.G.edges),
+            "owners": {p: {**pdata, "unplaced": dict(pdata["unplaced"])} for p, pdata in self.G.owners.items()},
+            "unit_props": self.unit_props.to_state(),
+            "last_stack": dict(self.last_stack),
+            "whoAmI": getattr(self, "whoAmI", None),
+            "turn_number": self.turn_number,
+        }
+
+    def restore(self, state):
+        """Replace the game state with a to_checkpoint() snapshot of the same map."""
+        if set(state["territories"]) != set(self.G.nodes):
+            raise ValueError("Checkpoint was taken on a different map")
+        for terr, node in state["nodes"].items():
+            data = self.G.nodes[terr]
+            data["owner"] = node["owner"]
+            data["units"] = [
+                {"unit": unit, "owner": owner, "quantity": qty, "stack_id": stack_id}
+                for unit, owner, qty, stack_id in node["units"]
+            ]
+            data["properties"]["battle"] = node["battle"]
+            data["unit_counts"] = dict(node["unit_counts"])
+        if set(map(frozenset, state["edges"])) != set(map(frozenset, self.G.edges)):
+            self.G.remove_edges_from(list(self.G.edges))
+            self.G.add_edges_from(state["edges"])
+        self.G.owners = {p: {**pdata, "unplaced": dict(pdata["unplaced"])} for p, pdata in state["owners"].items()}
+        self.unit_props = UnitPropertyStore.from_state(state["unit_props"])
+        self.last_stack = dict(state["last_stack"])
+        if state["whoAmI"] is not None:
+            self.whoAmI = state["whoAmI"]
+        self.turn_number = state["turn_number"]
+        self._rebuild_derived_state()
+
+    # --- Engine resync (state_sync.py) ---
+    def _canonical_territory(self, terr):
+        data = self.G.nodes[terr]
+        counts = {}
+        for u in data["units"]:
+            if u["quantity"] > 0:
+                key = f"{u['unit']}/{u['owner']}"
+                counts[key] = counts.get(key, 0) + u["quantity"]
+        return f"{terr}={data['owner']};" + ",".join(f"{key}/{counts[key]}" for key in sorted(counts)) + "\n"
+
+    def state_digest(self):
+        """
+        CRC32 of ownership, unit counts and PUs in the canonical text helper.canonicalState builds
+        from the engine's GameData: one "territory=owner;unit/owner/qty,..." line per territory and
+        one "player:PUs" line per player with PUs, everything sorted by name.
+        """
+        text = "".join(self._canonical_territory(terr) for terr in sorted(self.G.nodes))
+        text += "".join(f"{p}:{self.G.owners[p]['PU']}\n" for p in sorted(self.G.owners) if self.G.owners[p]["PU"])
+        return zlib.crc32(text.encode("utf-8"))
+
+    def apply_snapshot(self, snapshot):
+        """
+        Replace ownership, units and PUs with the engine's view, sent as a [SNAPSHOT] message:
+        {"territories": {name: {"owner", "units": [[unit, owner, qty], ...]}}, "pus": {player: n}}.
+        The new state is assembled first and swapped in with restore(), so a bad snapshot changes
+        nothing. Stacks that survive keep their stack id and properties. Returns the number of
+        territories that differed.
+        """
+        territories = snapshot["territories"]
+        unknown = set(territories) - set(self.G.nodes)
+        if unknown:
+            raise ValueError(f"Snapshot has unknown territories: {sorted(unknown)[:5]}")
+        before = {terr: self._canonical_territory(terr) for terr in territories}
+        state = self.to_checkpoint()
+        props = UnitPropertyStore.from_state(state["unit_props"])
+        for terr, snap in territories.items():
+            node = state["nodes"][terr]
+            old_ids = {(unit, owner): stack_id for unit, owner, _qty, stack_id in node["units"]}
+            units, counts = [], {}
+            for unit, owner, qty in snap["units"]:
+                if qty <= 0:
+                    continue
+                stack_id = old_ids.pop((unit, owner), None)
+                units.append((unit, owner, qty, props.allocate() if stack_id is None else stack_id))
+                counts[unit] = counts.get(unit, 0) + qty
+            for stack_id in old_ids.values():
+                props.release(stack_id)
+            node.update(owner=snap["owner"], units=units, unit_counts=counts)
+        for player, pus in snapshot.get("pus", {}).items():
+            if player in state["owners"]:
+                state["owners"][player]["PU"] = int(pus)
+        live = {(terr, stack_id) for terr, node in state["nodes"].items() for *_rest, stack_id in node["units"]}
+        state["last_stack"] = {key: loc for key, loc in state["last_stack"].items() if loc in live}
+        state["unit_props"] = props.to_state()
+        self.restore(state)
+        return sum(before[terr] != self._canonical_territory(terr) for terr in territories)
+
+    def _rebuild_derived_state(self):
+        """Recompute indexes and hash, and invalidate every version-keyed cache, after a bulk state swap."""
+        self._rebuild_indexes()
+        self.topology_version += 1
+        self.ownership_version += 1
+        self._edge_cache = None
+        self.change_seq += 1
+        self.territory_versions[:] = self.change_seq
+        self.state_version += 1
+
     def _load_metadata(self):
         # --- Load Production Rules with Unit Stats ---
         unit_stats = self.data.get("unit_stats", {})   
@@ -212,6 +674,16 @@ class CaptureTheFlagGraph:
         # --- Store Unit and Victory City Info ---
         self.unit_info = self.data.get("units", {})
         self.victory_cities = set(self.data.get("victory_cities", []))
+        self.territory_production = self.data.get("territory_production", {})
+        self.unit_costs = {unit: rule["cost"] for unit, rule in self.production_rules.items()}
+        self.air_units = set(self.data.get("air_units", DEFAULT_AIR_UNITS))
+
+        # --- Edge types for the sparse encoding (maps parsed before these keys existed are all land) ---
+        self.sea_territories = set(self.data.get("sea_territories", []))
+        self.canal_edges = set()
+        for canal in self.data.get("canals", []):
+            for a, b in itertools.combinations(canal["territories"], 2):
+                self.canal_edges.add(frozenset((a, b)))
 
 
     #  only for display - can remove
@@ -233,6 +705,8 @@ class CaptureTheFlagGraph:
 
     #  only for display - can remove
     def draw(self):
+        if not self.display:
+            return
         border_colors = []
         labels = {}
         label_pos = {}
@@ -252,8 +726,7 @@ class CaptureTheFlagGraph:
             if units:
                 unit_lines = []
                 for u in units:
-                    props = u.get("properties", {})
-                    in_combat = str(props.get("wasInCombat", "")).lower() == "true"
+                    in_combat = self.unit_props.get(u["stack_id"], "wasInCombat") > 0
                     tag = " [inCombat]" if in_combat else ""
                     unit_lines.append(f"{u['quantity']} {u['unit']} ({u['owner']}){tag}")
                 labels[node] = "\n".join(unit_lines)
@@ -331,19 +804,24 @@ class CaptureTheFlagGraph:
 
     def update_my_role(self, role):
         self.whoAmI = role
-        print(f"WHOAMI updated: {role}")
+        self.state_version += 1
+        log.info("role", "WHOAMI updated: {}", role)
 
     def update_ownership(self, territory, new_owner):
         if territory in self.G.nodes:
+            old_owner = self.G.nodes[territory]["owner"]
             self.G.nodes[territory]["owner"] = new_owner
-            self.G.owners[new_owner]["latest_loc"] = territory
-            print(f"{territory} is now owned by {new_owner}")
+            self.state_hash ^= self.zobrist.key("own", territory, old_owner) ^ self.zobrist.key("own", territory, new_owner)
+            self.territories_by_owner.get(old_owner, {}).pop(territory, None)
+            self.territories_by_owner.setdefault(new_owner, {})[territory] = None
+            self._aggregate_territory(territory, old_owner, -1)
+            self._aggregate_territory(territory, new_owner, 1)
+            self.ownership_version += 1
+            self._mark_dirty(territory)
+            log.debug("ownership", "{} is now owned by {}", territory, new_owner)
 
     def add_unit(self, territory, unit, owner, quantity=1, properties=None):
         """Add a unit to a territory or to a player's unplaced pool (purchase)."""
-        if properties is None:
-            properties = {}
-
         # --- Case 1: Territory placement ---
         if territory in self.G.nodes:
             for u in self.G.nodes[territory]["units"]:
@@ -351,24 +829,27 @@ class CaptureTheFlagGraph:
                     u["quantity"] += quantity
                     break
             else:
-                self.G.nodes[territory]["units"].append({
+                u = {
                     "unit": unit,
                     "owner": owner,
                     "quantity": quantity,
-                    "properties": properties
-                })
+                    "stack_id": self.unit_props.allocate(properties)
+                }
+                self.G.nodes[territory]["units"].append(u)
+            self.last_stack[(owner, unit)] = (territory, u["stack_id"])
+            self._index_units(territory, unit, owner, quantity)
+            self._mark_dirty(territory)
 
             # Keep quick summary updated
             counts = self.G.nodes[territory].setdefault("unit_counts", {})
             counts[unit] = counts.get(unit, 0) + quantity
 
-            print(f"Added {quantity} {unit}(s) for {owner} in {territory}")
+            log.debug("unit_added", "Added {} {}(s) for {} in {}", quantity, unit, owner, territory)
 
         # --- Case 2: Purchase (unplaced pool) ---
         elif territory in self.G.owners:
-            unplaced = self.G.owners[territory]["unplaced"]
-            unplaced[unit] = unplaced.get(unit, 0) + quantity
-            print(f"Purchased {quantity} {unit}(s) for {territory}")
+            self._update_unplaced(territory, unit, quantity)
+            log.debug("unit_purchased", "Purchased {} {}(s) for {}", quantity, unit, territory)
 
 
 
@@ -378,51 +859,109 @@ class CaptureTheFlagGraph:
             units = self.G.nodes[territory]["units"]
             for u in units:
                 if u["unit"] == unit and u["owner"] == owner:
+                    self._index_units(territory, unit, owner, -min(quantity, u["quantity"]))
+                    self._mark_dirty(territory)
                     u["quantity"] -= quantity
                     if u["quantity"] <= 0:
                         units.remove(u)
+                        self.unit_props.release(u["stack_id"])
+                        if self.last_stack.get((owner, unit), (None, None))[1] == u["stack_id"]:
+                            del self.last_stack[(owner, unit)]
                     break
-            print(f"Removed {quantity} {unit}(s) of {owner} from {territory}")
+            log.debug("unit_removed", "Removed {} {}(s) of {} from {}", quantity, unit, owner, territory)
 
         elif territory in self.G.owners:
-            unplaced = self.G.owners[territory]["unplaced"]
-            unplaced[unit] = unplaced.get(unit, 0) - quantity
-            print(f"Placed {quantity} {unit}(s) for {territory}")
+            self._update_unplaced(territory, unit, -quantity)
+            log.debug("unit_placed", "Placed {} {}(s) for {}", quantity, unit, territory)
+
 
+    def _update_unplaced(self, player, unit, delta):
+        unplaced = self.G.owners[player]["unplaced"]
+        old_qty = unplaced.get(unit, 0)
+        unplaced[unit] = old_qty + delta
+        self._toggle_count("pool", (player, unit), old_qty, old_qty + delta)
+        self.state_version += 1
+
+    def clear_unplaced(self, player):
+        unplaced = self.G.owners[player]["unplaced"]
+        if not unplaced:
+            return
+        for unit, qty in unplaced.items():
+            self._toggle_count("pool", (player, unit), qty, 0)
+        unplaced.clear()
+        self.state_version += 1
 
     def update_unit_property(self, unit, owner, prop, new_val):
         """
-        Update a property for a specific unit in a territory.
-        Automatically stores old value for reference.
+        Update a property of the (owner, unit) stack that most recently received units.
+        Property changes inside a CompositeChange are applied after its unit changes (see
+        apply_change_line), so for moves this is the destination stack.
         """
-        if not hasattr(self, "pending_props"):
-            self.pending_props = {}
-        territory = self.G.owners[owner]["latest_loc"]
-        if territory and territory in self.G.nodes:
-            for u in self.G.nodes[territory]["units"]:
-                if u["unit"] == unit and u["owner"] == owner:
-                    old_val = u["properties"].get(prop, None)
-                    u["properties"][prop] = new_val
-                    print(f"Updated {unit} ({owner}) in {territory}: {prop} changed from {old_val} to {new_val}")
-                    break
-            else:
-                self.pending_props[prop] = new_val
-                print(f"Updated pending props: {self.pending_props}")
+        target = self.last_stack.get((owner, unit))
+        if target is None:
+            log.debug("property_no_stack", "No {} ({}) stack to set {}={} on", unit, owner, prop, new_val)
+            return
+        territory, stack_id = target
+        old_val = self.unit_props.set(stack_id, prop, new_val)
+        self._mark_dirty(territory)
+        log.debug("property", "Updated {} ({}) in {}: {} changed from {} to {}", unit, owner, territory, prop, old_val, new_val)
 
 
 
     def add_connection(self, from_t, to_t):
         self.G.add_edge(from_t, to_t, color="black")  # default color
-        print(f"Connection added between {from_t} and {to_t}")
+        self.topology_version += 1
+        self.state_version += 1
+        log.debug("connection", "Connection added between {} and {}", from_t, to_t)
 
     def remove_connection(self, from_t, to_t):
         if self.G.has_edge(from_t, to_t):
             self.G.remove_edge(from_t, to_t)
-            print(f"Connection removed between {from_t} and {to_t}")
+            self.topology_version += 1
+            self.state_version += 1
+            log.debug("connection", "Connection removed between {} and {}", from_t, to_t)
+
+    def edge_type(self, a, b):
+        if frozenset((a, b)) in self.canal_edges:
+            return EDGE_TYPES.index("canal")
+        if a in self.sea_territories or b in self.sea_territories:
+            return EDGE_TYPES.index("sea")
+        return EDGE_TYPES.index("land")
+
+    def get_edge_index(self):
+        """
+        Sparse adjacency in COO form, both directions, sorted by source node so it doubles as CSR.
+        Returns (edge_index [2, E] int32, edge_attr [E, len(EDGE_TYPES)] one-hot, indptr [N + 1]).
+        Cached until the topology changes.
+        """
+        if self._edge_cache is not None and self._edge_cache[0] == self.topology_version:
+            return self._edge_cache[1]
+
+        node_idx = {terr: i for i, terr in enumerate(self.G.nodes)}
+        edges = []
+        for a, b in self.G.edges:
+            t = self.edge_type(a, b)
+            edges.append((node_idx[a], node_idx[b], t))
+            edges.append((node_idx[b], node_idx[a], t))
+        edges.sort()
+
+        edge_index = np.array([[e[0] for e in edges], [e[1] for e in edges]], dtype=np.int32).reshape(2, len(edges))
+        edge_attr = np.zeros((len(edges), len(EDGE_TYPES)), dtype=np.float32)
+        edge_attr[np.arange(len(edges)), [e[2] for e in edges]] = 1.0
+        indptr = np.zeros(len(node_idx) + 1, dtype=np.int32)
+        np.cumsum(np.bincount(edge_index[0], minlength=len(node_idx)), out=indptr[1:])
+
+        result = (edge_index, edge_attr, indptr)
+        self._edge_cache = (self.topology_version, result)
+        return result
 
     def update_pus(self, player, qty):
-        self.G.owners[player]["PU"] += qty
-        print(f"Updated resources for {player}: {self.G.owners[player]["PU"]}")
+        old_pu = self.G.owners[player]["PU"]
+        self.G.owners[player]["PU"] = old_pu + qty
+        self.state_hash ^= self.zobrist.key("pu", player, old_pu) ^ self.zobrist.key("pu", player, old_pu + qty)
+        self._aggregate(player)[AGG_PUS] += qty
+        self.state_version += 1
+        log.debug("pus", "Updated resources for {}: {}", player, old_pu + qty)
 
     def add_battle_record(self, player, battle_id, territory):
         """
@@ -431,7 +970,8 @@ class CaptureTheFlagGraph:
         """
         # self.G.graph.setdefault("battles", {}).setdefault(player, []).append(battle)
         self.G.nodes[territory]["properties"]["battle"] = True
-        print(f"{player}: Battle at {territory}")
+        self._mark_dirty(territory)
+        log.debug("battle", "{}: Battle at {}", player, territory)
 
 
 
@@ -447,6 +987,13 @@ class CaptureTheFlagGraph:
             self.update_my_role(role)
             return
 
+        # --- Round number ---
+        m = re.search(r"Starting Round (\d+)", line)
+        if m:
+            self.turn_number = int(m.group(1))
+            log.info("round", "Round {}", self.turn_number)
+            return
+
         # havent checked in composite
         if "Adding Battle Records:" in line:
             m = re.search(r"Adding Battle Records: \[(.*?)\]", line)
@@ -494,10 +1041,16 @@ class CaptureTheFlagGraph:
                 inner_text
             )
 
+            # property changes carry no territory, so apply them once the units they refer to have moved
+            deferred = []
             for p in parts:
                 p = p.strip()
-                if p:
+                if p.startswith("Property change"):
+                    deferred.append(p)
+                elif p:
                     self.apply_change_line(p, 1)
+            for p in deferred:
+                self.apply_change_line(p, 1)
             return
 
         # --- Territory takes ---
@@ -518,10 +1071,6 @@ class CaptureTheFlagGraph:
                 if m2:
                     unit, owner = m2.groups()
                     self.add_unit(territory, unit.strip(), owner.strip())
-                    if self.pending_props != {}:
-                        for key in self.pending_props.keys():
-                            self.update_unit_property(unit.strip(), owner.strip(), key, self.pending_props[key])
-                        self.pending_props = {}
             return
 
         # --- Remove unit change ---
@@ -560,19 +1109,23 @@ class CaptureTheFlagGraph:
             return
 
     def get_factories(self, player):
-        factories = []
-        for territory, data in self.G.nodes(data=True):
-            for unit in data["units"]:
-                if unit["owner"] == player and unit["unit"] == "factory":
-                    factories.append(territory)
-        return factories
+        return list(self.unit_locations.get((player, "factory"), ()))
+
+    def get_owned_territories(self, player):
+        return list(self.territories_by_owner.get(player, ()))
+
+    def get_unit_locations(self, player, unit):
+        """{territory: quantity} for every territory where player has units of this type."""
+        return self.unit_locations.get((player, unit), {})
+
+    def get_unit_total(self, player):
+        return self.unit_totals.get(player, 0)
     
     def get_player_resources(self, player):
         return self.G.owners[player]["PU"]
     
 
 def generate_legal_purchase_moves(ctf, player):
-    ctf.G.owners[ctf.whoAmI]["unplaced"].clear()
     # print("Before purchase: ", ctf.G.owners[ctf.whoAmI]["unplaced"])
     rules = ctf.production_rules
     resources = ctf.get_player_resources(player)
@@ -615,16 +1168,15 @@ def print_legal_moves(moves):
 def generate_legal_combat_moves(ctf, player):
     legal_moves = []
 
-    for terr, data in ctf.G.nodes(data=True):
-        if data.get("owner") != player:
-            continue
+    for terr in ctf.get_owned_territories(player):
+        data = ctf.G.nodes[terr]
 
         for u in data.get("units", []):
             if u["owner"] != player or u["quantity"] <= 0:
                 continue
 
             move_range = ctf.production_rules.get(u["unit"], {}).get("move", 1)
-            if move_range <= 0 or u["unit"] in ("factory", "aaGun"):
+            if move_range <= 0 or u["unit"] in ("factory", "aaGun") or u["unit"] in ctf.air_units:
                 continue
 
             # BFS traversal: (current_territory, steps, path)
@@ -661,21 +1213,22 @@ def generate_legal_combat_moves(ctf, player):
                     if steps + 1 < move_range:
                         queue.append((neighbor, steps + 1, path + [neighbor]))
 
+    # planes: precomputed distance tables, only destinations they can still land from
+    legal_moves.extend(ctf.air_index.moves(ctf, player, "combat"))
     return legal_moves
 
 def generate_legal_noncombat_moves(ctf, player):
     legal_moves = []
 
-    for terr, data in ctf.G.nodes(data=True):
-        if data.get("owner") != player:
-            continue
+    for terr in ctf.get_owned_territories(player):
+        data = ctf.G.nodes[terr]
 
         for u in data.get("units", []):
             if u["owner"] != player or u["quantity"] <= 0:
                 continue
 
             move_range = ctf.production_rules.get(u["unit"], {}).get("move", 1)
-            if move_range <= 0 or u["unit"] in ("factory", "aaGun"):
+            if move_range <= 0 or u["unit"] in ("factory", "aaGun") or u["unit"] in ctf.air_units:
                 continue
 
             # BFS: explore up to move_range steps through friendly territories
@@ -715,6 +1268,7 @@ def generate_legal_noncombat_moves(ctf, player):
                     if steps + 1 < move_range:
                         queue.append((neighbor, steps + 1, path + [neighbor]))
 
+    legal_moves.extend(ctf.air_index.moves(ctf, player, "noncombat"))
     return legal_moves
 
 def generate_legal_place_moves(ctf, player):
@@ -758,13 +1312,13 @@ def convert_action_to_json(move, move_type):
 
         target_location = place_in[0]  # Assuming one placement location
         for unit, qty in move.get("purchase", {}).items():
-            for _ in range(qty):
-                actions.append({
-                    "delegate": move_type,
-                    "unit": unit,
-                    "from": "",
-                    "to": target_location
-                })
+            actions.append({
+                "delegate": move_type,
+                "unit": unit,
+                "from": "",
+                "to": target_location,
+                "quantity": qty
+            })
 
     # elif move_type == "combat":
     #     for m in move:
@@ -785,7 +1339,8 @@ def convert_action_to_json(move, move_type):
                 "delegate": move_type,
                 "from": "",
                 "to": m.get("to"),
-                "unit": m.get("unit")
+                "unit": m.get("unit"),
+                "quantity": 1
             })
     else:
         action = {
@@ -794,6 +1349,7 @@ def convert_action_to_json(move, move_type):
             "to": move.get("to"),
             # "steps": move.get("steps"),
             "unit": move.get("units"),
+            "quantity": 1,
             # "max_quantity": move.get("max_quantity"),
             # "target_owner": move.get("target_owner"),
             # "path": move.get("path", [])
@@ -802,13 +1358,89 @@ def convert_action_to_json(move, move_type):
     
     return actions
 
+def convert_attack_plan_to_json(plan):
+    return [
+        {
+            "delegate": "combat",
+            "from": stack["from"],
+            "to": plan["to"],
+            "unit": stack["unit"],
+            "quantity": stack["quantity"]
+        }
+        for stack in plan["units"]
+    ]
+
+
+# --- Response protocol ---
+# 1: JSON list with one {"delegate", "unit", "from", "to"} object per unit (what the Java side parsed originally)
+# 2: {"v": 2, "a": [[delegate, unit, from, to, quantity], ...]}, one row per (delegate, unit, from, to)
+# The Java side opens with "[HELLO] protocol=N" and both ends use min(N, PROTOCOL_VERSION); without a
+# handshake the agent answers in protocol 1. Protocol 3 adds state digests to CHANGE acks (state_sync.py).
+PROTOCOL_VERSION = 3
+
+
+def negotiate_protocol(line):
+    m = re.search(r"protocol=(\d+)", line)
+    requested = int(m.group(1)) if m else 1
+    return max(1, min(requested, PROTOCOL_VERSION))
+
+
+def expand_actions(actions):
+    """Protocol 1: one action object per unit, without the quantity field."""
+    expanded = []
+    for a in actions:
+        single = {k: v for k, v in a.items() if k != "quantity"}
+        expanded.extend(dict(single) for _ in range(a.get("quantity", 1)))
+    return expanded
+
+
+def compact_actions(actions):
+    """Protocol 2 message: actions with the same delegate, unit, source and target are merged."""
+    rows = {}
+    for a in actions:
+        key = (a["delegate"], a["unit"], a["from"] or "", a["to"])
+        rows[key] = rows.get(key, 0) + a.get("quantity", 1)
+    return {"v": 2, "a": [[*key, qty] for key, qty in rows.items()]}
+
+
+def encode_response(response, protocol=1):
+    """Serialise a reply line. Action lists follow the negotiated protocol; anything else (ACK, handshake) is plain JSON."""
+    if isinstance(response, list):
+        if protocol >= 2:
+            return json.dumps(compact_actions(response), separators=(",", ":"))
+        return json.dumps(expand_actions(response))
+    return json.dumps(response)
+
 
 class OnlineGreedyAgent:
-    def __init__(self, state_dim, gamma=0.99, alpha=1e-3, epsilon=0.2, epsilon_decay=0.99995):
+    def __init__(self, state_dim, gamma=0.99, alpha=1e-3, epsilon=0.2, epsilon_decay=0.99995, metrics=None,
+                 sparse_adjacency=False, attack_plans=True, influence_features=False, cache_size=64, learner=None,
+                 value_net=None, publisher=None):
         self.gamma = gamma
         self.alpha = alpha
         self.epsilon = epsilon
         self.epsilon_decay = epsilon_decay
+        self.metrics = metrics if metrics is not None else AgentMetrics()
+        self.sparse_adjacency = sparse_adjacency  # edge_index/edge_attr instead of the dense N x N matrix
+        self._node_cache = None
+        self.attack_plans = attack_plans  # combat: best combined attack plan, random single move with prob. epsilon
+        self.influence = InfluenceMap()
+        self.influence_features = influence_features  # append per-player attack/defense reach to node features
+        # legal moves, encodings and attack plans per (state version, delegate, player); repeated
+        # [MY_MOVE] requests with no CHANGE in between are served from here
+        self.cache = StateCache(cache_size)
+        self.metrics.register_source("cache", self.cache.stats)
+        # online TD(0) value learning from the states seen at each decision (see td_learner.py)
+        self.learner = learner
+        self._last_decision = None  # (state vector, delegate index, owned territory count)
+        if learner is not None:
+            self.metrics.register_source("td", learner.stats)
+        # graph value network (gnn_inference.GraphValueNet) that ranks single-unit moves
+        self.value_net = value_net
+        # shared-memory publication of every new state encoding (state_publisher.py)
+        self.publisher = publisher
+        if publisher is not None:
+            self.metrics.register_source("state_shm", publisher.stats)
         # self.w = np.zeros(state_dim, dtype=np.float32)
 
     # def value(self, s):
@@ -844,17 +1476,80 @@ class OnlineGreedyAgent:
 
     #     return best_action
 
+    def _cached(self, ctf, delegate, kind, compute):
+        self.cache.sync(ctf.state_version)
+        return self.cache.get_or_compute((ctf.state_version, delegate, ctf.whoAmI, kind), compute)
+
+    def cached_state_encoding(self, ctf, delegate):
+        return self._cached(ctf, delegate, "encoding", lambda: self.get_state_encoding(ctf, delegate))
+
+    def value(self, state):
+        """Learned V(s) of an encoded state, read from the learner's latest weight snapshot."""
+        return 0.0 if self.learner is None else self.learner.value(state_vector(state))
+
+    def choose_move(self, ctf, delegate, legal_moves):
+        """
+        Random legal move, or with a value network (and prob. 1 - epsilon) the move whose successor
+        state it rates highest. Successors are the current encoding with one unit shifted between
+        the two territories' total-unit features; all of them go through one batched forward pass.
+        """
+        if self.value_net is None or random.random() < self.epsilon:
+            return random.choice(legal_moves)
+        t0 = self.metrics.start()
+        state = self.cached_state_encoding(ctf, delegate)
+        x = np.asarray(state["node_features"], dtype=np.float32)
+        total_units = len(ctf.G.owners)  # first column after the owner one-hot
+        rows = np.arange(len(legal_moves))
+        src = np.array([ctf.node_index[m["from"]] for m in legal_moves])
+        dst = np.array([ctf.node_index[m["to"]] for m in legal_moves])
+        successors = np.repeat(x[None], len(legal_moves), axis=0)
+        successors[rows, src, total_units] -= 1.0
+        successors[rows, dst, total_units] += 1.0
+        global_features = np.repeat(np.asarray(state["global_features"], dtype=np.float32)[None], len(legal_moves), axis=0)
+        edge_index, _, indptr = ctf.get_edge_index()
+        values = self.value_net.predict_shared(successors, indptr, edge_index[1], global_features)
+        self.metrics.record("value_net", delegate, t0)
+        return legal_moves[int(np.argmax(values))]
+
+    def check_value_net(self, ctf):
+        """Raise ValueError if the value network expects a different encoding width than this agent produces."""
+        state = self.get_state_encoding(ctf, "combat")
+        widths = (np.shape(state["node_features"])[1], len(state["global_features"]))
+        if widths != (self.value_net.node_dim, self.value_net.global_dim):
+            raise ValueError(
+                f"value network expects {self.value_net.node_dim} node / {self.value_net.global_dim} global features, "
+                f"the encoding has {widths[0]} / {widths[1]} (trained with a different INFLUENCE_FEATURES setting "
+                f"or player count?)")
+
+    def observe_transition(self, ctf, delegate, state):
+        """
+        Hand the learner the transition from the previous decision to this one; the reward is the
+        change in the number of territories we own, and the transition is terminal once some
+        player holds every victory city.
+        """
+        x = state_vector(state)
+        owned = ctf.player_aggregate(ctf.whoAmI, "territories")
+        if self._last_decision is not None:
+            prev_x, prev_action, prev_owned = self._last_decision
+            if len(prev_x) == len(x):
+                self.learner.push(prev_x, prev_action, owned - prev_owned, x, done=ctf.winner() is not None)
+        self._last_decision = (x, DELEGATES.index(delegate), owned)
+
     def get_move(self, line, ctf):
         line = line.strip()
-        print("\n")
-        print(line)
+        log.debug("move_request", "{}", line)
         
+        metrics = self.metrics
         try:
             m = re.search(r"\[MY_MOVE\] (\w+)", line)
             if m:
                 move_type = m.group(1)
+                t0 = metrics.start()
                 if move_type == "purchase":
-                    legal_moves = generate_legal_purchase_moves(ctf, ctf.whoAmI)
+                    # clear before the cache lookup: it bumps state_version, and the cached generator must only read state
+                    ctf.clear_unplaced(ctf.whoAmI)
+                    legal_moves = self._cached(ctf, move_type, "moves", lambda: generate_legal_purchase_moves(ctf, ctf.whoAmI))
+                    metrics.record("movegen", move_type, t0)
                     if legal_moves:
                         # print("node_features shape:", state["node_features"].shape)
                         # print("adjacency shape:", state["adjacency"].shape)
@@ -865,45 +1560,119 @@ class OnlineGreedyAgent:
                         response = convert_action_to_json(move, "purchase")
                         
                     else:
-                        print("No legal purchase moves available.")
+                        log.info("no_moves", "No legal purchase moves available.")
                         response = []
                 elif move_type == "combat":
-                    legal_moves = generate_legal_combat_moves(ctf, ctf.whoAmI)
-                    if legal_moves:
-                        moves = random.choice(legal_moves)
+                    legal_moves = self._cached(ctf, move_type, "moves", lambda: generate_legal_combat_moves(ctf, ctf.whoAmI))
+                    plan = None
+                    if self.attack_plans and random.random() >= self.epsilon:
+                        plan = self._cached(ctf, move_type, "attack_plan",
+                                            lambda: next(generate_attack_plans(ctf, ctf.whoAmI, k=1), None))
+                    metrics.record("movegen", move_type, t0)
+                    if plan is not None:
+                        response = convert_attack_plan_to_json(plan)
+                    elif legal_moves:
+                        moves = self.choose_move(ctf, move_type, legal_moves)
                         response = convert_action_to_json(moves, "combat")
                     else:
-                        print("No legal combat moves available.")
+                        log.info("no_moves", "No legal combat moves available.")
                         response = []
                 elif move_type == "noncombat":
-                    legal_moves = generate_legal_noncombat_moves(ctf, ctf.whoAmI)
+                    legal_moves = self._cached(ctf, move_type, "moves", lambda: generate_legal_noncombat_moves(ctf, ctf.whoAmI))
+                    metrics.record("movegen", move_type, t0)
                     if legal_moves:
-                        moves = random.choice(legal_moves)
+                        moves = self.choose_move(ctf, move_type, legal_moves)
                         response = convert_action_to_json(moves, "noncombat")
                     else:
-                        print("No legal noncombat moves available.")
+                        log.info("no_moves", "No legal noncombat moves available.")
                         response = []
                 elif move_type == "place":
-                    legal_moves = generate_legal_place_moves(ctf, ctf.whoAmI)
+                    legal_moves = self._cached(ctf, move_type, "moves", lambda: generate_legal_place_moves(ctf, ctf.whoAmI))
+                    metrics.record("movegen", move_type, t0)
                     if legal_moves:
                         moves = random.choice(legal_moves)
                         response = convert_action_to_json(moves, "place")
                         response = []
                     else:
-                        print("No legal place moves available.")
+                        log.info("no_moves", "No legal place moves available.")
                         response = []          
                 else:
-                    print("Unsupported move type:", move_type)
+                    log.warning("move_type", "Unsupported move type: {}", move_type)
                     response = []
-            state = self.get_state_encoding(ctf, move_type)
+            t0 = metrics.start()
+            state = self.cached_state_encoding(ctf, move_type)
+            metrics.record("encode", move_type, t0)
+            if self.learner is not None:
+                t0 = metrics.start()
+                self.observe_transition(ctf, move_type, state)
+                metrics.record("td_observe", move_type, t0)
+            if self.publisher is not None:
+                t0 = metrics.start()
+                self.publisher.publish(state, ctf.topology_version)
+                metrics.record("shm_publish", move_type, t0)
+            t0 = metrics.start()
             append_state_to_csv(state)
+            metrics.record("csv_write", move_type, t0)
             return response    
         except Exception as e:
-            print(e)
+            log.error("get_move", "{}: {}", type(e).__name__, e)
             time.sleep(4)
             return []
 
 
+    def _encode_territory(self, ctf, terr, owner_to_idx):
+        data = ctf.G.nodes[terr]
+        owner_vec = np.zeros(len(owner_to_idx), dtype=np.float32)
+        if data["owner"] in owner_to_idx:
+            owner_vec[owner_to_idx[data["owner"]]] = 1.0
+
+        units = data.get("units", [])
+        total_units = float(sum(u["quantity"] for u in units))
+
+        attack_values, defense_values = [], []
+
+        for u in units:
+            rule = ctf.production_rules.get(u["unit"], {})
+            if "attack" in rule:
+                attack_values.append(float(rule["attack"]))
+            if "defense" in rule:
+                defense_values.append(float(rule["defense"]))
+
+        avg_attack = np.mean(attack_values) if attack_values else 0.0
+        avg_defense = np.mean(defense_values) if defense_values else 0.0
+
+        # per-stack flags straight from the property columns
+        stack_ids = [u["stack_id"] for u in units]
+        frac_in_combat = float(ctf.unit_props.column("wasInCombat")[stack_ids].mean()) if stack_ids else 0.0
+        avg_moved = float(ctf.unit_props.column("alreadyMoved")[stack_ids].mean()) if stack_ids else 0.0
+        is_victory_city = float(terr in ctf.victory_cities)
+        in_battle = float(data.get("properties", {}).get("battle", False))
+
+        numeric_features = np.array([
+            total_units, avg_attack, avg_defense,
+            frac_in_combat, avg_moved, is_victory_city, in_battle
+        ], dtype=np.float32)
+
+        return np.concatenate([owner_vec, numeric_features])
+
+    def _encode_nodes(self, ctf):
+        """
+        Node-feature matrix, kept between calls: only rows of territories that changed since the
+        previous encoding (ctf.changed_since) are recomputed.
+        """
+        cache = self._node_cache
+        if cache is None or cache["ctf"] is not ctf:
+            owner_to_idx = {owner: i for i, owner in enumerate(ctf.G.owners.keys())}
+            nodes = list(ctf.G.nodes)
+            matrix = np.array([self._encode_territory(ctf, terr, owner_to_idx) for terr in nodes], dtype=np.float32)
+            cache = self._node_cache = {"ctf": ctf, "owner_to_idx": owner_to_idx, "nodes": nodes, "matrix": matrix}
+        else:
+            matrix, nodes, owner_to_idx = cache["matrix"], cache["nodes"], cache["owner_to_idx"]
+            for i in ctf.changed_since(cache["seq"]):
+                matrix[i] = self._encode_territory(ctf, nodes[i], owner_to_idx)
+        cache["seq"] = ctf.change_seq
+        return matrix.copy()
+
     def get_state_encoding(self, ctf, delegate):
         '''
         state = {
@@ -911,58 +1680,13 @@ class OnlineGreedyAgent:
             adjacency - matrix
             global_features - delegate_type
         }
+        with influence_features, node_features also get attack reach then defense reach per player (see InfluenceMap)
+        with sparse_adjacency, adjacency is replaced by
+            edge_index - [2, E] (src, dst) pairs sorted by src, edge_attr - [E, 3] land/sea/canal one-hot, indptr - CSR row pointers
         '''
-        num_players = len(ctf.G.owners)
-        owner_to_idx = {owner: i for i, owner in enumerate(ctf.G.owners.keys())}
-        num_nodes = len(ctf.G.nodes)
-        
-        node_features = []
-        
-        for terr, data in ctf.G.nodes(data=True):
-            owner_vec = np.zeros(num_players, dtype=np.float32)
-            if data["owner"] in owner_to_idx:
-                owner_vec[owner_to_idx[data["owner"]]] = 1.0
-
-            units = data.get("units", [])
-            total_units = float(sum(u["quantity"] for u in units))
-
-            attack_values, defense_values, in_combat_flags, moved_values = [], [], [], []
-
-            for u in units:
-                rule = ctf.production_rules.get(u["unit"], {})
-                if "attack" in rule:
-                    attack_values.append(float(rule["attack"]))
-                if "defense" in rule:
-                    defense_values.append(float(rule["defense"]))
-
-                props = u.get("properties", {})
-                if str(props.get("wasInCombat", "")).lower() == "true":
-                    in_combat_flags.append(1.0)
-                val = props.get("alreadyMoved", 0)
-                try:
-                    moved_values.append(float(val))
-                except (ValueError, TypeError):
-                    moved_values.append(0.0)
-
-            avg_attack = np.mean(attack_values) if attack_values else 0.0
-            avg_defense = np.mean(defense_values) if defense_values else 0.0
-            frac_in_combat = np.mean(in_combat_flags) if in_combat_flags else 0.0
-            avg_moved = np.mean(moved_values) if moved_values else 0.0
-            is_victory_city = float(terr in ctf.victory_cities)
-            in_battle = float(data.get("properties", {}).get("battle", False))
-
-            numeric_features = np.array([
-                total_units, avg_attack, avg_defense,
-                frac_in_combat, avg_moved, is_victory_city, in_battle
-            ], dtype=np.float32)
-
-            node_vec = np.concatenate([owner_vec, numeric_features])
-            node_features.append(node_vec)
-
-        
-        node_features = np.array(node_features, dtype=np.float32)
-
-        adjacency = nx.to_numpy_array(ctf.G, dtype=np.float32)
+        node_features = self._encode_nodes(ctf)
+        if self.influence_features:
+            node_features = np.concatenate([node_features, self.influence.node_features(ctf, delegate)], axis=1)
 
         delegate_types = ["purchase", "combat", "noncombat"]    
         delegate_onehot = np.zeros(len(delegate_types))    
@@ -971,12 +1695,18 @@ class OnlineGreedyAgent:
 
         state = {
             "node_features": node_features,
-            "adjacency": adjacency,
             "global_features": global_features
         }
+        if self.sparse_adjacency:
+            state["edge_index"], state["edge_attr"], state["indptr"] = ctf.get_edge_index()
+        else:
+            state["adjacency"] = nx.to_numpy_array(ctf.G, dtype=np.float32)
         return state
 
 def append_state_to_csv(state, base_filename="state_dataset2.csv", round_num=None):
+    if "edge_index" in state:
+        return append_sparse_state_to_csv(state, base_filename, round_num)
+
     # Flatten arrays to 1D for easy row appending
     flat_node = state["node_features"].flatten()
     flat_adj = state["adjacency"].flatten()
@@ -1004,13 +1734,111 @@ def append_state_to_csv(state, base_filename="state_dataset2.csv", round_num=Non
         writer.writerow(row)
 
 
+def sparse_edges_filename(base_filename):
+    root, ext = os.path.splitext(base_filename)
+    return f"{root}_edges{ext or '.csv'}"
+
 
-def agent_loop(state_dim, host="127.0.0.1", port=5000):
-    agent = OnlineGreedyAgent(state_dim)
+_written_topologies = {}  # edges file -> set of topology ids already in it
+
+
+def append_sparse_state_to_csv(state, base_filename="state_dataset2.csv", round_num=None):
+    """
+    Sparse counterpart of append_state_to_csv: each row holds node and global features plus a
+    topology id, and the edge list for that id is written once to a sidecar file
+    (see sparse_edges_filename), so disk use grows with edges instead of territories squared.
+    """
+    edge_index = state["edge_index"]
+    edge_attr = state["edge_attr"]
+    topology_id = zlib.crc32(edge_index.tobytes() + edge_attr.tobytes())
+
+    edges_file = sparse_edges_filename(base_filename)
+    known = _written_topologies.get(edges_file)
+    if known is None:
+        known = _written_topologies[edges_file] = set(load_sparse_topologies(edges_file))
+    if topology_id not in known:
+        write_header = not os.path.exists(edges_file)
+        with open(edges_file, "a", newline="") as f:
+            writer = csv.writer(f)
+            if write_header:
+                writer.writerow(["topology", "src", "dst"] + [f"is_{t}" for t in EDGE_TYPES])
+            for (src, dst), attr in zip(edge_index.T, edge_attr):
+                writer.writerow([topology_id, int(src), int(dst)] + [int(a) for a in attr])
+        known.add(topology_id)
+
+    flat_node = state["node_features"].flatten()
+    flat_global = state["global_features"].flatten()
+    row = list(np.concatenate([flat_node, flat_global]))
+    if round_num is not None:
+        row = [round_num] + row
+    row.append(topology_id)
+
+    write_header = not os.path.exists(base_filename)
+    with open(base_filename, "a", newline="") as f:
+        writer = csv.writer(f)
+        if write_header:
+            header = []
+            if round_num is not None:
+                header.append("round")
+            header += [f"node_feat_{i}" for i in range(len(flat_node))]
+            header += [f"global_{i}" for i in range(len(flat_global))]
+            header.append("topology")
+            writer.writerow(header)
+        writer.writerow(row)
+
+
+def load_sparse_topologies(edges_file):
+    """Read a sparse edges sidecar into {topology_id: (edge_index [2, E], edge_attr [E, 3])}."""
+    if not os.path.exists(edges_file):
+        return {}
+    grouped = {}
+    with open(edges_file, newline="") as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        for row in reader:
+            grouped.setdefault(int(row[0]), []).append([int(v) for v in row[1:]])
+    topologies = {}
+    for topology_id, rows in grouped.items():
+        arr = np.array(rows, dtype=np.int32)
+        topologies[topology_id] = (arr[:, :2].T.copy(), arr[:, 2:].astype(np.float32))
+    return topologies
+
+
+def densify_state(state):
+    """Return a copy of a sparse state with the dense N x N adjacency the original encoding used."""
+    if "adjacency" in state:
+        return state
+    n = state["node_features"].shape[0]
+    adjacency = np.zeros((n, n), dtype=np.float32)
+    adjacency[state["edge_index"][0], state["edge_index"][1]] = 1.0
+    dense = {k: v for k, v in state.items() if k not in ("edge_index", "edge_attr", "indptr")}
+    dense["adjacency"] = adjacency
+    return dense
+
+
+
+def agent_loop(state_dim, host="127.0.0.1", port=5000, metrics=None, sparse_adjacency=False, influence_features=False,
+               cache_size=64, checkpointer=None, learner=None, profiler=None, state_sync=None, value_net=None,
+               publisher=None):
+    if metrics is None:
+        metrics = AgentMetrics()
+    if profiler is None:
+        profiler = SamplingProfiler()
+    if state_sync is None:
+        state_sync = StateSync()
+    metrics.register_source("state_sync", state_sync.stats)
+    metrics.install_dump_signal()
+    agent = OnlineGreedyAgent(state_dim, metrics=metrics, sparse_adjacency=sparse_adjacency,
+                              influence_features=influence_features, cache_size=cache_size, learner=learner,
+                              value_net=value_net, publisher=publisher)
+    if value_net is not None:
+        # a mismatch would otherwise fail every combat / noncombat decision, which get_move answers with []
+        agent.check_value_net(ctf)
     sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     sock.bind((host, port))
     sock.listen(1)
-    print(f"Server listening on {host}:{port}")
+    log.info("server", "Server listening on {}:{}", host, port)
+    protocol = 1
 
     ctf.draw()
 
@@ -1022,7 +1850,9 @@ def agent_loop(state_dim, host="127.0.0.1", port=5000):
             with conn:
                 buffer = ""
                 while True:
+                    t0 = metrics.start()
                     data = conn.recv(1024)
+                    metrics.record("socket_read", "recv", t0)
                     if not data:
                         break
                     buffer += data.decode()
@@ -1033,25 +1863,60 @@ def agent_loop(state_dim, host="127.0.0.1", port=5000):
                         if not msg:
                             continue
 
+                        # message type is the leading "[TYPE]" tag (CHANGE, INFO, MY_MOVE, ...)
+                        msg_type = msg[1:msg.find("]")] if metrics.enabled and msg.startswith("[") else None
+                        t_msg = t0 = metrics.start()
                         if msg.startswith("[MY_MOVE]"):
-                            response = agent.get_move(msg, ctf)
+                            with profiler.region(msg.split()[1] if " " in msg else "move"):
+                                response = agent.get_move(msg, ctf)
+                            metrics.record("get_move", msg_type, t0)
+                        elif msg.startswith("[HELLO]"):
+                            protocol = negotiate_protocol(msg)
+                            response = {"protocol": protocol}
+                        elif msg.startswith(SNAPSHOT_PREFIX):
+                            response = state_sync.apply(ctf, msg)
+                            metrics.record("snapshot", msg_type, t0)
                         else:
-                            ctf.apply_change_line(msg, 0)
-                            response = "ACK"
-
-                        print("Sending:", response)
-                        conn.send((json.dumps(response) + "\n").encode("utf-8"))
+                            with profiler.region("change"):
+                                ctf.apply_change_line(msg, 0)
+                            response = state_sync.ack(ctf, protocol) if msg.startswith("[CHANGE]") else "ACK"
+                            metrics.record("apply_change_line", msg_type, t0)
+
+                        log.debug("response", "Sending: {}", response)
+                        t0 = metrics.start()
+                        conn.send((encode_response(response, protocol) + "\n").encode("utf-8"))
+                        metrics.record("send", msg_type, t0)
+                        t0 = metrics.start()
                         ctf.draw()
+                        metrics.record("draw", msg_type, t0)
+                        metrics.record("total", msg_type, t_msg)
+                        metrics.maybe_dump()
+                        if checkpointer is not None:
+                            t0 = metrics.start()
+                            if checkpointer.maybe_save(ctf):
+                                metrics.record("checkpoint", msg_type, t0)
 
 
     except KeyboardInterrupt:
         sock.close()
 
     except Exception as e:
-        print(e)
+        log.error("agent_loop", "{}: {}", type(e).__name__, e)
         time.sleep(4)
 
     finally:
+        if metrics.enabled:
+            metrics.dump()
+        if checkpointer is not None:
+            checkpointer.save(ctf)
+        if learner is not None:
+            learner.stop()
+            learner.save_replay(replay_filename("state_dataset2.csv"))
+        profiler.stop()
+        profiler.write()
+        if publisher is not None:
+            publisher.close()
+        log.flush()
         return
                 
 
@@ -1081,35 +1946,96 @@ def agent_loop(state_dim, host="127.0.0.1", port=5000):
 
 
 
-with open("config.json", 'r') as f:
-    data = json.load(f)
-
-xml_file = data["DEFAULT_GAME_URI_PREF"] # Path to your TripleA XML file
-xml_file = xml_file.split("//")[1]
-output_file = "gameInfo/" + data["DEFAULT_GAME_NAME_PREF"]+".json"  # Output JSON file
+if __name__ == "__main__":
+    with open("config.json", 'r') as f:
+        data = json.load(f)
 
-parse_triplea_map(xml_file, output_file)
+    xml_file = data["DEFAULT_GAME_URI_PREF"] # Path to your TripleA XML file
+    xml_file = xml_file.split("//")[1]
+    output_file = "gameInfo/" + data["DEFAULT_GAME_NAME_PREF"]+".json"  # Output JSON file
 
-with open(output_file, "r") as f:
-    game_data = json.load(f)
+    log.configure(
+        level=data.get("LOG_LEVEL", "INFO"),
+        fmt=data.get("LOG_FORMAT", "text"),
+        path=data.get("LOG_PATH"),
+        sample_every=data.get("LOG_SAMPLE_EVERY"),
+    )
 
-ctf = CaptureTheFlagGraph("gameInfo/Capture The Flag.json")
+    parse_triplea_map(xml_file, output_file)
 
+    with open(output_file, "r") as f:
+        game_data = json.load(f)
 
+    ctf = CaptureTheFlagGraph("gameInfo/Capture The Flag.json")
 
-agent_loop(10)
-
-ts = time.strftime("%Y%m%d_%H%M%S")
-
-# Save graph structure as JSON
-json_file = f"final_graph_{ts}.json"
-# with open(json_file, "w") as f:
-#     json.dump(nx.node_link_data(ctf.G), f, indent=2)
-print(f"Graph structure saved as {json_file}")
+    checkpointer = None
+    if data.get("CHECKPOINT_PATH"):
+        checkpointer = Checkpointer(
+            data["CHECKPOINT_PATH"],
+            interval=data.get("CHECKPOINT_INTERVAL", 5.0),
+            every_changes=data.get("CHECKPOINT_EVERY_CHANGES"),
+        )
+        # off by default: nothing ties a checkpoint to a game, and a fresh engine never sends a snapshot to correct it
+        if data.get("CHECKPOINT_RESTORE", False) and restore_checkpoint(ctf, checkpointer.path):
+            log.info("checkpoint", "Restored game state from {} (round {})", checkpointer.path, ctf.turn_number)
 
-# Save figure as PNG
-img_file = f"final_graph_{ts}.png"
-ctf.fig.savefig(img_file, dpi=300, bbox_inches="tight")
-print(f"Graph exported as {img_file}")
-print("\nShutting down...")
 
+    learner = None
+    if data.get("TD_LEARNING", False):
+        learner = TDLearner(
+            capacity=int(data.get("TD_BUFFER_SIZE", 4096)),
+            batch_size=int(data.get("TD_BATCH_SIZE", 32)),
+            prioritized=bool(data.get("TD_PRIORITIZED", False)),
+        )
+        if learner.load_replay(replay_filename("state_dataset2.csv")):
+            log.info("replay", "Loaded {} transitions from {}", learner.buffer.size, replay_filename("state_dataset2.csv"))
+
+    metrics = AgentMetrics(
+        enabled=bool(data.get("METRICS_ENABLED", False)),
+        dump_path=data.get("METRICS_DUMP_PATH", "agent_metrics.json"),
+        dump_interval=data.get("METRICS_DUMP_INTERVAL"),
+    )
+
+    profiler = SamplingProfiler(
+        enabled=bool(data.get("PROFILE_ENABLED", False)),
+        out_dir=data.get("PROFILE_DIR", "profiles"),
+        interval=data.get("PROFILE_INTERVAL_MS", 5) / 1000.0,
+        top_n=int(data.get("PROFILE_TOP_N", 20)),
+    )
+
+    state_sync = StateSync(every=int(data.get("STATE_DIGEST_EVERY", 25)))
+
+    value_net = None
+    if data.get("GNN_WEIGHTS"):
+        value_net = GraphValueNet.load(data["GNN_WEIGHTS"])
+        log.info("value_net", "Loaded graph value network from {} ({} layers)", data["GNN_WEIGHTS"], len(value_net.layers))
+
+    publisher = StatePublisher(data["STATE_SHM_NAME"]) if data.get("STATE_SHM_NAME") else None
+
+    agent_loop(
+        10,
+        metrics=metrics,
+        sparse_adjacency=bool(data.get("SPARSE_ADJACENCY", False)),
+        influence_features=bool(data.get("INFLUENCE_FEATURES", False)),
+        cache_size=int(data.get("CACHE_SIZE", 64)),
+        checkpointer=checkpointer,
+        learner=learner,
+        profiler=profiler,
+        state_sync=state_sync,
+        value_net=value_net,
+        publisher=publisher,
+    )
+
+    ts = time.strftime("%Y%m%d_%H%M%S")
+
+    # Save graph structure as JSON
+    json_file = f"final_graph_{ts}.json"
+    # with open(json_file, "w") as f:
+    #     json.dump(nx.node_link_data(ctf.G), f, indent=2)
+    print(f"Graph structure saved as {json_file}")
+
+    # Save figure as PNG
+    img_file = f"final_graph_{ts}.png"
+    ctf.fig.savefig(img_file, dpi=300, bbox_inches="tight")
+    print(f"Graph exported as {img_file}")
+    print("\nShutting down...")
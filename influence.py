@@ -0,0 +1,123 @@
+import numpy as np
+
+
+class InfluenceMap:
+    """
+    Per-territory attack and defense strength every player can bring to bear, computed from
+    sparse reach sets instead of per-unit searches:
+
+        ball[r][j]         = territories within r moves of j (hops are symmetric)
+        strength[r][i, p]  = sum of attack (or defense) * qty of p's units at i with movement r
+        influence[p, j]    = sum_r sum_{i in ball[r][j]} strength[r][i, p]
+
+    Balls are grown one hop level at a time by a multi-source BFS over the CSR edge list
+    (ctf.get_edge_index), so memory is the number of (territory, territory within r) pairs rather
+    than N x N. They depend only on the topology and are cached per ctf.topology_version; the
+    influence itself is cached per game phase (turn number, delegate).
+    """
+
+    def __init__(self):
+        self._levels = []  # levels[d] = sorted center * N + member keys of pairs exactly d hops apart
+        self._reach = {}
+        self._reach_version = None
+        self._cache_key = None
+        self._cache = None
+
+    def _grow_levels(self, ctf, move_range):
+        if self._reach_version != ctf.topology_version:
+            n = len(ctf.node_index)
+            nodes = np.arange(n, dtype=np.int64)
+            self._levels = [nodes * n + nodes]
+            self._reach = {}
+            self._reach_version = ctf.topology_version
+        if len(self._levels) > move_range:
+            return
+        edge_index, _, indptr = ctf.get_edge_index()
+        indptr, indices = indptr.astype(np.int64), edge_index[1].astype(np.int64)
+        n = len(ctf.node_index)
+        while len(self._levels) <= move_range:
+            centers, members = np.divmod(self._levels[-1], n)
+            degree = indptr[members + 1] - indptr[members]
+            starts = np.repeat(indptr[members] - (np.cumsum(degree) - degree), degree)
+            keys = np.sort(np.repeat(centers, degree) * n + indices[starts + np.arange(degree.sum())])
+            keys = keys[np.concatenate(([True], keys[1:] != keys[:-1]))]
+            # neighbours of the level-d ring lie at d - 1, d or d + 1 hops from its center
+            for ring in self._levels[-2:]:
+                keys = keys[~np.isin(keys, ring, assume_unique=True)]
+            self._levels.append(keys)
+
+    def _reach_matrix(self, ctf, move_range):
+        """(indptr [N + 1], members) listing every territory's ball of radius move_range, CSR style."""
+        self._grow_levels(ctf, move_range)
+        if move_range not in self._reach:
+            n = len(ctf.node_index)
+            centers, members = np.divmod(np.sort(np.concatenate(self._levels[:move_range + 1])), n)
+            indptr = np.zeros(n + 1, dtype=np.int64)
+            np.cumsum(np.bincount(centers, minlength=n), out=indptr[1:])
+            self._reach[move_range] = (indptr, members)
+        return self._reach[move_range]
+
+    def compute(self, ctf, phase=None):
+        """
+        Returns {"players": [...], "attack": [P, N], "defense": [P, N]} for the current phase.
+        phase is any hashable tag for the current game phase (e.g. the delegate); results are
+        reused until the turn number, phase or topology changes.
+        """
+        key = (ctf.turn_number, phase, ctf.topology_version)
+        if self._cache_key == key:
+            return self._cache
+
+        players = list(ctf.G.owners.keys())
+        player_idx = {p: i for i, p in enumerate(players)}
+        n = len(ctf.node_index)
+
+        # strength per movement range, built from the (owner, unit) location index
+        attack_by_range, defense_by_range = {}, {}
+        for (owner, unit), locations in ctf.unit_locations.items():
+            if owner not in player_idx or not locations:
+                continue
+            rule = ctf.production_rules.get(unit, {})
+            attack, defense = rule.get("attack", 0), rule.get("defense", 0)
+            if not attack and not defense:
+                continue
+            move_range = rule.get("move", 1) if unit != "factory" else 0
+            att = attack_by_range.setdefault(move_range, np.zeros((n, len(players)), dtype=np.float32))
+            dfn = defense_by_range.setdefault(move_range, np.zeros((n, len(players)), dtype=np.float32))
+            p = player_idx[owner]
+            for terr, qty in locations.items():
+                i = ctf.node_index[terr]
+                att[i, p] += attack * qty
+                dfn[i, p] += defense * qty
+
+        attack_map = np.zeros((len(players), n), dtype=np.float32)
+        defense_map = np.zeros((len(players), n), dtype=np.float32)
+        for move_range in attack_by_range:
+            # every ball holds its own center, so no reduceat segment is empty
+            indptr, members = self._reach_matrix(ctf, move_range)
+            attack_map += np.add.reduceat(attack_by_range[move_range][members], indptr[:-1]).T
+            defense_map += np.add.reduceat(defense_by_range[move_range][members], indptr[:-1]).T
+
+        self._cache_key = key
+        self._cache = {"players": players, "attack": attack_map, "defense": defense_map}
+        return self._cache
+
+    def threat(self, ctf, player, phase=None):
+        """Total enemy attack strength that can reach each territory, shape [N]."""
+        result = self.compute(ctf, phase)
+        enemies = [i for i, p in enumerate(result["players"]) if p != player]
+        return result["attack"][enemies].sum(axis=0)
+
+    def threatened_territories(self, ctf, player, phase=None):
+        """Own territories where enemy attack reach exceeds own defense reach."""
+        result = self.compute(ctf, phase)
+        threat = self.threat(ctf, player, phase)
+        own_defense = result["defense"][result["players"].index(player)]
+        return [
+            terr for terr in ctf.get_owned_territories(player)
+            if threat[ctf.node_index[terr]] > own_defense[ctf.node_index[terr]]
+        ]
+
+    def node_features(self, ctf, phase=None):
+        """[N, 2P] extra node features: attack reach of every player, then defense reach of every player."""
+        result = self.compute(ctf, phase)
+        return np.concatenate([result["attack"].T, result["defense"].T], axis=1)
@@ -88,4 +88,5 @@ print(legal_purchase_moves)
 
 # Example: If Russians have infantry in RussianStart, they can move to RussianStartLeft, RussianStartRight, or RussianStepOne if those are enemy territories.
 
-# Multi-unit moves: several units from the same or different territories can be combined to attack the same enemy territory.
\ No newline at end of file
+# Multi-unit moves: several units from the same or different territories can be combined to attack the same enemy territory.
+# (implemented in attack_plans.generate_attack_plans)
\ No newline at end of file
@@ -1,25 +1,84 @@
+import os
 import subprocess
 import time
 import signal
 import json
 import xml.etree.ElementTree as ET
+from engine_pool import ENGINE_COMMAND, EnginePool
 
 
 play_rounds = 3
 
 
+def read_round_index(filename):
+    """[(round, segment, byte offset)] from the '<log>.idx' file GameLogWriter keeps next to the log."""
+    try:
+        with open(filename + ".idx", 'r') as f:
+            return [tuple(int(x) for x in line.split()) for line in f if line.strip()]
+    except FileNotFoundError:
+        return []
+
+
+def open_round(filename, round_no):
+    """The game log opened at the first line of round_no, or None if that round is not indexed."""
+    for rnd, segment, offset in read_round_index(filename):
+        if rnd == round_no:
+            # the active log becomes '<log>.<segment>' once it is rotated
+            path = f"{filename}.{segment}" if os.path.exists(f"{filename}.{segment}") else filename
+            f = open(path, 'rb')
+            f.seek(offset)
+            return f
+    return None
+
+
 def count_rounds(filename):
+    index = read_round_index(filename)
+    if index:
+        return len(index)
+    # logs written before the index existed
     try:
         with open(filename, 'r') as f:
             return sum(1 for line in f if "Round" in line)
     except FileNotFoundError:
         return 0
 
+def play_pooled(data):
+    """Play data["GAMES"] games on warm engines kept by an EnginePool instead of one JVM per game."""
+    game_file = data["DEFAULT_GAME_URI_PREF"].split("//")[1]
+    pool = EnginePool(size=int(data["ENGINE_POOL_SIZE"]), command=data.get("ENGINE_COMMAND", ENGINE_COMMAND))
+    with pool:
+        for game in range(int(data.get("GAMES", 1))):
+            engine = pool.acquire()
+            engine.start_game(game_file, player_name=data["PLAYER_NAME"], game_name=data["DEFAULT_GAME_NAME_PREF"])
+            print("Game ", game + 1, " on engine port ", engine.control_port)
+            prev_round = -1
+            try:
+                while engine.alive():
+                    status = engine.status()
+                    if status["state"] == "IDLE":
+                        print("Game ended\n")
+                        break
+                    if status["round"] > play_rounds:
+                        print(play_rounds, " rounds done\n")
+                        break
+                    if prev_round != status["round"]:
+                        prev_round = status["round"]
+                        print("Playing round ", prev_round)
+                    time.sleep(1)
+            finally:
+                pool.release(engine)
+        print("Engine pool: ", pool.stats())
+
+
 def main():
 
     with open("config.json", 'r') as f:
         data = json.load(f)
 
+    if data.get("ENGINE_POOL_SIZE"):
+        play_pooled(data)
+        return
+
     # xml_file = data["DEFAULT_GAME_URI_PREF"] # Path to your TripleA XML file
     # xml_file = xml_file.split("//")[1]
     # output_file = "/home/sanjana/triplea/gameInfo/" + data["DEFAULT_GAME_NAME_PREF"]+".json"  # Output JSON file
@@ -0,0 +1,166 @@
+import os
+import threading
+
+import numpy as np
+
+
+class SumTree:
+    """
+    Binary sum tree in one flat array: leaves (one per slot) live at [size, 2 * size), node i holds
+    tree[2i] + tree[2i + 1], and tree[1] is the total. size is capacity rounded up to a power of two.
+    Updates and proportional sampling both take one vectorised pass per tree level.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.size = 1
+        while self.size < capacity:
+            self.size *= 2
+        self.depth = self.size.bit_length() - 1
+        self.tree = np.zeros(2 * self.size, dtype=np.float64)
+
+    @property
+    def total(self):
+        return float(self.tree[1])
+
+    def update(self, slots, priorities):
+        if len(slots) == 1:
+            # single insert: walking up with scalars is far cheaper than array ops
+            tree = self.tree
+            node = int(slots[0]) + self.size
+            tree[node] = priorities[0]
+            while node > 1:
+                node //= 2
+                tree[node] = tree[2 * node] + tree[2 * node + 1]
+            return
+        nodes = np.asarray(slots, dtype=np.int64) + self.size
+        self.tree[nodes] = priorities
+        for _ in range(self.depth):
+            # all nodes of one level are summed together, so duplicate parents just get the same value twice
+            nodes = nodes // 2
+            self.tree[nodes] = self.tree[2 * nodes] + self.tree[2 * nodes + 1]
+
+    def get(self, slots):
+        return self.tree[np.asarray(slots, dtype=np.int64) + self.size]
+
+    def find(self, values):
+        """Slots whose cumulative-priority interval contains each value in [0, total)."""
+        values = np.array(values, dtype=np.float64)
+        nodes = np.ones(len(values), dtype=np.int64)
+        for _ in range(self.depth):
+            left = 2 * nodes
+            go_right = values >= self.tree[left]
+            values -= self.tree[left] * go_right
+            nodes = left + go_right
+        return nodes - self.size
+
+
+class PrioritizedReplay:
+    """
+    Proportional prioritized replay of (state, action, reward, next state, done) transitions.
+
+    Storage is a ring of preallocated arrays (the oldest transition is evicted once full); priorities
+    live in a SumTree. sample() draws one value from each of batch_size equal slices of the total
+    priority (stratified), and returns importance-sampling weights normalised to a maximum of 1.
+    New transitions get the current max priority so each is replayed at least once soon.
+    Every slot carries a write counter; sample() returns the counters of the drawn slots and
+    update_priorities() ignores slots that have been overwritten since, so a late TD error never
+    lands on a newer transition.
+    Same push()/sample() shape as td_learner.TransitionBuffer, plus update_priorities().
+    """
+
+    def __init__(self, capacity, state_dim, alpha=0.6, beta=0.4, eps=1e-3):
+        self.capacity = capacity
+        self.state_dim = state_dim
+        self.alpha = alpha
+        self.beta = beta
+        self.eps = eps
+        self.states = np.zeros((capacity, state_dim), dtype=np.float32)
+        self.next_states = np.zeros((capacity, state_dim), dtype=np.float32)
+        self.actions = np.zeros(capacity, dtype=np.int32)
+        self.rewards = np.zeros(capacity, dtype=np.float32)
+        self.dones = np.zeros(capacity, dtype=np.float32)
+        self.writes = np.zeros(capacity, dtype=np.int64)
+        self.tree = SumTree(capacity)
+        self.max_priority = 1.0
+        self.index = 0
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def push(self, state, action, reward, next_state, done=False, priority=None):
+        with self.lock:
+            i = self.index
+            self.states[i] = state
+            self.next_states[i] = next_state
+            self.actions[i] = action
+            self.rewards[i] = reward
+            self.dones[i] = float(done)
+            self.writes[i] += 1
+            p = self.max_priority if priority is None else (abs(priority) + self.eps) ** self.alpha
+            self.tree.update([i], [p])
+            self.index = (i + 1) % self.capacity
+            self.size = min(self.size + 1, self.capacity)
+
+    def sample(self, batch_size, rng, beta=None):
+        """Returns (states, actions, rewards, next_states, dones, slots, writes, weights)."""
+        beta = self.beta if beta is None else beta
+        with self.lock:
+            total = self.tree.total
+            segment = total / batch_size
+            values = (np.arange(batch_size) + rng.random(batch_size)) * segment
+            slots = np.minimum(self.tree.find(np.minimum(values, np.nextafter(total, 0))), self.size - 1)
+            probs = self.tree.get(slots) / total
+            weights = (self.size * probs) ** -beta
+            weights /= weights.max()
+            return (self.states[slots], self.actions[slots], self.rewards[slots],
+                    self.next_states[slots], self.dones[slots], slots, self.writes[slots],
+                    weights.astype(np.float32))
+
+    def update_priorities(self, slots, writes, errors):
+        """New priorities from the TD errors of a sample(); slots rewritten since then are skipped."""
+        priorities = (np.abs(errors) + self.eps) ** self.alpha
+        with self.lock:
+            # an overwritten slot holds a newer transition, which keeps the max priority it was pushed with
+            current = self.writes[slots] == writes
+            if not current.any():
+                return
+            slots, priorities = np.asarray(slots)[current], priorities[current]
+            self.tree.update(slots, priorities)
+            self.max_priority = max(self.max_priority, float(priorities.max()))
+
+    def save(self, path):
+        """Atomic .npz dump of the filled part of the buffer, oldest transition first."""
+        with self.lock:
+            order = np.arange(self.index - self.size, self.index) % self.capacity
+            tmp_path = path + ".tmp.npz"
+            np.savez_compressed(
+                tmp_path,
+                states=self.states[order], next_states=self.next_states[order], actions=self.actions[order],
+                rewards=self.rewards[order], dones=self.dones[order], priorities=self.tree.get(order),
+                config=np.array([self.capacity, self.alpha, self.beta, self.eps, self.max_priority]),
+            )
+            os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, capacity=None):
+        with np.load(path) as f:
+            saved_capacity, alpha, beta, eps, max_priority = f["config"]
+            replay = cls(int(capacity or saved_capacity), f["states"].shape[1], alpha, beta, eps)
+            n = min(len(f["states"]), replay.capacity)
+            keep = slice(len(f["states"]) - n, None)  # newest n if the capacity shrank
+            replay.states[:n] = f["states"][keep]
+            replay.next_states[:n] = f["next_states"][keep]
+            replay.actions[:n] = f["actions"][keep]
+            replay.rewards[:n] = f["rewards"][keep]
+            replay.dones[:n] = f["dones"][keep]
+            replay.tree.update(np.arange(n), f["priorities"][keep])
+        replay.max_priority = float(max_priority)
+        replay.size = n
+        replay.index = n % replay.capacity
+        return replay
+
+
+def replay_filename(base_filename):
+    """Replay buffer saved next to a dataset: states.csv -> states_replay.npz"""
+    root, _ = os.path.splitext(base_filename)
+    return root + "_replay.npz"
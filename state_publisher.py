@@ -0,0 +1,208 @@
+import struct
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from agent_log import log
+
+# segment layout: header | slot 0 | slot 1, every part 64-byte aligned.
+# header: magic, layout version, latest published seq, latest slot, max nodes, node dim, global dim,
+#         max edges (sparse) or 0 (dense), slot size in bytes
+HEADER = struct.Struct("<4sIQIIIIIQ")
+# slot header: seqlock stamp (odd while being written), nodes, edges, topology version (-1 unknown)
+SLOT_HEADER = struct.Struct("<QIIq")
+STATE_SHM_MAGIC = b"CTFS"
+STATE_SHM_VERSION = 1
+ALIGN = 64
+
+# segments created by StatePublishers in this process; they share its resource tracker registration
+_published = set()
+
+
+def _aligned(n):
+    return (n + ALIGN - 1) // ALIGN * ALIGN
+
+
+class _Layout:
+    """Byte offsets of one segment, derived from the sizes stored in its header."""
+
+    def __init__(self, max_nodes, node_dim, global_dim, max_edges):
+        self.max_nodes, self.node_dim, self.global_dim, self.max_edges = max_nodes, node_dim, global_dim, max_edges
+        self.dense = max_edges == 0
+        self.nodes_offset = _aligned(SLOT_HEADER.size)
+        self.global_offset = self.nodes_offset + _aligned(4 * max_nodes * node_dim)
+        self.graph_offset = self.global_offset + _aligned(4 * global_dim)
+        graph_bytes = 4 * max_nodes * max_nodes if self.dense else 4 * 2 * max_edges
+        self.slot_bytes = self.graph_offset + _aligned(graph_bytes)
+        self.header_bytes = _aligned(HEADER.size)
+
+    def slot_offset(self, slot):
+        return self.header_bytes + slot * self.slot_bytes
+
+    @property
+    def total_bytes(self):
+        return self.slot_offset(2)
+
+    def views(self, buf, slot):
+        """numpy views of one slot's full-capacity arrays."""
+        base = self.slot_offset(slot)
+        nodes = np.ndarray((self.max_nodes, self.node_dim), np.float32, buf, base + self.nodes_offset)
+        glob = np.ndarray((self.global_dim,), np.float32, buf, base + self.global_offset)
+        if self.dense:
+            graph = np.ndarray((self.max_nodes, self.max_nodes), np.float32, buf, base + self.graph_offset)
+        else:
+            graph = np.ndarray((2, self.max_edges), np.int32, buf, base + self.graph_offset)
+        return nodes, glob, graph
+
+
+class StatePublisher:
+    """
+    Publishes get_state_encoding() states into a named shared-memory segment for other local
+    processes (trainers, dashboards), read with StateReader.
+
+    Two slots form a seqlock double buffer: publish() writes the slot readers are not pointed at,
+    marking its stamp odd while writing and even when done, then flips the header to it. Readers
+    never block the agent and retry only if they catch a slot mid-write. The adjacency (or edge
+    list) is only copied into a slot when the topology version differs from what that slot holds.
+
+    The segment is sized from the first published state (edge capacity with 2x headroom for the
+    sparse encoding); states that do not fit are skipped and counted.
+    """
+
+    def __init__(self, name="ctf_agent_state"):
+        self.name = name
+        self.shm = None
+        self.layout = None
+        self.seq = 0
+        self.skipped = 0
+        self._views = None
+        self._slot_topology = [None, None]
+
+    def _create(self, state):
+        n, node_dim = np.shape(state["node_features"])
+        max_edges = 0 if "adjacency" in state else max(1, 2 * np.shape(state["edge_index"])[1])
+        self.layout = _Layout(n, node_dim, len(state["global_features"]), max_edges)
+        try:
+            self.shm = shared_memory.SharedMemory(self.name, create=True, size=self.layout.total_bytes)
+        except FileExistsError:
+            # left behind by an agent that did not shut down cleanly
+            stale = shared_memory.SharedMemory(self.name)
+            stale.close()
+            stale.unlink()
+            self.shm = shared_memory.SharedMemory(self.name, create=True, size=self.layout.total_bytes)
+        _published.add(self.name)
+        HEADER.pack_into(self.shm.buf, 0, STATE_SHM_MAGIC, STATE_SHM_VERSION, 0, 0, n, node_dim,
+                         self.layout.global_dim, max_edges, self.layout.slot_bytes)
+        self._views = [self.layout.views(self.shm.buf, slot) for slot in (0, 1)]
+        log.info("state_shm", "Publishing state encodings to shared memory '{}' ({} bytes)", self.name, self.shm.size)
+
+    def publish(self, state, topology_version=None):
+        """Write state as the latest snapshot. Returns its sequence number, or None if it did not fit."""
+        if self.shm is None:
+            self._create(state)
+        layout = self.layout
+        x = np.asarray(state["node_features"], dtype=np.float32)
+        g = np.asarray(state["global_features"], dtype=np.float32)
+        n = len(x)
+        dense = "adjacency" in state
+        n_edges = 0 if dense else np.shape(state["edge_index"])[1]
+        if (n > layout.max_nodes or x.shape[1] != layout.node_dim or len(g) != layout.global_dim
+                or dense != layout.dense or n_edges > layout.max_edges):
+            self.skipped += 1
+            return None
+
+        seq = self.seq + 1
+        slot = seq % 2
+        base = layout.slot_offset(slot)
+        buf = self.shm.buf
+        SLOT_HEADER.pack_into(buf, base, 2 * seq - 1, n, n_edges, -1)  # odd: being written
+        nodes, glob, graph = self._views[slot]
+        nodes[:n] = x
+        glob[:] = g
+        if topology_version is None or self._slot_topology[slot] != (topology_version, n):
+            if dense:
+                graph[:n, :n] = np.asarray(state["adjacency"], dtype=np.float32)
+            else:
+                graph[:, :n_edges] = state["edge_index"]
+            self._slot_topology[slot] = None if topology_version is None else (topology_version, n)
+        SLOT_HEADER.pack_into(buf, base, 2 * seq, n, n_edges, -1 if topology_version is None else topology_version)
+        struct.pack_into("<QI", buf, 8, seq, slot)  # header: latest seq and slot
+        self.seq = seq
+        return seq
+
+    def stats(self):
+        return {"published": self.seq, "skipped": self.skipped}
+
+    def close(self, unlink=True):
+        if self.shm is None:
+            return
+        self._views = None
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+        _published.discard(self.name)
+        self.shm = None
+
+
+class StateReader:
+    """
+    Reader side of StatePublisher. read() returns the latest state as
+    {"seq", "topology_version", "node_features", "global_features", "adjacency" or "edge_index"}.
+
+    read(copy=False) returns views into shared memory without copying; they stay valid until the
+    agent has published two more states, which is_current(snapshot) checks.
+    """
+
+    def __init__(self, name="ctf_agent_state"):
+        self.shm = shared_memory.SharedMemory(name)
+        # attaching registers the segment with this process's resource tracker, which would
+        # unlink it when the reader exits; the publisher owns it
+        if name not in _published:
+            resource_tracker.unregister(self.shm._name, "shared_memory")
+        magic, version, _seq, _slot, max_nodes, node_dim, global_dim, max_edges, _slot_bytes = \
+            HEADER.unpack_from(self.shm.buf, 0)
+        if magic != STATE_SHM_MAGIC or version != STATE_SHM_VERSION:
+            raise ValueError(f"Shared memory '{name}' is not a state segment of version {STATE_SHM_VERSION}")
+        self.layout = _Layout(max_nodes, node_dim, global_dim, max_edges)
+        self._views = [self.layout.views(self.shm.buf, slot) for slot in (0, 1)]
+
+    def latest_seq(self):
+        return struct.unpack_from("<Q", self.shm.buf, 8)[0]
+
+    def read(self, copy=True, max_retries=100):
+        """The latest published state, or None if nothing has been published yet."""
+        buf = self.shm.buf
+        for _ in range(max_retries):
+            seq, slot = struct.unpack_from("<QI", buf, 8)
+            if seq == 0:
+                return None
+            base = self.layout.slot_offset(slot)
+            stamp, n, n_edges, topology = SLOT_HEADER.unpack_from(buf, base)
+            if stamp % 2:
+                continue  # the writer lapped us and is rewriting this slot
+            nodes, glob, graph = self._views[slot]
+            state = {
+                "seq": stamp // 2,
+                "topology_version": None if topology < 0 else topology,
+                "node_features": nodes[:n],
+                "global_features": glob,
+            }
+            if self.layout.dense:
+                state["adjacency"] = graph[:n, :n]
+            else:
+                state["edge_index"] = graph[:, :n_edges]
+            if copy:
+                state = {k: v.copy() if isinstance(v, np.ndarray) else v for k, v in state.items()}
+            if SLOT_HEADER.unpack_from(buf, base)[0] == stamp:
+                state["_slot"] = slot
+                return state
+        raise TimeoutError("State segment kept changing while reading")
+
+    def is_current(self, state):
+        """True while the slot a read(copy=False) result points into has not been rewritten."""
+        stamp = SLOT_HEADER.unpack_from(self.shm.buf, self.layout.slot_offset(state["_slot"]))[0]
+        return stamp == 2 * state["seq"]
+
+    def close(self):
+        self._views = None
+        self.shm.close()
@@ -0,0 +1,58 @@
+import json
+
+from agent_log import log
+
+SNAPSHOT_PREFIX = "[SNAPSHOT]"
+
+
+class StateSync:
+    """
+    Drift detection between the engine and the CHANGE-line reconstruction (protocol 3).
+
+    Every `every`-th CHANGE is acknowledged with {"ack": "ACK", "digest": ctf.state_digest()}
+    instead of plain "ACK". The Java side computes the same digest from its GameData and, if they
+    differ, answers with "[SNAPSHOT] {json}", which apply() swaps in with ctf.apply_snapshot().
+    stats() (registered as a metrics source) reports how often the digests disagreed.
+    """
+
+    def __init__(self, every=25):
+        self.every = every
+        self.changes = 0
+        self.digests = 0
+        self.snapshots = 0
+        self.failed_snapshots = 0
+        self.territories_corrected = 0
+        self.changes_at_last_snapshot = 0
+
+    def ack(self, ctf, protocol):
+        self.changes += 1
+        if protocol < 3 or not self.every or self.changes % self.every:
+            return "ACK"
+        self.digests += 1
+        return {"ack": "ACK", "digest": ctf.state_digest()}
+
+    def apply(self, ctf, line):
+        """Handle a [SNAPSHOT] line; a snapshot that cannot be applied leaves ctf unchanged."""
+        try:
+            corrected = ctf.apply_snapshot(json.loads(line[len(SNAPSHOT_PREFIX):]))
+        except (ValueError, KeyError, TypeError) as e:
+            self.failed_snapshots += 1
+            log.error("snapshot", "Could not apply snapshot: {}: {}", type(e).__name__, e)
+            return {"ack": "ERROR"}
+        self.snapshots += 1
+        self.territories_corrected += corrected
+        log.warning("snapshot", "State drifted: resynced {} territories after {} changes",
+                    corrected, self.changes - self.changes_at_last_snapshot)
+        self.changes_at_last_snapshot = self.changes
+        return "ACK"
+
+    def stats(self):
+        return {
+            "changes": self.changes,
+            "digests": self.digests,
+            "snapshots": self.snapshots,
+            "failed_snapshots": self.failed_snapshots,
+            "territories_corrected": self.territories_corrected,
+            # fraction of digest checks that found drift
+            "drift_rate": self.snapshots / self.digests if self.digests else 0.0,
+        }
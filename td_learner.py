@@ -0,0 +1,162 @@
+import os
+import threading
+
+import numpy as np
+
+from replay import PrioritizedReplay
+
+
+def state_vector(state):
+    """Flat float32 feature vector of a get_state_encoding() state: node features, then global features."""
+    return np.concatenate([
+        np.asarray(state["node_features"], dtype=np.float32).ravel(),
+        np.asarray(state["global_features"], dtype=np.float32).ravel(),
+    ])
+
+
+class TransitionBuffer:
+    """
+    Ring buffer of (state, action, reward, next state, done) transitions in preallocated arrays.
+    Once full, the oldest transition is overwritten. push() and sample() may run on different threads.
+    """
+
+    def __init__(self, capacity, state_dim):
+        self.capacity = capacity
+        self.state_dim = state_dim
+        self.states = np.zeros((capacity, state_dim), dtype=np.float32)
+        self.next_states = np.zeros((capacity, state_dim), dtype=np.float32)
+        self.actions = np.zeros(capacity, dtype=np.int32)
+        self.rewards = np.zeros(capacity, dtype=np.float32)
+        self.dones = np.zeros(capacity, dtype=np.float32)
+        self.index = 0
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def push(self, state, action, reward, next_state, done=False):
+        with self.lock:
+            i = self.index
+            self.states[i] = state
+            self.next_states[i] = next_state
+            self.actions[i] = action
+            self.rewards[i] = reward
+            self.dones[i] = float(done)
+            self.index = (i + 1) % self.capacity
+            self.size = min(self.size + 1, self.capacity)
+
+    def sample(self, batch_size, rng):
+        with self.lock:
+            idx = rng.integers(0, self.size, size=min(batch_size, self.size))
+            return self.states[idx], self.actions[idx], self.rewards[idx], self.next_states[idx], self.dones[idx]
+
+
+class TDLearner:
+    """
+    Linear state-value function V(s) = w . s trained by minibatch TD(0) on a background thread.
+
+    Every push() wakes the thread for `updates_per_push` minibatch steps, so learning keeps pace
+    with the game without ever running on the thread that answers it. The step is normalised by
+    1 + |s|^2 (NLMS) because raw unit counts make the plain TD step diverge.
+    Each step builds a new weight array and swaps the reference, so value() always reads one
+    complete snapshot without taking a lock. push() and load_replay() replace buffer and weights
+    together under _swap_lock, and a step only commits if the buffer it sampled is still current,
+    so an update computed for the old state size never overwrites the new weights.
+    With prioritized=True transitions are replayed in proportion to their last TD error
+    (replay.PrioritizedReplay) and the step is importance-weighted.
+    """
+
+    def __init__(self, gamma=0.99, alpha=1e-3, capacity=4096, batch_size=32, updates_per_push=4, seed=0,
+                 prioritized=False):
+        self.gamma = gamma
+        self.alpha = alpha
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.updates_per_push = updates_per_push
+        self.rng = np.random.default_rng(seed)
+        self.prioritized = prioritized
+        self.buffer = None  # allocated on the first transition, once the state size is known
+        self.weights = None
+        self._swap_lock = threading.Lock()
+        self.updates = 0
+        self.last_td_error = 0.0
+        self._pending = 0
+        self._wake = threading.Event()
+        self._stop = False
+        self._thread = None
+
+    def value(self, x):
+        w = self.weights
+        return 0.0 if w is None or len(w) != len(x) else float(w @ x)
+
+    def push(self, state, action, reward, next_state, done=False):
+        if self.buffer is None or self.buffer.state_dim != len(state):
+            # filled before it is swapped in, so the learner thread never samples an empty buffer
+            buffer = (PrioritizedReplay if self.prioritized else TransitionBuffer)(self.capacity, len(state))
+            buffer.push(state, action, reward, next_state, done)
+            self._swap(buffer)
+        else:
+            self.buffer.push(state, action, reward, next_state, done)
+        self._pending = self.updates_per_push
+        self._wake.set()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="td-learner", daemon=True)
+            self._thread.start()
+
+    def _swap(self, buffer):
+        with self._swap_lock:
+            self.buffer = buffer
+            self.weights = np.zeros(buffer.state_dim, dtype=np.float32)
+
+    def step(self):
+        """One minibatch TD(0) update; returns the mean absolute TD error."""
+        with self._swap_lock:
+            buffer, w = self.buffer, self.weights
+        if self.prioritized:
+            s, _a, r, s_next, done, slots, writes, is_weights = buffer.sample(self.batch_size, self.rng)
+        else:
+            s, _a, r, s_next, done = buffer.sample(self.batch_size, self.rng)
+            is_weights = 1.0
+        delta = r + self.gamma * (s_next @ w) * (1.0 - done) - s @ w
+        norm = 1.0 + np.einsum("ij,ij->i", s, s)
+        new_w = w + self.alpha * ((is_weights * delta / norm) @ s) / len(delta)
+        with self._swap_lock:
+            if self.buffer is not buffer:
+                return self.last_td_error  # push() started over for a new state size; drop this update
+            self.weights = new_w
+        if self.prioritized:
+            buffer.update_priorities(slots, writes, delta)
+        self.updates += 1
+        self.last_td_error = float(np.abs(delta).mean())
+        return self.last_td_error
+
+    def _run(self):
+        while not self._stop:
+            self._wake.wait()
+            self._wake.clear()
+            while self._pending > 0 and not self._stop:
+                self._pending -= 1
+                self.step()
+
+    def stop(self):
+        self._stop = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5.0)
+            self._thread = None
+
+    def save_replay(self, path):
+        if self.prioritized and self.buffer is not None and self.buffer.size:
+            self.buffer.save(path)
+
+    def load_replay(self, path):
+        """Resume from a replay buffer saved by a previous run (prioritized mode only)."""
+        if not self.prioritized or not os.path.exists(path):
+            return False
+        self._swap(PrioritizedReplay.load(path, self.capacity))
+        return True
+
+    def stats(self):
+        return {
+            "transitions": 0 if self.buffer is None else self.buffer.size,
+            "updates": self.updates,
+            "mean_abs_td_error": self.last_td_error,
+        }
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# the agent modules live flat at the repository root
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+CTF_MAP = os.path.join(ROOT, "gameInfo", "Capture The Flag.json")
@@ -0,0 +1,78 @@
+import itertools
+import json
+
+import pytest
+
+import greedy_model as gm
+from attack_plans import _plan_score, defending_strength, generate_attack_plans, target_value
+from benchmark import PRODUCTION_RULES, UNIT_STATS
+
+# Home holds the attackers; Fort is defended by 4, Field and Outpost (behind Fort) are empty
+SMALL_MAP = {
+    "territories": ["Home", "Fort", "Field", "Outpost"],
+    "connections": [{"from": "Home", "to": "Fort"}, {"from": "Home", "to": "Field"}, {"from": "Fort", "to": "Outpost"}],
+    "players": ["Russians", "Germans"],
+    "units": list(UNIT_STATS) + ["factory"],
+    "unit_stats": UNIT_STATS,
+    "production_rules": PRODUCTION_RULES,
+    "starting_ownership": {"Home": "Russians", "Fort": "Germans", "Outpost": "Germans"},
+    "starting_units": [
+        {"unit": "infantry", "territory": "Home", "quantity": 3, "owner": "Russians"},
+        {"unit": "artillery", "territory": "Home", "quantity": 2, "owner": "Russians"},
+        {"unit": "armour", "territory": "Home", "quantity": 2, "owner": "Russians"},
+        {"unit": "infantry", "territory": "Fort", "quantity": 2, "owner": "Germans"},
+    ],
+    "initial_resources": {"Russians": 10, "Germans": 10},
+    "victory_cities": ["Fort"],
+}
+
+
+@pytest.fixture
+def ctf(tmp_path):
+    path = tmp_path / "small_map.json"
+    path.write_text(json.dumps(SMALL_MAP))
+    return gm.CaptureTheFlagGraph(str(path), display=False)
+
+
+def plan_quantities(plan):
+    quantities = {}
+    for move in plan["units"]:
+        quantities[move["unit"]] = quantities.get(move["unit"], 0) + move["quantity"]
+    return quantities
+
+
+def test_best_plan_matches_exhaustive_search(ctf):
+    defense = defending_strength(ctf, "Fort", "Russians")
+    value = target_value(ctf, "Fort")
+    units = ("infantry", "artillery", "armour")
+    best = max(
+        _plan_score(value, attack, cost, defense)
+        for qty in itertools.product(range(4), range(3), range(3))
+        for attack, cost in [(sum(q * ctf.production_rules[u]["attack"] for q, u in zip(qty, units)),
+                              sum(q * ctf.production_rules[u]["cost"] for q, u in zip(qty, units)))]
+        if attack >= defense
+    )
+    plans = {p["to"]: p for p in generate_attack_plans(ctf, "Russians", overkill=10.0)}
+    assert plans["Fort"]["value"] == pytest.approx(best)
+    assert plans["Fort"]["attack"] >= defense
+
+
+def test_undefended_targets_get_one_cheapest_unit(ctf):
+    plans = {p["to"]: p for p in generate_attack_plans(ctf, "Russians")}
+    assert plan_quantities(plans["Field"]) == {"infantry": 1}
+    # only armour moves two territories
+    assert plan_quantities(plans["Outpost"]) == {"armour": 1}
+    assert plans["Outpost"]["units"][0]["path"] == ["Home", "Fort", "Outpost"]
+
+
+def test_one_plan_per_target_in_descending_value(ctf):
+    plans = list(generate_attack_plans(ctf, "Russians"))
+    assert sorted(p["to"] for p in plans) == ["Field", "Fort", "Outpost"]
+    values = [p["value"] for p in plans]
+    assert values == sorted(values, reverse=True)
+    assert [p["to"] for p in generate_attack_plans(ctf, "Russians", k=1)] == [plans[0]["to"]]
+
+
+def test_min_odds_drops_targets_out_of_reach(ctf):
+    plans = {p["to"] for p in generate_attack_plans(ctf, "Russians", min_odds=10.0)}
+    assert "Fort" not in plans
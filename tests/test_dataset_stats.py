@@ -0,0 +1,66 @@
+import json
+
+import numpy as np
+import pytest
+
+from dataset_stats import DedupFilter, RunningStats, load_stats, process_dataset, stats_filename
+
+
+def test_running_stats_merge_matches_numpy():
+    rng = np.random.default_rng(0)
+    x = rng.normal(3.0, 2.0, size=(101, 4))
+    stats = RunningStats(4)
+    for chunk in np.array_split(x, [7, 8, 50]):
+        stats.merge(RunningStats.of(chunk))
+    assert stats.count == len(x)
+    np.testing.assert_allclose(stats.mean, x.mean(axis=0))
+    np.testing.assert_allclose(stats.var, x.var(axis=0))
+    np.testing.assert_array_equal(stats.min, x.min(axis=0))
+    np.testing.assert_array_equal(stats.max, x.max(axis=0))
+
+
+def test_running_stats_merge_is_order_independent():
+    rng = np.random.default_rng(1)
+    a, b = RunningStats.of(rng.random((5, 2))), RunningStats.of(rng.random((9, 2)) + 10)
+    ab = RunningStats(2).merge(a).merge(b)
+    ba = RunningStats(2).merge(b).merge(a)
+    np.testing.assert_allclose(ab.mean, ba.mean)
+    np.testing.assert_allclose(ab.var, ba.var)
+
+
+def test_empty_merge_keeps_stats():
+    stats = RunningStats.of(np.array([[1.0], [3.0]]))
+    stats.merge(RunningStats(1))
+    assert stats.count == 2
+    np.testing.assert_allclose(stats.mean, [2.0])
+
+
+def test_dedup_filter():
+    dedup = DedupFilter(capacity=4)  # generations of two hashes
+    lines = (b"a", b"b", b"a", b"c", b"b", b"d", b"e", b"a")
+    # "b" is still in the previous generation; "a" has been forgotten two generations later
+    assert [dedup.add(line) for line in lines] == [True, True, False, True, False, True, True, True]
+    assert dedup.duplicates == 2 and dedup.seen == 8
+
+
+def test_process_dataset(tmp_path):
+    path = tmp_path / "states.csv"
+    rows = [[1, 0.0, 10.0, 5], [1, 2.0, 30.0, 5], [1, 0.0, 10.0, 5], [2, 4.0, 20.0, 7]]
+    path.write_text("round,node_feat_0,global_0,adj_0\n" + "".join(",".join(map(str, r)) + "\n" for r in rows))
+    output = str(tmp_path / "states_norm.csv")
+
+    result = process_dataset(str(path), output, workers=0, chunk_rows=2)
+    assert (result["rows_in"], result["rows_out"], result["duplicates"]) == (4, 3, 1)
+    assert result["columns"] == ["node_feat_0", "global_0"]
+
+    x = np.loadtxt(output, delimiter=",", skiprows=1)
+    unique = np.array([rows[0], rows[1], rows[3]], dtype=float)
+    np.testing.assert_array_equal(x[:, [0, 3]], unique[:, [0, 3]])
+    np.testing.assert_allclose(x[:, 1:3].mean(axis=0), 0.0, atol=1e-6)
+    np.testing.assert_allclose(x[:, 1:3].std(axis=0), 1.0, rtol=1e-6)
+
+    columns, mean, std = load_stats(stats_filename(output))
+    assert columns == ["node_feat_0", "global_0"]
+    np.testing.assert_allclose(mean, [2.0, 20.0])
+    with open(stats_filename(output)) as f:
+        assert json.load(f)["count"] == 3
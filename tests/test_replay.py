@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from replay import PrioritizedReplay, SumTree
+
+
+def test_sum_tree_totals_and_find():
+    tree = SumTree(5)
+    priorities = np.array([1.0, 0.5, 2.0, 0.0, 1.5])
+    tree.update(np.arange(5), priorities)
+    assert tree.total == pytest.approx(priorities.sum())
+    edges = np.cumsum(priorities)
+    values = np.array([0.0, 0.99, 1.0, 1.49, 1.5, 3.49, 3.5, 4.99])
+    np.testing.assert_array_equal(tree.find(values), np.searchsorted(edges, values, side="right"))
+
+
+def test_sum_tree_single_and_batch_updates_agree():
+    single, batch = SumTree(6), SumTree(6)
+    slots, priorities = [4, 1, 4, 0], [0.3, 0.7, 1.1, 2.0]
+    for slot, priority in zip(slots, priorities):
+        single.update([slot], [priority])
+    batch.update([4, 1, 0], [1.1, 0.7, 2.0])
+    np.testing.assert_allclose(single.tree, batch.tree)
+
+
+def fill(replay, n, priority=None):
+    for i in range(n):
+        replay.push(np.full(replay.state_dim, i), i, 0.0, np.full(replay.state_dim, i), priority=priority)
+
+
+def test_sample_weights_and_slots():
+    replay = PrioritizedReplay(8, 3)
+    fill(replay, 5)
+    states, actions, _r, _s, _d, slots, writes, weights = replay.sample(16, np.random.default_rng(0))
+    assert slots.max() < 5
+    np.testing.assert_array_equal(actions, slots)
+    np.testing.assert_array_equal(states[:, 0], slots)
+    np.testing.assert_array_equal(writes, 1)
+    assert weights.max() == pytest.approx(1.0)
+
+
+def test_update_priorities_skips_overwritten_slots():
+    replay = PrioritizedReplay(4, 2)
+    fill(replay, 4, priority=0.01)
+    *_, slots, writes, _w = replay.sample(4, np.random.default_rng(1))
+    replay.push(np.ones(2), 9, 0.0, np.ones(2))  # overwrites slot 0 with the max priority
+    replay.update_priorities(slots, writes, np.zeros(len(slots)))
+    assert replay.tree.get([0])[0] == pytest.approx(replay.max_priority)
+    stale = np.setdiff1d(slots, [0])
+    np.testing.assert_allclose(replay.tree.get(stale), replay.eps ** replay.alpha)
+
+
+def test_update_priorities_raises_max_priority():
+    replay = PrioritizedReplay(4, 2)
+    fill(replay, 4)
+    *_, slots, writes, _w = replay.sample(2, np.random.default_rng(2))
+    replay.update_priorities(slots, writes, np.array([10.0, 0.0]))
+    assert replay.max_priority == pytest.approx((10.0 + replay.eps) ** replay.alpha)
+
+
+def test_save_and_load_round_trip(tmp_path):
+    replay = PrioritizedReplay(4, 2)
+    fill(replay, 6, priority=0.5)
+    path = str(tmp_path / "replay.npz")
+    replay.save(path)
+    loaded = PrioritizedReplay.load(path)
+    assert loaded.size == 4
+    np.testing.assert_array_equal(loaded.actions, [2, 3, 4, 5])
+    assert loaded.tree.total == pytest.approx(replay.tree.total)
@@ -0,0 +1,105 @@
+import json
+
+import pytest
+
+import greedy_model as gm
+from benchmark import make_change_stream
+from conftest import CTF_MAP
+
+
+def assert_consistent(ctf):
+    assert ctf.verify_state_hash()
+    assert ctf.verify_aggregates()
+
+
+@pytest.fixture
+def map_data():
+    with open(CTF_MAP) as f:
+        return json.load(f)
+
+
+@pytest.fixture
+def ctf():
+    ctf = gm.CaptureTheFlagGraph(CTF_MAP, display=False)
+    ctf.update_my_role("Russians")
+    return ctf
+
+
+def test_change_stream_keeps_hash_and_aggregates(ctf, map_data):
+    assert_consistent(ctf)
+    for line in make_change_stream(map_data, 400, seed=3):
+        ctf.apply_change_line(line, 0)
+        assert_consistent(ctf)
+
+
+def test_update_ownership_to_same_owner(ctf):
+    before = (ctf.state_hash, {p: list(row) for p, row in ctf.aggregates.items()})
+    ctf.update_ownership("RussianBase", "Russians")
+    assert_consistent(ctf)
+    assert (ctf.state_hash, ctf.aggregates) == before
+
+
+def test_remove_unit_down_to_zero(ctf):
+    ctf.add_unit("Flag", "armour", "Germans", 2)
+    assert_consistent(ctf)
+    ctf.remove_unit("Flag", "armour", "Germans", 1)
+    assert_consistent(ctf)
+    ctf.remove_unit("Flag", "armour", "Germans", 1)
+    assert_consistent(ctf)
+    assert not any(u["unit"] == "armour" and u["owner"] == "Germans" for u in ctf.G.nodes["Flag"]["units"])
+    assert ("Germans", "armour") not in ctf.last_stack
+
+
+def test_remove_more_units_than_present(ctf):
+    ctf.add_unit("Flag", "artillery", "Italians", 1)
+    ctf.remove_unit("Flag", "artillery", "Italians", 3)
+    assert_consistent(ctf)
+
+
+def test_clear_unplaced(ctf):
+    ctf.add_unit("Chinese", "infantry", "Chinese", 3)
+    ctf.add_unit("Chinese", "armour", "Chinese", 1)
+    assert_consistent(ctf)
+    ctf.clear_unplaced("Chinese")
+    assert_consistent(ctf)
+    assert ctf.G.owners["Chinese"]["unplaced"] == {}
+    ctf.clear_unplaced("Chinese")
+    assert_consistent(ctf)
+
+
+def test_restore_checkpoint(ctf, map_data):
+    lines = make_change_stream(map_data, 300, seed=5)
+    for line in lines[:150]:
+        ctf.apply_change_line(line, 0)
+    checkpoint = ctf.to_checkpoint()
+    expected_hash, expected_digest = ctf.state_hash, ctf.state_digest()
+    for line in lines[150:]:
+        ctf.apply_change_line(line, 0)
+    ctf.restore(checkpoint)
+    assert_consistent(ctf)
+    assert (ctf.state_hash, ctf.state_digest()) == (expected_hash, expected_digest)
+
+
+def test_apply_snapshot(ctf):
+    snapshot = {"territories": {}, "pus": {p: pdata["PU"] + 7 for p, pdata in ctf.G.owners.items()}}
+    for terr, data in ctf.G.nodes(data=True):
+        snapshot["territories"][terr] = {
+            "owner": data["owner"],
+            "units": [[u["unit"], u["owner"], u["quantity"]] for u in data["units"]],
+        }
+    snapshot["territories"]["Flag"] = {"owner": "Germans", "units": [["armour", "Germans", 4]]}
+    snapshot["territories"]["RussianBase"]["units"] = []
+
+    assert ctf.apply_snapshot(snapshot) == 2
+    assert_consistent(ctf)
+    assert ctf.G.nodes["Flag"]["owner"] == "Germans"
+    assert ctf.unit_locations[("Germans", "armour")]["Flag"] == 4
+    assert ctf.G.nodes["RussianBase"]["units"] == []
+
+
+def test_apply_snapshot_with_unknown_territory_changes_nothing(ctf):
+    expected = ctf.state_hash
+    with pytest.raises(ValueError):
+        ctf.apply_snapshot({"territories": {"Atlantis": {"owner": "Germans", "units": []}}})
+    assert ctf.state_hash == expected
+    assert_consistent(ctf)
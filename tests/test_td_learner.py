@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+
+from td_learner import TDLearner
+
+
+@pytest.mark.parametrize("prioritized", [False, True])
+def test_step_racing_a_state_size_change_keeps_learning(prioritized):
+    learner = TDLearner(batch_size=4, updates_per_push=0, prioritized=prioritized)  # steps driven by hand
+    rng = np.random.default_rng(0)
+    for _ in range(8):
+        learner.push(rng.random(3), 0, 1.0, rng.random(3))
+    old_buffer = learner.buffer
+    sample = old_buffer.sample
+
+    def sample_then_resize(*args):
+        batch = sample(*args)
+        learner.push(rng.random(5), 0, 1.0, rng.random(5))  # push() on the agent thread mid-step
+        return batch
+
+    old_buffer.sample = sample_then_resize
+    learner.step()
+    assert learner.buffer is not old_buffer
+    assert len(learner.weights) == 5 and learner.updates == 0
+
+    learner.step()
+    assert learner.updates == 1
+    assert learner.value(np.ones(5)) != 0.0
+    learner.stop()
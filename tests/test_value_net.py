@@ -0,0 +1,22 @@
+import pytest
+
+import greedy_model as gm
+from conftest import CTF_MAP
+from gnn_inference import GraphValueNet
+
+
+@pytest.fixture
+def ctf():
+    return gm.CaptureTheFlagGraph(CTF_MAP, display=False)
+
+
+def test_check_value_net_accepts_matching_widths(ctf):
+    width = gm.OnlineGreedyAgent(10).get_state_encoding(ctf, "combat")["node_features"].shape[1]
+    gm.OnlineGreedyAgent(10, value_net=GraphValueNet.random(width, 3)).check_value_net(ctf)
+
+
+def test_check_value_net_rejects_other_encoding(ctf):
+    width = gm.OnlineGreedyAgent(10).get_state_encoding(ctf, "combat")["node_features"].shape[1]
+    agent = gm.OnlineGreedyAgent(10, influence_features=True, value_net=GraphValueNet.random(width, 3))
+    with pytest.raises(ValueError, match="INFLUENCE_FEATURES"):
+        agent.check_value_net(ctf)